@@ -0,0 +1,124 @@
+"""Fachadas asíncronas de la economía y la tienda virtual.
+
+Los handlers de Discord son ``async``; ``EconomySystem`` y ``VirtualShop`` son
+síncronos y, al guardar, pueden escribir a disco (volcado inmediato, libro
+mayor, SQLite). Estas fachadas ejecutan cada operación en un executor propio,
+sin bloquear el loop del gateway, y serializan las operaciones de un mismo
+usuario para que se apliquen en el orden en que llegaron.
+
+    from async_economy import async_economy
+    result = await async_economy.play_dice(user_id, bet, guess)
+"""
+import asyncio
+import functools
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from economy_system import economy, USER_PARAMS
+from virtual_shop import virtual_shop
+
+logger = logging.getLogger(__name__)
+
+# Hilos dedicados a operaciones de economía/tienda
+ECONOMY_WORKERS = getattr(config, "ECONOMY_WORKERS", 4)
+
+
+class UserLocks:
+    """Un asyncio.Lock por usuario; se descartan cuando nadie los usa."""
+
+    def __init__(self):
+        self._locks = {}  # user_id -> [lock, usuarios esperando o dentro]
+
+    async def acquire(self, user_ids):
+        # Siempre en el mismo orden para que dos operaciones cruzadas no se bloqueen
+        acquired = []
+        try:
+            for user_id in sorted(set(user_ids)):
+                entry = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+                entry[1] += 1
+                acquired.append(user_id)
+                await entry[0].acquire()
+        except BaseException:
+            self.release(acquired, locked=acquired[:-1])
+            raise
+        return acquired
+
+    def release(self, user_ids, locked=None):
+        locked = user_ids if locked is None else locked
+        for user_id in user_ids:
+            entry = self._locks[user_id]
+            if user_id in locked:
+                entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user_id]
+
+
+class AsyncFacade:
+    """Envuelve un objeto síncrono: ``await facade.metodo(...)`` lo ejecuta en el executor."""
+
+    def __init__(self, target, executor: ThreadPoolExecutor, user_locks: UserLocks):
+        self._target = target
+        self._executor = executor
+        self._user_locks = user_locks
+        self._wrappers = {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            method = getattr(self._target, name)
+            if not callable(method):
+                return method
+            wrapper = self._wrappers[name] = self._wrap(method)
+        return wrapper
+
+    def _wrap(self, method):
+        signature = inspect.signature(method)
+        user_params = [param for param in signature.parameters if param in USER_PARAMS]
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            user_ids = []
+            if user_params:
+                bound = signature.bind_partial(*args, **kwargs)
+                user_ids = [str(bound.arguments[param]) for param in user_params if param in bound.arguments]
+
+            locked = await self._user_locks.acquire(user_ids)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(self._call, method, args, kwargs, user_ids)
+                )
+            finally:
+                self._user_locks.release(locked)
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    @staticmethod
+    def _call(method, args, kwargs, user_ids):
+        # Mismo orden de locks que el resto de la economía: usuarios y luego almacén.
+        # Sólo se bloquean: el método valida antes de crear a nadie
+        with economy.user_locks(user_ids):
+            return method(*args, **kwargs)
+
+
+class AsyncEconomy(AsyncFacade):
+    """Versión ``await``-able de ``EconomySystem``."""
+
+
+class AsyncVirtualShop(AsyncFacade):
+    """Versión ``await``-able de ``VirtualShop``."""
+
+
+# Executor y locks compartidos: una compra y una partida del mismo usuario
+# también se serializan entre sí
+_executor = ThreadPoolExecutor(max_workers=ECONOMY_WORKERS, thread_name_prefix="economy")
+_user_locks = UserLocks()
+
+async_economy = AsyncEconomy(economy, _executor, _user_locks)
+async_virtual_shop = AsyncVirtualShop(virtual_shop, _executor, _user_locks)
@@ -0,0 +1,87 @@
+"""Zapatos de blackjack por canal y tablas de estrategia para las pistas.
+
+Cada canal reparte de su propio zapato de ``BLACKJACK_DECKS`` barajas, que se
+mezcla al pasar la penetración (``BLACKJACK_PENETRATION``). El zapato vive en
+memoria y se guarda en el almacén (``economy.blackjack_shoes``, una fila por
+canal) al terminar cada partida, así que tras un reinicio se sigue
+repartiendo del mismo zapato. Las tablas de valor esperado se calculan una
+vez y se guardan en ``BLACKJACK_EV_CACHE``.
+"""
+import logging
+import os
+from typing import Dict
+
+import config
+from config import DATA_FILE
+from data_manager import load_data, save_data, store_lock
+from games import strategy
+from games.shoe import Shoe
+
+logger = logging.getLogger(__name__)
+
+BLACKJACK_DECKS = getattr(config, "BLACKJACK_DECKS", 6)
+BLACKJACK_PENETRATION = getattr(config, "BLACKJACK_PENETRATION", 0.75)
+BLACKJACK_EV_CACHE = getattr(
+    config, "BLACKJACK_EV_CACHE", os.path.splitext(DATA_FILE)[0] + ".blackjack_ev.json"
+)
+
+
+class ShoeStore:
+    """Zapato de cada canal (channel_id -> Shoe), persistido en el almacén"""
+
+    TABLE = "blackjack_shoes"
+
+    def __init__(self, decks: int, penetration: float):
+        self.decks = decks
+        self.penetration = penetration
+        self._shoes: Dict[str, Shoe] = {}
+
+    @staticmethod
+    def _stored(data: Dict) -> Dict:
+        return data.setdefault("economy", {}).setdefault("blackjack_shoes", {})
+
+    def get(self, channel_id) -> Shoe:
+        key = str(channel_id)
+        shoe = self._shoes.get(key)
+        if shoe is None:
+            with store_lock:
+                stored = self._stored(load_data()).get(key)
+            # Un zapato guardado con otra configuración se descarta
+            if stored and stored.get("decks") == self.decks and stored.get("penetration") == self.penetration:
+                shoe = Shoe.from_dict(stored)
+            else:
+                shoe = Shoe(self.decks, self.penetration)
+            self._shoes[key] = shoe
+        return shoe
+
+    def start_round(self, channel_id, rng=None) -> Shoe:
+        """Zapato listo para repartir una ronda (mezclado si salió la carta de corte)"""
+        shoe = self.get(channel_id)
+        shuffles = shoe.shuffles
+        shoe.start_round(rng)
+        if shoe.shuffles != shuffles:
+            logger.debug(f"Zapato del canal {channel_id} mezclado ({shoe.decks} barajas)")
+        return shoe
+
+    def save(self, channel_id):
+        key = str(channel_id)
+        shoe = self._shoes.get(key)
+        if shoe is None:
+            return
+        with store_lock:
+            data = load_data()
+            self._stored(data)[key] = shoe.to_dict()
+            save_data(data, touched=[(self.TABLE, key)])
+
+
+shoes = ShoeStore(BLACKJACK_DECKS, BLACKJACK_PENETRATION)
+
+_strategy_tables = None
+
+
+def get_strategy_tables() -> Dict:
+    """Tablas de valor esperado (se cargan de la caché la primera vez)"""
+    global _strategy_tables
+    if _strategy_tables is None:
+        _strategy_tables = strategy.load_tables(BLACKJACK_EV_CACHE)
+    return _strategy_tables
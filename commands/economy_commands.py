@@ -5,6 +5,7 @@ from discord.ext import commands
 import asyncio
 from datetime import datetime, timedelta
 from economy_system import economy
+from async_economy import async_economy
 
 # Para manejar tipos opcionales y números aleatorios
 from typing import Optional
@@ -18,14 +19,8 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     async def balance(interaction: discord.Interaction, usuario: Optional[discord.Member] = None):
         # Si no especifican usuario, mostramos el balance de quien usa el comando
         target_user = usuario or interaction.user
-        # Cargamos los datos más frescos de la base de datos
-        from data_manager import load_data
-        data = load_data()
-        if "economy" in data and "users" in data["economy"] and str(target_user.id) in data["economy"]["users"]:
-            user_economy = data["economy"]["users"][str(target_user.id)]
-        else:
-            # Si no existe en los datos, creamos un perfil nuevo
-            user_economy = economy.get_user_economy(str(target_user.id))
+        # Sólo lectura: un usuario sin perfil ve el balance inicial y no se crea nada
+        user_economy = economy.peek_user_economy(str(target_user.id))
         
         # Creamos un embed bonito con toda la información del usuario
         embed = discord.Embed(
@@ -157,7 +152,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         task_id = tarea
         
         # Intentamos reclamar la recompensa
-        reward = economy.claim_task_reward(user_id, task_id)
+        reward = await async_economy.claim_task_reward(user_id, task_id, idempotency_key=str(interaction.id))
         
         if reward:
             # ¡Éxito! El usuario ganó monedas
@@ -168,7 +163,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             )
             
             # Mostramos su nuevo balance
-            user_economy = economy.get_user_economy(user_id)
+            user_economy = economy.peek_user_economy(user_id)
             embed.add_field(
                 name="💰 Nuevo Balance",
                 value=f"{user_economy['coins']:,} GameCoins",
@@ -201,7 +196,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     async def jobs(interaction: discord.Interaction):
         user_id = str(interaction.user.id)
         available_jobs = economy.get_available_jobs(user_id)
-        user_economy = economy.get_user_economy(user_id)
+        user_economy = economy.peek_user_economy(user_id)
         
         embed = discord.Embed(
             title="💼 Centro de Empleos GameMid",
@@ -246,7 +241,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         user_id = str(interaction.user.id)
         job_id = trabajo
         
-        if economy.assign_job(user_id, job_id):
+        if await async_economy.assign_job(user_id, job_id):
             job_info = economy.jobs[job_id]
             embed = discord.Embed(
                 title="🎉 ¡Trabajo Asignado!",
@@ -292,7 +287,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     @tree.command(name="work", description="⚒️ Trabaja para ganar GameCoins")
     async def work(interaction: discord.Interaction):
         user_id = str(interaction.user.id)
-        result = economy.work(user_id)
+        result = await async_economy.work(user_id, idempotency_key=str(interaction.id))
         
         if not result:
             embed = discord.Embed(
@@ -329,7 +324,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 inline=True
             )
             
-            user_economy = economy.get_user_economy(user_id)
+            user_economy = economy.peek_user_economy(user_id)
             embed.add_field(
                 name="💳 Nuevo Balance",
                 value=f"{user_economy['coins']:,} GameCoins",
@@ -370,7 +365,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         user_id = str(interaction.user.id)
         choice = eleccion
         
-        result = economy.play_coinflip(user_id, apuesta, choice)
+        result = await async_economy.play_coinflip(user_id, apuesta, choice, idempotency_key=str(interaction.id))
         
         if "error" in result:
             if result["error"] == "invalid_bet":
@@ -411,7 +406,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     inline=True
                 )
             
-            user_economy = economy.get_user_economy(user_id)
+            user_economy = economy.peek_user_economy(user_id)
             embed.add_field(
                 name="💳 Balance",
                 value=f"{user_economy['coins']:,} GameCoins",
@@ -439,7 +434,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             return
         
         user_id = str(interaction.user.id)
-        result = economy.play_dice(user_id, apuesta, numero)
+        result = await async_economy.play_dice(user_id, apuesta, numero, idempotency_key=str(interaction.id))
         
         if "error" in result:
             if result["error"] == "invalid_bet":
@@ -481,7 +476,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     inline=True
                 )
             
-            user_economy = economy.get_user_economy(user_id)
+            user_economy = economy.peek_user_economy(user_id)
             embed.add_field(
                 name="💳 Balance",
                 value=f"{user_economy['coins']:,} GameCoins",
@@ -493,7 +488,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     @tree.command(name="slots", description="🎰 Juega a las tragamonedas")
     async def slots(interaction: discord.Interaction, apuesta: int):
         user_id = str(interaction.user.id)
-        result = economy.play_slots(user_id, apuesta)
+        result = await async_economy.play_slots(user_id, apuesta, idempotency_key=str(interaction.id))
         
         if "error" in result:
             if result["error"] == "invalid_bet":
@@ -530,7 +525,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     inline=True
                 )
             
-            user_economy = economy.get_user_economy(user_id)
+            user_economy = economy.peek_user_economy(user_id)
             embed.add_field(
                 name="💳 Balance",
                 value=f"{user_economy['coins']:,} GameCoins",
@@ -564,7 +559,9 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 return
             
             # Verificar fondos
-            if not economy.remove_coins(user_id, apuesta, "Blackjack bet"):
+            if not await async_economy.remove_coins(
+                user_id, apuesta, "Blackjack bet", idempotency_key=f"blackjack:{interaction.id}:bet"
+            ):
                 embed = discord.Embed(
                     title="❌ Fondos Insuficientes",
                     description="No tienes suficientes GameCoins para esta apuesta",
@@ -575,7 +572,9 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 return
             
             # Crear vista interactiva
-            view = BlackjackView(user_id, apuesta, economy)
+            view = BlackjackView(
+                user_id, apuesta, economy, game_id=str(interaction.id), channel_id=interaction.channel_id
+            )
             embed = view.create_embed()
             
             if not interaction.response.is_done():
@@ -619,14 +618,14 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         user_id = str(interaction.user.id)
         target_id = str(usuario.id)
         
-        if economy.transfer_coins(user_id, target_id, cantidad):
+        if await async_economy.transfer_coins(user_id, target_id, cantidad, idempotency_key=str(interaction.id)):
             embed = discord.Embed(
                 title="✅ Transferencia Exitosa",
                 description=f"Has transferido **{cantidad:,} GameCoins** a {usuario.mention}",
                 color=0x00ff00
             )
             
-            sender_economy = economy.get_user_economy(user_id)
+            sender_economy = economy.peek_user_economy(user_id)
             embed.add_field(
                 name="💳 Tu Nuevo Balance",
                 value=f"{sender_economy['coins']:,} GameCoins",
@@ -709,7 +708,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             user_id = str(interaction.user.id)
             
             # Verificar que el usuario tenga al menos la apuesta mínima
-            user_economy = economy.get_user_economy(user_id)
+            user_economy = economy.peek_user_economy(user_id)
             min_bet = economy.minigames['roulette']['min_bet']
             
             if user_economy['coins'] < min_bet:
@@ -787,7 +786,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             return
         
         user_id = str(message.author.id)
-        economy.update_task_progress(user_id, "send_messages")
+        economy.record_activity(user_id, "send_messages")
 
     async def handle_economy_interaction(interaction: discord.Interaction):
         if interaction.user.bot:
@@ -795,14 +794,14 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         
         if interaction.type == discord.InteractionType.application_command:
             user_id = str(interaction.user.id)
-            economy.update_task_progress(user_id, "use_commands")
+            economy.record_activity(user_id, "use_commands")
 
     async def handle_economy_reaction(reaction: discord.Reaction, user: discord.User):
         if user.bot:
             return
 
         user_id = str(user.id)
-        economy.update_task_progress(user_id, "react_messages")
+        economy.record_activity(user_id, "react_messages")
 
     # Register event listeners using the event decorator approach
     @client.event
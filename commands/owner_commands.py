@@ -6,6 +6,7 @@ import asyncio
 from datetime import datetime
 import logging
 from data_manager import load_data, save_data
+from price_matrix import price_matrix
 from utils import is_owner
 from reminder_system import get_reminder_system
 
@@ -32,6 +33,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             "image_url": image_url
         }
         save_data(data)
+        price_matrix.invalidate()
         logger.info(f"Producto {name} (ID: {product_id}) añadido exitosamente - Precio: ${price:.2f} MXN")
         await interaction.response.send_message(f"Producto '{name}' añadido (ID: {product_id}).", ephemeral=True)
 
@@ -58,6 +60,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         if image_url is not None:
             data["products"][product_id]["image_url"] = image_url
         save_data(data)
+        price_matrix.invalidate()
         logger.info(f"Producto {product_id} actualizado exitosamente")
         await interaction.response.send_message(f"Producto {product_id} actualizado.", ephemeral=True)
 
@@ -75,6 +78,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         product_name = data["products"][product_id]["name"]
         del data["products"][product_id]
         save_data(data)
+        price_matrix.invalidate()
         logger.info(f"Producto {product_name} (ID: {product_id}) eliminado exitosamente")
         await interaction.response.send_message(f"Producto {product_id} eliminado.", ephemeral=True)
 
@@ -325,17 +329,20 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         """Añade GameCoins a un usuario específico."""
         try:
             from economy_system import economy
+            from async_economy import async_economy
             
             if amount <= 0:
                 await interaction.response.send_message("❌ La cantidad debe ser positiva.", ephemeral=True)
                 return
             
             # Obtener balance anterior
-            user_economy = economy.get_user_economy(str(user.id))
+            user_economy = economy.peek_user_economy(str(user.id))
             old_balance = user_economy["coins"]
             
             # Añadir las monedas
-            new_balance = economy.add_coins(str(user.id), amount, reason)
+            new_balance = await async_economy.add_coins(
+                str(user.id), amount, reason, ref=str(interaction.id), idempotency_key=str(interaction.id)
+            )
             
             # Crear embed de confirmación
             embed = discord.Embed(
@@ -366,4 +373,140 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
             
         except Exception as e:
             logger.error(f"Error en add_coins: {e}")
-            await interaction.response.send_message(f"❌ Error al añadir GameCoins: {str(e)}", ephemeral=True)
\ No newline at end of file
+            await interaction.response.send_message(f"❌ Error al añadir GameCoins: {str(e)}", ephemeral=True)
+
+    @tree.command(name="auditoria_coins", description="Muestra los últimos movimientos de GameCoins de un usuario (Owner only)")
+    @app_commands.describe(
+        user="Usuario a auditar",
+        limit="Cantidad de movimientos a mostrar (máximo 25)"
+    )
+    @app_commands.default_permissions(administrator=True)
+    @is_owner()
+    async def auditoria_coins(interaction: discord.Interaction, user: discord.User, limit: Optional[int] = 10):
+        """Muestra el historial del libro mayor de un usuario y lo concilia con su balance."""
+        try:
+            from economy_system import economy
+            from ledger import ledger
+            
+            user_id = str(user.id)
+            limit = max(1, min(limit, 25))
+            entries = ledger.tail(user_id, limit)
+            balance = economy.peek_user_economy(user_id)["coins"]
+            
+            embed = discord.Embed(
+                title="📒 Auditoría de GameCoins",
+                description=f"Movimientos de {user.mention} ({ledger.count(user_id):,} registrados)",
+                color=0x3498db
+            )
+            
+            if entries:
+                lines = []
+                for entry in entries:
+                    sign = "+" if entry["delta"] > 0 else ""
+                    lines.append(
+                        f"<t:{int(entry['ts'])}:f> `{sign}{entry['delta']:,}` → {entry['balance']:,} · {entry['reason']}"
+                    )
+                embed.add_field(name="🧾 Últimos movimientos", value="\n".join(lines)[:1024], inline=False)
+            else:
+                embed.add_field(name="🧾 Últimos movimientos", value="Sin movimientos registrados.", inline=False)
+            
+            # El último balance registrado debe coincidir con el balance actual
+            if entries:
+                matches = entries[0]["balance"] == balance
+                reconcile = "✅ Coincide" if matches else f"⚠️ No coincide (libro mayor: {entries[0]['balance']:,})"
+            else:
+                reconcile = "—"
+            embed.add_field(
+                name="💰 Balance",
+                value=f"**Actual:** {balance:,} GameCoins\n**Conciliación:** {reconcile}",
+                inline=False
+            )
+            embed.set_footer(text="Sistema Económico • GameMid")
+            embed.timestamp = datetime.utcnow()
+            
+            logger.info(f"Owner {interaction.user.name} (ID: {interaction.user.id}) auditó los movimientos de {user.name} (ID: {user.id})")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            logger.error(f"Error en auditoria_coins: {e}")
+            await interaction.response.send_message(f"❌ Error al consultar el libro mayor: {str(e)}", ephemeral=True)
+
+    @tree.command(name="economy_stats", description="Muestra estadísticas de la economía de GameCoins (Owner only)")
+    @app_commands.describe(grafico="Adjuntar histogramas de balances y niveles")
+    @app_commands.default_permissions(administrator=True)
+    @is_owner()
+    async def economy_stats(interaction: discord.Interaction, grafico: Optional[bool] = False):
+        """Distribución de la riqueza calculada sobre la instantánea columnar de la economía."""
+        try:
+            from economy_system import economy
+            from economy_stats import compute_economy_stats, render_histograms, ACTIVE_DAYS
+            
+            await interaction.response.defer(ephemeral=True)
+            # El cálculo y el dibujo bloquean: se hacen fuera del loop
+            stats = await asyncio.to_thread(lambda: compute_economy_stats(economy.columns()))
+            
+            embed = discord.Embed(
+                title="📊 Estadísticas de la Economía",
+                description=f"{stats['users']:,} usuarios con perfil económico",
+                color=0x3498db
+            )
+            embed.add_field(
+                name="💰 Circulación",
+                value=(
+                    f"**Total:** {stats['circulation']:,} GameCoins\n"
+                    f"**Ganado:** {stats['total_earned']:,}\n"
+                    f"**Gastado:** {stats['total_spent']:,}"
+                ),
+                inline=True
+            )
+            if stats["percentiles"]:
+                percentiles = stats["percentiles"]
+                embed.add_field(
+                    name="📈 Balances",
+                    value=(
+                        f"**Media:** {stats['mean_balance']:,.0f}\n"
+                        f"**Mediana:** {percentiles[50]:,}\n"
+                        + "\n".join(f"**P{p}:** {value:,}" for p, value in percentiles.items() if p != 50)
+                    ),
+                    inline=True
+                )
+            embed.add_field(
+                name="⚖️ Desigualdad",
+                value=f"**Gini:** {stats['gini']:.3f}",
+                inline=True
+            )
+            embed.add_field(
+                name="👥 Actividad",
+                value=(
+                    f"**Activos ({ACTIVE_DAYS} días):** {stats['active_users']:,}\n"
+                    f"**Partidas jugadas:** {stats['games_played']:,}\n"
+                    f"**Partidas por día:** {stats['games_per_day']:,.1f}"
+                    + (f" (desde {stats['since']})" if stats["since"] else "")
+                ),
+                inline=False
+            )
+            if stats["levels"]:
+                levels = sorted(stats["levels"].items())
+                lines = [f"Nv {level}: {count:,}" for level, count in levels[:15]]
+                if len(levels) > 15:
+                    lines.append(f"Nv {levels[15][0]}+: {sum(count for _, count in levels[15:]):,}")
+                embed.add_field(name="🎚️ Niveles", value="\n".join(lines)[:1024], inline=False)
+            embed.set_footer(text="Sistema Económico • GameMid")
+            embed.timestamp = datetime.utcnow()
+            
+            logger.info(f"Owner {interaction.user.name} (ID: {interaction.user.id}) consultó las estadísticas de la economía")
+            if grafico and stats["users"]:
+                image = await asyncio.to_thread(render_histograms, stats)
+                embed.set_image(url="attachment://economy_stats.png")
+                await interaction.followup.send(
+                    embed=embed, file=discord.File(image, filename="economy_stats.png"), ephemeral=True
+                )
+            else:
+                await interaction.followup.send(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            logger.error(f"Error en economy_stats: {e}")
+            if interaction.response.is_done():
+                await interaction.followup.send(f"❌ Error al calcular las estadísticas: {str(e)}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"❌ Error al calcular las estadísticas: {str(e)}", ephemeral=True)
@@ -2,7 +2,6 @@ import discord
 from discord import app_commands
 import asyncio
 from datetime import datetime, timedelta
-import aiohttp
 import json
 import random
 import string
@@ -11,11 +10,13 @@ import logging
 from data_manager import (load_data, save_data, get_next_ticket_id, 
                          get_roblox_account, link_roblox_account, 
                          get_pending_verification, add_pending_verification, 
-                         remove_pending_verification, cleanup_expired_verifications)
+                         remove_pending_verification, cleanup_expired_verifications,
+                         has_open_ticket)
 from views.enhanced_product_view import EnhancedProductView
 from views.enhanced_ticket_view import EnhancedTicketView
 from views.shop_view import ShopView
 from exchange_rate_manager import exchange_rate_manager
+from http_client import http_client
 from utils import sync_fortnite_shop, cache_fortnite_shop
 from config import (TICKET_CHANNEL_ID, OWNER_ROLE_ID, FORTNITE_API_KEY, FORTNITE_API_URL, 
                    FORTNITE_HEADERS, ROBLOX_GROUP_ID, ROBLOX_API_BASE, ROBLOX_GROUPS_API)
@@ -76,12 +77,9 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
         user_id = str(interaction.user.id)
         
         # Verificar si ya tiene un ticket abierto
-        has_open_ticket = False
-        for ticket_id, ticket in data["tickets"].items():
-            if ticket["user_id"] == user_id and ticket["status"] == "abierto" and ticket.get("estado_detallado") not in ["cerrado_por_owner", "cerrado"]:
-                has_open_ticket = True
-                await interaction.followup.send("Ya tienes un ticket abierto. Por favor, espera a que se resuelva.", ephemeral=True)
-                return
+        if has_open_ticket(user_id):
+            await interaction.followup.send("Ya tienes un ticket abierto. Por favor, espera a que se resuelva.", ephemeral=True)
+            return
         
         if not data["products"]:
             await interaction.followup.send("No hay productos disponibles. Contacta a un Owner.", ephemeral=True)
@@ -109,7 +107,7 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                 sync_success = True
             else:
                 logger.info("Sincronizando datos frescos de la tienda de Fortnite")
-                sync_success = sync_fortnite_shop()
+                sync_success = await sync_fortnite_shop()
             data = load_data()
             
             if not data or not isinstance(data, dict):
@@ -189,8 +187,8 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
                     
                     if isinstance(rate, (int, float)):
                          # Ejemplos de conversión desde MXN
-                         example_100 = await exchange_rate_manager.convert_price(100, currency)
-                         example_500 = await exchange_rate_manager.convert_price(500, currency)
+                         example_100 = exchange_rate_manager.convert(100, currency)
+                         example_500 = exchange_rate_manager.convert(500, currency)
                          
                          value_text = (
                              f"**Tasa:** 1 MXN = {rate:.2f} {currency}\n"
@@ -231,23 +229,21 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     async def get_roblox_user_info(username: str):
         """Obtiene información del usuario de Roblox por nombre de usuario"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Primero obtener el ID del usuario por nombre
-                url = f"https://users.roblox.com/v1/usernames/users"
-                data = {"usernames": [username]}
-                async with session.post(url, json=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get('data') and len(result['data']) > 0:
-                            user_id = result['data'][0]['id']
-                            
-                            # Ahora obtener información detallada del usuario
-                            user_url = f"https://users.roblox.com/v1/users/{user_id}"
-                            async with session.get(user_url) as user_response:
-                                if user_response.status == 200:
-                                    user_data = await user_response.json()
-                                    return user_data
-                    return None
+            # Primero obtener el ID del usuario por nombre
+            url = f"https://users.roblox.com/v1/usernames/users"
+            data = {"usernames": [username]}
+            response = await http_client.post(url, json=data)
+            if response.status == 200:
+                result = response.data
+                if result.get('data') and len(result['data']) > 0:
+                    user_id = result['data'][0]['id']
+                    
+                    # Ahora obtener información detallada del usuario
+                    user_url = f"https://users.roblox.com/v1/users/{user_id}"
+                    user_response = await http_client.get(user_url)
+                    if user_response.status == 200:
+                        return user_response.data
+            return None
         except Exception as e:
             logger.error(f"Error obteniendo información de usuario Roblox: {e}")
             return None
@@ -255,21 +251,19 @@ def setup(tree: app_commands.CommandTree, client: discord.Client):
     async def check_group_membership(user_id: int, group_id: int):
         """Verifica si un usuario está en un grupo específico"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://groups.roblox.com/v1/groups/{group_id}/users?limit=100"
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        members = data.get('data', [])
-                        for member in members:
-                            if member.get('user', {}).get('userId') == user_id:
-                                return {
-                                    'is_member': True,
-                                    'join_date': member.get('joinDate'),
-                                    'role': member.get('role', {})
-                                }
-                        return {'is_member': False}
-                    return {'is_member': False}
+            url = f"https://groups.roblox.com/v1/groups/{group_id}/users?limit=100"
+            response = await http_client.get(url)
+            if response.status == 200:
+                members = response.data.get('data', [])
+                for member in members:
+                    if member.get('user', {}).get('userId') == user_id:
+                        return {
+                            'is_member': True,
+                            'join_date': member.get('joinDate'),
+                            'role': member.get('role', {})
+                        }
+                return {'is_member': False}
+            return {'is_member': False}
         except Exception as e:
             logger.error(f"Error verificando membresía de grupo: {e}")
             return {'is_member': False}
@@ -5,6 +5,7 @@ from discord.ext import commands
 import logging
 # Aquí traemos nuestra tienda virtual y las vistas
 from virtual_shop import virtual_shop
+from async_economy import async_virtual_shop
 from views.virtual_shop_view import VirtualShopView
 from config import OWNER_ROLE_ID
 
@@ -73,7 +74,7 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                     return
             
             # Agrega el producto a la tienda
-            product_id = virtual_shop.add_virtual_product(
+            product_id = await async_virtual_shop.add_virtual_product(
                 name=nombre,
                 price=precio,
                 description=descripcion,
@@ -165,7 +166,7 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
                 return
             
             # Actualiza el producto con los nuevos datos
-            success = virtual_shop.edit_virtual_product(product_id, **update_data)
+            success = await async_virtual_shop.edit_virtual_product(product_id, **update_data)
             
             if success:
                 product = products[product_id]
@@ -215,7 +216,7 @@ def setup(tree: app_commands.CommandTree, client: commands.Bot):
             product_name = products[product_id]['name']
             
             # Elimina el producto de la tienda
-            success = virtual_shop.remove_virtual_product(product_id)
+            success = await async_virtual_shop.remove_virtual_product(product_id)
             
             if success:
                 embed = discord.Embed(
@@ -0,0 +1,94 @@
+"""Registro de países y monedas de la tienda.
+
+Añadir un país es añadir una entrada a ``COUNTRIES``: el selector de país,
+la conversión de precios, la matriz de tasas cruzadas y el historial de
+tasas se amplían solos. ``fallback_rate`` es la tasa (1 MXN -> moneda) que
+se usa mientras no se haya obtenido ninguna de la API.
+"""
+from typing import Dict, Tuple
+
+# Moneda de los precios del catálogo
+BASE_CURRENCY = "MXN"
+
+COUNTRIES: Dict[str, Dict] = {
+    "mexico": {
+        "name": "🇲🇽 México",
+        "currency": "MXN",
+        "currency_symbol": "$",
+        "flag": "🇲🇽",
+        "fallback_rate": 1.0
+    },
+    "argentina": {
+        "name": "🇦🇷 Argentina",
+        "currency": "ARS",
+        "currency_symbol": "$",
+        "flag": "🇦🇷",
+        "fallback_rate": 72.3
+    },
+    "colombia": {
+        "name": "🇨🇴 Colombia",
+        "currency": "COP",
+        "currency_symbol": "$",
+        "flag": "🇨🇴",
+        "fallback_rate": 216.0
+    },
+    "chile": {
+        "name": "🇨🇱 Chile",
+        "currency": "CLP",
+        "currency_symbol": "$",
+        "flag": "🇨🇱",
+        "fallback_rate": 51.0
+    },
+    "peru": {
+        "name": "🇵🇪 Perú",
+        "currency": "PEN",
+        "currency_symbol": "S/",
+        "flag": "🇵🇪",
+        "fallback_rate": 0.2
+    },
+    "brasil": {
+        "name": "🇧🇷 Brasil",
+        "currency": "BRL",
+        "currency_symbol": "R$",
+        "flag": "🇧🇷",
+        "fallback_rate": 0.3
+    },
+    "uruguay": {
+        "name": "🇺🇾 Uruguay",
+        "currency": "UYU",
+        "currency_symbol": "$U",
+        "flag": "🇺🇾",
+        "fallback_rate": 2.2
+    },
+    "guatemala": {
+        "name": "🇬🇹 Guatemala",
+        "currency": "GTQ",
+        "currency_symbol": "Q",
+        "flag": "🇬🇹",
+        "fallback_rate": 0.42
+    },
+    "costa_rica": {
+        "name": "🇨🇷 Costa Rica",
+        "currency": "CRC",
+        "currency_symbol": "₡",
+        "flag": "🇨🇷",
+        "fallback_rate": 27.5
+    },
+    "usa": {
+        "name": "🇺🇸 Estados Unidos",
+        "currency": "USD",
+        "currency_symbol": "$",
+        "flag": "🇺🇸",
+        "fallback_rate": 0.054
+    }
+}
+
+# Monedas soportadas, en el orden de las columnas de la matriz de tasas
+CURRENCIES: Tuple[str, ...] = tuple(dict.fromkeys(
+    [BASE_CURRENCY] + [country["currency"] for country in COUNTRIES.values()]
+))
+
+# 1 MXN -> moneda, mientras no haya tasas de la API
+FALLBACK_RATES: Dict[str, float] = {
+    country["currency"]: country["fallback_rate"] for country in COUNTRIES.values()
+}
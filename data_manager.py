@@ -1,15 +1,54 @@
-import json
+import asyncio
+import atexit
+import logging
 import os
+import threading
 from datetime import datetime
 
+import config
 from config import DATA_FILE
+from storage import create_backend
+
+logger = logging.getLogger(__name__)
+
+# Backend de persistencia: "json" (data.json clásico), "sharded" (un archivo por
+# dominio) o "sqlite" (una tabla por colección)
+STORAGE_BACKEND = getattr(config, "STORAGE_BACKEND", "json")
+SQLITE_FILE = getattr(config, "SQLITE_FILE", os.path.splitext(DATA_FILE)[0] + ".db")
+# Con el backend json: añadir cada cambio a un journal y compactar cada N entradas
+DATA_JOURNAL = getattr(config, "DATA_JOURNAL", False)
+JOURNAL_COMPACT_EVERY = getattr(config, "JOURNAL_COMPACT_EVERY", 1000)
+
+# Cada cuántos segundos se vuelcan a disco los cambios pendientes
+FLUSH_INTERVAL = getattr(config, "DATA_FLUSH_INTERVAL", 5.0)
+# Número de escrituras acumuladas que fuerza un volcado anticipado
+FLUSH_WRITE_THRESHOLD = getattr(config, "DATA_FLUSH_WRITE_THRESHOLD", 100)
 
 # Global ticket counter
 TICKET_COUNTER = 0
 
-def load_data():
-    global TICKET_COUNTER
-    default_data = {
+# Almacén residente: se carga una sola vez y es la única fuente de verdad
+_backend = create_backend(STORAGE_BACKEND, DATA_FILE, SQLITE_FILE,
+                          journal=DATA_JOURNAL, compact_every=JOURNAL_COMPACT_EVERY)
+_store = None
+_dirty = False
+_pending_writes = 0
+# Filas (tabla, id) modificadas desde el último volcado; None = revisar todo
+_touched = set()
+_flush_task = None
+_flush_wakeup = None
+# Loop del volcador: asyncio.Event no es seguro entre hilos
+_flush_loop = None
+# Pide al volcador que termine tras la escritura en curso
+_flush_stopping = False
+
+# Protege al almacén mientras se serializa o se modifica desde otros hilos
+store_lock = threading.RLock()
+_write_lock = threading.Lock()
+
+
+def _default_data():
+    return {
         "users": {},
         "products": {},
         "categories": {},  
@@ -34,17 +73,44 @@ def load_data():
             }
         }
     }
-    try:
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-            # Ensure all keys exist
-            for key in default_data:
-                if key not in data:
-                    data[key] = default_data[key]
-            TICKET_COUNTER = data["ticket_counter"]
-            return data
-    except (FileNotFoundError, json.JSONDecodeError):
+
+
+def _read_data_file():
+    default_data = _default_data()
+    data = _backend.load()
+    if data is None:
         return default_data
+    add_defaults = getattr(data, "add_defaults", None)
+    if add_defaults is not None:
+        # Almacén por shards: cada uno recibe sus claves por defecto al cargarse
+        add_defaults(default_data)
+        return data
+    # Ensure all keys exist
+    for key in default_data:
+        if key not in data:
+            data[key] = default_data[key]
+    return data
+
+
+def load_data():
+    """Devuelve el almacén residente, cargándolo desde disco la primera vez."""
+    global TICKET_COUNTER, _store
+    if _store is None:
+        with store_lock:
+            if _store is None:
+                _store = _read_data_file()
+                TICKET_COUNTER = _store["ticket_counter"]
+    return _store
+
+
+def reload_data():
+    """Descarta el almacén residente (volcando antes lo pendiente) y lo relee de disco."""
+    global _store
+    flush_data()
+    with store_lock:
+        _store = None
+        _invalidate_ticket_index()
+    return load_data()
 
 
 def update_product_availability(product_id, is_available):
@@ -56,11 +122,245 @@ def update_product_availability(product_id, is_available):
         return True
     return False
 
-def save_data(data):
-    global TICKET_COUNTER
-    data["ticket_counter"] = TICKET_COUNTER
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+def save_data(data, touched=None):
+    """Marca el almacén como modificado; el volcado a disco ocurre en segundo plano.
+
+    ``touched`` es una lista opcional de filas ``(tabla, id)`` modificadas
+    (ver ``storage.TABLES``); permite al backend SQLite escribir sólo esas
+    filas sin comparar el almacén completo.
+    """
+    global TICKET_COUNTER, _store, _dirty, _pending_writes, _touched
+    with store_lock:
+        if data is not _store:
+            _invalidate_ticket_index()
+        if data is not _store or data.get("ticket_counter") != TICKET_COUNTER:
+            touched = None
+        data["ticket_counter"] = TICKET_COUNTER
+        _store = data
+        _dirty = True
+        _pending_writes += 1
+        if touched is None:
+            _touched = None
+        elif _touched is not None:
+            _touched.update(touched)
+        threshold_reached = _pending_writes >= FLUSH_WRITE_THRESHOLD
+
+    if _flush_task is None or _flush_task.done():
+        # Sin el volcador en marcha (scripts, pruebas) se escribe de inmediato
+        flush_data()
+    elif threshold_reached:
+        _wake_flusher()
+
+
+def _wake_flusher():
+    """Adelanta el volcado; se puede llamar desde cualquier hilo"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _flush_loop:
+        _flush_wakeup.set()
+    else:
+        try:
+            _flush_loop.call_soon_threadsafe(_flush_wakeup.set)
+        except RuntimeError:
+            # El loop ya se cerró: se escribe desde este hilo
+            flush_data()
+
+
+def _snapshot():
+    """Serializa el almacén si tiene cambios pendientes y limpia las marcas."""
+    global _dirty, _pending_writes, _touched
+    with store_lock:
+        if not _dirty or _store is None:
+            return None
+        payload = _backend.prepare(_store, _touched)
+        _dirty = False
+        _pending_writes = 0
+        _touched = set()
+        return payload
+
+
+def _write_file(payload):
+    with _write_lock:
+        _backend.write(payload)
+
+
+def flush_data():
+    """Escribe a disco los cambios pendientes del almacén (síncrono)."""
+    payload = _snapshot()
+    if payload is not None:
+        _write_file(payload)
+
+
+async def _autoflush_loop():
+    while not _flush_stopping:
+        try:
+            await asyncio.wait_for(_flush_wakeup.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _flush_wakeup.clear()
+        try:
+            payload = _snapshot()
+            if payload is not None:
+                await asyncio.to_thread(_write_file, payload)
+        except Exception as e:
+            logger.error(f"Error al volcar datos a disco: {e}")
+
+
+async def start_autoflush():
+    """Arranca el volcado periódico de cambios pendientes en el loop actual."""
+    global _flush_task, _flush_wakeup, _flush_loop, _flush_stopping
+    if _flush_task is not None and not _flush_task.done():
+        return
+    _flush_stopping = False
+    load_data()
+    _flush_loop = asyncio.get_running_loop()
+    _flush_wakeup = asyncio.Event()
+    _flush_task = asyncio.create_task(_autoflush_loop())
+    logger.info(f"Volcado de datos ({_backend.name}) cada {FLUSH_INTERVAL}s o {FLUSH_WRITE_THRESHOLD} escrituras")
+
+
+async def stop_autoflush():
+    """Detiene el volcado periódico y escribe lo que quede pendiente.
+
+    No se cancela el volcador: una escritura en curso (en otro hilo) podría
+    llegar a disco después de la de ``flush_data`` y pisarla con datos más
+    antiguos. Se le pide que termine y se espera a que lo haga.
+    """
+    global _flush_task, _flush_stopping
+    if _flush_task is not None:
+        _flush_stopping = True
+        _flush_wakeup.set()
+        await _flush_task
+        _flush_task = None
+    flush_data()
+
+
+atexit.register(flush_data)
+
+# Índices secundarios de tickets. Se construyen al primer uso y se mantienen
+# al crear/cerrar tickets con las funciones de abajo; si otro código modifica
+# un ticket directamente debe llamar a index_ticket().
+_tickets_by_status = None     # status -> {ticket_id}
+_open_tickets_by_user = None  # user_id -> {ticket_id}
+_ticket_index_keys = {}       # ticket_id -> (user_id, status, abierto)
+
+CLOSED_TICKET_STATES = ("cerrado_por_owner", "cerrado")
+
+
+def _is_ticket_open(ticket):
+    return ticket.get("status") == "abierto" and ticket.get("estado_detallado") not in CLOSED_TICKET_STATES
+
+
+def _invalidate_ticket_index():
+    global _tickets_by_status, _open_tickets_by_user
+    _tickets_by_status = None
+    _open_tickets_by_user = None
+    _ticket_index_keys.clear()
+
+
+def _ensure_ticket_index():
+    global _tickets_by_status, _open_tickets_by_user
+    if _tickets_by_status is not None:
+        return
+    data = load_data()
+    _tickets_by_status = {}
+    _open_tickets_by_user = {}
+    for ticket_id, ticket in data["tickets"].items():
+        _index_add(ticket_id, ticket)
+
+
+def _index_add(ticket_id, ticket):
+    key = (ticket.get("user_id"), ticket.get("status"), _is_ticket_open(ticket))
+    _ticket_index_keys[ticket_id] = key
+    _tickets_by_status.setdefault(key[1], set()).add(ticket_id)
+    if key[2]:
+        _open_tickets_by_user.setdefault(key[0], set()).add(ticket_id)
+
+
+def _index_remove(ticket_id):
+    key = _ticket_index_keys.pop(ticket_id, None)
+    if key is None:
+        return
+    user_id, status, is_open = key
+    _tickets_by_status.get(status, set()).discard(ticket_id)
+    if is_open:
+        ids = _open_tickets_by_user.get(user_id)
+        if ids is not None:
+            ids.discard(ticket_id)
+            if not ids:
+                del _open_tickets_by_user[user_id]
+
+
+def index_ticket(ticket_id):
+    """Actualiza los índices tras modificar (o eliminar) un ticket del almacén."""
+    with store_lock:
+        _ensure_ticket_index()
+        _index_remove(ticket_id)
+        ticket = load_data()["tickets"].get(ticket_id)
+        if ticket is not None:
+            _index_add(ticket_id, ticket)
+
+
+def get_open_tickets(user_id):
+    """IDs de los tickets abiertos de un usuario."""
+    with store_lock:
+        _ensure_ticket_index()
+        return set(_open_tickets_by_user.get(str(user_id), ()))
+
+
+def has_open_ticket(user_id):
+    """Indica si el usuario tiene algún ticket abierto."""
+    with store_lock:
+        _ensure_ticket_index()
+        return bool(_open_tickets_by_user.get(str(user_id)))
+
+
+def get_tickets_by_status(status):
+    """IDs de los tickets con el estado indicado."""
+    with store_lock:
+        _ensure_ticket_index()
+        return set(_tickets_by_status.get(status, ()))
+
+
+def create_ticket(ticket_id, ticket):
+    """Guarda un ticket nuevo y lo añade a los índices."""
+    with store_lock:
+        data = load_data()
+        _ensure_ticket_index()
+        data["tickets"][ticket_id] = ticket
+        _index_remove(ticket_id)
+        _index_add(ticket_id, ticket)
+        save_data(data, touched=[("tickets", ticket_id)])
+
+
+def close_ticket(ticket_id, closed_by, detalles, estado_detallado="cerrado_por_owner"):
+    """Cierra un ticket, registra el cambio en su historial y actualiza los índices.
+
+    Devuelve los datos del ticket o None si no existe.
+    """
+    with store_lock:
+        data = load_data()
+        ticket = data["tickets"].get(ticket_id)
+        if ticket is None:
+            return None
+        _ensure_ticket_index()
+        now = datetime.utcnow().isoformat()
+        ticket["status"] = "cerrado"
+        ticket["estado_detallado"] = estado_detallado
+        ticket["closed_by"] = str(closed_by)
+        ticket["closed_at"] = now
+        ticket.setdefault("historial", []).append({
+            "estado": "cerrado",
+            "timestamp": now,
+            "detalles": detalles
+        })
+        _index_remove(ticket_id)
+        _index_add(ticket_id, ticket)
+        save_data(data, touched=[("tickets", ticket_id)])
+        return ticket
+
 
 def get_next_ticket_id():
     """Obtiene el siguiente ID de ticket disponible."""
@@ -0,0 +1,138 @@
+"""Estadísticas agregadas de la economía para los owners.
+
+Todo se calcula con NumPy sobre la instantánea columnar de
+``economy.columns()`` (un array por campo), sin recorrer registros en
+Python: con 100k usuarios tarda milisegundos. El histograma en imagen se
+dibuja con Pillow y, como el cálculo, debe ejecutarse fuera del loop
+(``asyncio.to_thread``).
+"""
+import io
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from economy_system import EconomyColumns
+
+logger = logging.getLogger(__name__)
+
+# Percentiles de balance que se reportan
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+# Un usuario es activo si tuvo actividad en los últimos N días
+ACTIVE_DAYS = 7
+# Límites de los tramos del histograma de balances (el último es abierto)
+BALANCE_BINS = (0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def _column(columns: EconomyColumns, field: str) -> np.ndarray:
+    # array('q') expone su buffer: NumPy lo usa sin copiarlo
+    return np.frombuffer(columns[field], dtype=np.int64) if len(columns) else np.zeros(0, dtype=np.int64)
+
+
+def gini(values: np.ndarray) -> float:
+    """Coeficiente de Gini (0 = todos igual, 1 = uno lo tiene todo)"""
+    total = values.sum()
+    if len(values) == 0 or total <= 0:
+        return 0.0
+    ordered = np.sort(values)
+    n = len(ordered)
+    ranks = np.arange(1, n + 1)
+    return float((2 * (ranks * ordered).sum()) / (n * total) - (n + 1) / n)
+
+
+def compute_economy_stats(columns: EconomyColumns, today: Optional[date] = None) -> Dict:
+    """Circulación, percentiles, Gini, niveles, actividad y juegos por día"""
+    today = (today or date.today()).toordinal()
+    users = len(columns)
+    coins = _column(columns, "coins")
+    levels = _column(columns, "level")
+    games = _column(columns, "games_played")
+    created = _column(columns, "created_at")
+    last_active = np.maximum(_column(columns, "last_daily"), _column(columns, "last_work"))
+
+    stats = {
+        "users": users,
+        "circulation": int(coins.sum()),
+        "total_earned": int(_column(columns, "total_earned").sum()),
+        "total_spent": int(_column(columns, "total_spent").sum()),
+        "mean_balance": float(coins.mean()) if users else 0.0,
+        "percentiles": {},
+        "gini": gini(coins),
+        "levels": {},
+        "balance_histogram": [],
+        "active_users": int(((last_active > 0) & (today - last_active < ACTIVE_DAYS)).sum()),
+        "games_played": int(games.sum()),
+        "games_per_day": 0.0,
+        "since": None,
+    }
+    if not users:
+        return stats
+
+    stats["percentiles"] = {
+        p: int(value) for p, value in zip(PERCENTILES, np.percentile(coins, PERCENTILES, method="lower"))
+    }
+
+    counts = np.bincount(np.clip(levels, 0, None))
+    stats["levels"] = {int(level): int(count) for level, count in enumerate(counts) if count}
+
+    edges = np.array(BALANCE_BINS[1:])
+    per_bin = np.bincount(np.searchsorted(edges, coins, side="right"), minlength=len(BALANCE_BINS))
+    stats["balance_histogram"] = [
+        (_bin_label(i), int(count)) for i, count in enumerate(per_bin)
+    ]
+
+    # Juegos por día desde la primera cuenta registrada
+    known = created[created > 0]
+    if len(known):
+        first = int(known.min())
+        stats["since"] = date.fromordinal(first).isoformat()
+        stats["games_per_day"] = stats["games_played"] / max(1, today - first + 1)
+
+    return stats
+
+
+def _bin_label(index: int) -> str:
+    low = BALANCE_BINS[index]
+    if index + 1 == len(BALANCE_BINS):
+        return f"{low:,}+"
+    return f"{low:,}-{BALANCE_BINS[index + 1] - 1:,}"
+
+
+def _draw_bars(draw: ImageDraw.ImageDraw, box, title: str, bars: List):
+    left, top, right, bottom = box
+    draw.text((left, top), title, fill=(255, 255, 255))
+    top += 20
+    label_height = 14
+    if not bars:
+        return
+    peak = max(count for _, count in bars) or 1
+    width = (right - left) / len(bars)
+    for i, (label, count) in enumerate(bars):
+        x0 = left + i * width + 2
+        x1 = left + (i + 1) * width - 2
+        height = (bottom - top - 2 * label_height) * count / peak
+        y1 = bottom - label_height
+        draw.rectangle((x0, y1 - height, x1, y1), fill=(88, 101, 242))
+        draw.text((x0, y1 - height - label_height), f"{count:,}", fill=(200, 200, 200))
+        draw.text((x0, y1 + 2), str(label), fill=(200, 200, 200))
+
+
+def render_histograms(stats: Dict) -> io.BytesIO:
+    """PNG con la distribución de balances y de niveles (bloqueante: usar en un hilo)"""
+    image = Image.new("RGB", (900, 520), (47, 49, 54))
+    draw = ImageDraw.Draw(image)
+    _draw_bars(draw, (20, 10, 880, 250), "Distribucion de balances (GameCoins)", stats["balance_histogram"])
+
+    levels = sorted(stats["levels"].items())
+    if len(levels) > 20:
+        # Los niveles altos se agrupan en el último tramo
+        head, tail = levels[:19], levels[19:]
+        levels = head + [(f"{tail[0][0]}+", sum(count for _, count in tail))]
+    _draw_bars(draw, (20, 270, 880, 510), "Usuarios por nivel", levels)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
@@ -1,14 +1,531 @@
+import sys
 import json
+import time
 import random
 import asyncio
-from datetime import datetime, timedelta
+import atexit
+import inspect
+import functools
+import contextvars
+import logging
+import threading
+from array import array
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from operator import attrgetter
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from data_manager import load_data, save_data
+from data_manager import load_data, save_data, store_lock
+from storage import dump
+from games import engine, rules
+from ledger import ledger
 import discord
 from discord import app_commands
+import config
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos se vuelca la actividad acumulada (mensajes, reacciones,
+# comandos) al progreso de las tareas diarias
+ACTIVITY_FLUSH_INTERVAL = getattr(config, "ACTIVITY_FLUSH_INTERVAL", 30.0)
+
+# Claves de idempotencia: segundos que se recuerdan y cuántas como máximo
+IDEMPOTENCY_TTL = getattr(config, "IDEMPOTENCY_TTL", 3600)
+IDEMPOTENCY_MAX_KEYS = getattr(config, "IDEMPOTENCY_MAX_KEYS", 10000)
+
+# Nombres de parámetro que identifican al usuario afectado por una operación
+USER_PARAMS = ("user_id", "from_user", "to_user")
+
+# Clave de idempotencia de la operación en curso: es la referencia (``ref``)
+# de los movimientos que anota en el libro mayor
+_operation_ref = contextvars.ContextVar("operation_ref", default=None)
+
+
+def _record(user_id: str, delta: int, reason: str, balance: int, ref: str = None):
+    """Anota un movimiento en el libro mayor con la referencia de la operación en curso"""
+    ledger.append(user_id, delta, reason, balance, _operation_ref.get() if ref is None else ref)
+
+
+class _TaskProgress(MutableMapping):
+    """Vista de una tarea dentro de ``DailyTasks`` (``progress``, ``completed``, ``claimed``)"""
+
+    __slots__ = ("_board", "_index")
+    KEYS = ("progress", "completed", "claimed")
+
+    def __init__(self, board: "DailyTasks", index: int):
+        self._board = board
+        self._index = index
+
+    def __getitem__(self, key):
+        board, index = self._board, self._index
+        if key == "progress":
+            return board._progress[index]
+        if key == "completed":
+            return bool(board._flags >> (2 * index) & 1)
+        if key == "claimed":
+            return bool(board._flags >> (2 * index + 1) & 1)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        board, index = self._board, self._index
+        if key == "progress":
+            progress = list(board._progress)
+            progress[index] = value
+            board._progress = tuple(progress)
+            return
+        if key not in ("completed", "claimed"):
+            raise KeyError(key)
+        bit = 1 << (2 * index + (key == "claimed"))
+        board._flags = board._flags | bit if value else board._flags & ~bit
+
+    def __delitem__(self, key):
+        raise TypeError("Los campos de una tarea no se pueden eliminar")
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class DailyTasks(MutableMapping):
+    """Progreso de las tareas diarias en tres atributos en lugar de un dict por tarea.
+
+    Se usa como el dict persistido (``tasks[task_id]["progress"] += 1``); las
+    tuplas de IDs se comparten entre todos los usuarios con las mismas tareas.
+    """
+
+    __slots__ = ("_ids", "_progress", "_flags")
+    _shared_ids = {}
+
+    def __init__(self, ids: Tuple[str, ...] = (), progress: Tuple[int, ...] = (), flags: int = 0):
+        self._ids = self._shared_ids.setdefault(ids, ids)
+        self._progress = progress
+        self._flags = flags
+
+    @classmethod
+    def from_value(cls, value):
+        """Compacta un dict persistido; lo devuelve tal cual si no tiene el formato esperado"""
+        if isinstance(value, cls) or not isinstance(value, dict):
+            return value
+        flags = 0
+        for index, task in enumerate(value.values()):
+            if (not isinstance(task, dict) or tuple(task) != _TaskProgress.KEYS
+                    or type(task["progress"]) is not int
+                    or type(task["completed"]) is not bool or type(task["claimed"]) is not bool):
+                return value
+            flags |= task["completed"] << (2 * index) | task["claimed"] << (2 * index + 1)
+        return cls(tuple(value), tuple(task["progress"] for task in value.values()), flags)
+
+    def __getitem__(self, task_id):
+        try:
+            return _TaskProgress(self, self._ids.index(task_id))
+        except ValueError:
+            raise KeyError(task_id) from None
+
+    def __setitem__(self, task_id, task):
+        if task_id not in self._ids:
+            ids = self._ids + (task_id,)
+            self._ids = self._shared_ids.setdefault(ids, ids)
+            self._progress += (0,)
+        view = self[task_id]
+        for key in _TaskProgress.KEYS:
+            view[key] = task[key]
+
+    def __delitem__(self, task_id):
+        tasks = self.to_dict()
+        del tasks[task_id]
+        compact = DailyTasks.from_value(tasks)
+        self._ids, self._progress, self._flags = compact._ids, compact._progress, compact._flags
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return f"DailyTasks({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        return {task_id: dict(self[task_id]) for task_id in self._ids}
+
+
+# Valor compartido para los campos que son una lista vacía (``achievements``)
+_EMPTY_LIST = object()
+
+
+class EconomyUser(MutableMapping):
+    """Registro económico de un usuario con ``__slots__`` en lugar de un dict.
+
+    Se usa igual que el dict persistido (``user["coins"] += 10``, ``.get``) y
+    ``to_dict()`` devuelve exactamente ese dict: los campos ausentes siguen
+    ausentes y los desconocidos se guardan aparte. Las tareas diarias se
+    compactan con ``DailyTasks`` y las fechas repetidas (día, trabajo) se
+    comparten entre usuarios.
+    """
+
+    FIELDS = (
+        "coins", "level", "xp", "daily_tasks", "last_daily", "job", "last_work", "total_earned",
+        "total_spent", "games_played", "games_won", "streak", "achievements", "created_at"
+    )
+    __slots__ = FIELDS + ("_extra",)
+    _FIELD_SET = frozenset(FIELDS)
+    _INTERNED = frozenset(("last_daily", "job"))
+
+    def __init__(self, record: Optional[Dict] = None):
+        self._extra = None
+        for key, value in (record or {}).items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, record):
+        return record if isinstance(record, cls) else cls(record)
+
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            if value is _EMPTY_LIST:
+                # Se materializa al leerla por si se modifica
+                value = []
+                setattr(self, key, value)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self._FIELD_SET:
+            if key == "daily_tasks":
+                value = DailyTasks.from_value(value)
+            elif key in self._INTERNED and type(value) is str:
+                value = sys.intern(value)
+            elif type(value) is list and not value:
+                value = _EMPTY_LIST
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"EconomyUser({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        """Formato persistido (el mismo dict que se cargó)"""
+        record = {}
+        for key in self:
+            value = self[key]
+            record[key] = value.to_dict() if isinstance(value, DailyTasks) else value
+        return record
+
+
+class EconomyColumns:
+    """Vista columnar de la economía: un array por campo numérico.
+
+    ``columns["coins"][i]`` es el balance de ``user_ids[i]``; pensado para
+    agregados (totales, medias, distribuciones) sin recorrer registros. Las
+    fechas (``DAY_FIELDS``) se guardan como ordinal del día (0 si no hay).
+    Como ``LeaderboardIndex``, se construye una vez y se actualiza en cada
+    guardado; ``snapshot()`` devuelve una copia para analizar fuera del lock.
+    """
+
+    FIELDS = ("coins", "level", "xp", "total_earned", "total_spent", "games_played", "games_won", "streak")
+    DAY_FIELDS = ("created_at", "last_daily", "last_work")
+
+    def __init__(self):
+        self.user_ids = []
+        self.columns = {field: array("q") for field in self.FIELDS + self.DAY_FIELDS}
+        self._positions = {}  # user_id -> fila
+        self._ordinals = {}   # "AAAA-MM-DD" -> ordinal (las fechas se repiten mucho)
+        self._store = None
+
+    def ensure(self, data: Dict):
+        """Construye las columnas la primera vez (o si el almacén se reemplazó)"""
+        if data is self._store:
+            return
+        self.__init__()
+        self._store = data
+        users = data.get("economy", {}).get("users", {})
+        self.user_ids = list(users)
+        self._positions = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        records = [users[user_id] for user_id in self.user_ids]
+        try:
+            # Camino rápido: lectura directa de los slots de EconomyUser, sin bucles en Python
+            for field in self.FIELDS:
+                self.columns[field] = array("q", map(attrgetter(field), records))
+            for field in self.DAY_FIELDS:
+                self.columns[field] = array("q", map(self._ordinal, map(attrgetter(field), records)))
+        except (AttributeError, TypeError):
+            # Registros dict, campos ausentes o valores no enteros
+            for field in self.FIELDS:
+                self.columns[field] = array("q", (self._number(record, field) for record in records))
+            for field in self.DAY_FIELDS:
+                self.columns[field] = array("q", (self._ordinal(record.get(field)) for record in records))
+
+    def update(self, data: Dict, user_id: str):
+        """Copia a las columnas los valores actuales de un usuario"""
+        if data is not self._store:
+            # Aún no se ha consultado: se construirá completa en la primera consulta
+            self._store = None
+            return
+        record = data["economy"]["users"].get(user_id)
+        if record is None:
+            return
+        row = self._positions.get(user_id)
+        if row is None:
+            row = self._positions[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            for column in self.columns.values():
+                column.append(0)
+        for field in self.FIELDS:
+            self.columns[field][row] = self._number(record, field)
+        for field in self.DAY_FIELDS:
+            self.columns[field][row] = self._ordinal(record.get(field))
+
+    def snapshot(self) -> "EconomyColumns":
+        """Copia independiente (los arrays se copian en bloque)"""
+        copy = EconomyColumns()
+        copy.user_ids = list(self.user_ids)
+        copy.columns = {field: array("q", column) for field, column in self.columns.items()}
+        return copy
+
+    @staticmethod
+    def _number(record, field: str) -> int:
+        # Acceso directo al slot en EconomyUser; .get para registros dict
+        value = getattr(record, field, 0) if isinstance(record, EconomyUser) else record.get(field)
+        return int(value or 0)
+
+    def _ordinal(self, value) -> int:
+        if not isinstance(value, str):
+            return 0
+        day = value[:10]
+        ordinal = self._ordinals.get(day)
+        if ordinal is None:
+            try:
+                ordinal = date.fromisoformat(day).toordinal()
+            except ValueError:
+                ordinal = 0
+            self._ordinals[day] = ordinal
+        return ordinal
+
+    def __getitem__(self, field: str) -> array:
+        return self.columns[field]
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def total(self, field: str) -> int:
+        return sum(self.columns[field])
+
+
+class LeaderboardIndex:
+    """Rankings ordenados por categoría, actualizados en cada cambio de un usuario.
+
+    Cada categoría es una lista ordenada de ``(-valor, user_id)``: el top-K es
+    un slice y la posición de un usuario una búsqueda binaria.
+    """
+
+    CATEGORIES = ("coins", "level", "total_earned", "games_won")
+
+    def __init__(self):
+        self._keys = None   # categoría -> [(-valor, user_id)]
+        self._values = {}   # user_id -> {categoría: valor}
+        self._store = None
+
+    def ensure(self, data: Dict):
+        """Construye el índice la primera vez (o si el almacén se reemplazó)"""
+        if self._keys is not None and data is self._store:
+            return
+        users = data.get("economy", {}).get("users", {})
+        self._store = data
+        self._values = {
+            user_id: {category: user_data.get(category, 0) for category in self.CATEGORIES}
+            for user_id, user_data in users.items()
+        }
+        self._keys = {
+            category: sorted((-values[category], user_id) for user_id, values in self._values.items())
+            for category in self.CATEGORIES
+        }
+
+    def update(self, data: Dict, user_id: str):
+        """Recoloca a un usuario tras modificar sus datos económicos"""
+        if self._keys is None or data is not self._store:
+            # Aún no se ha consultado: se construirá completo en la primera consulta
+            self._keys = None
+            return
+        user_data = data["economy"]["users"].get(user_id)
+        old = self._values.pop(user_id, None)
+        new = None if user_data is None else {
+            category: user_data.get(category, 0) for category in self.CATEGORIES
+        }
+        for category in self.CATEGORIES:
+            if old is not None and new is not None and old[category] == new[category]:
+                continue
+            keys = self._keys[category]
+            if old is not None:
+                idx = bisect_left(keys, (-old[category], user_id))
+                if idx < len(keys) and keys[idx] == (-old[category], user_id):
+                    del keys[idx]
+            if new is not None:
+                insort(keys, (-new[category], user_id))
+        if new is not None:
+            self._values[user_id] = new
+
+    def top(self, category: str, limit: int) -> List[Tuple[str, int]]:
+        return [(user_id, -value) for value, user_id in self._keys[category][:limit]]
+
+    def rank(self, category: str, user_id: str) -> Optional[int]:
+        values = self._values.get(user_id)
+        if values is None:
+            return None
+        return bisect_left(self._keys[category], (-values[category], user_id)) + 1
+
+
+class IdempotencyKeys:
+    """Operaciones ya aplicadas, con caducidad y un máximo de claves.
+
+    Se guardan en el almacén (``economy.idempotency``: clave -> caducidad y
+    resultado), así que sobreviven a un reinicio. El dict conserva el orden de
+    inserción, que es el de caducidad: purgar es quitar desde el principio.
+    """
+
+    TABLE = "economy_idempotency"
+
+    def __init__(self, ttl: float, max_keys: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+
+    @staticmethod
+    def _keys(data: Dict) -> Dict:
+        return data.setdefault("economy", {}).setdefault("idempotency", {})
+
+    def get(self, data: Dict, key: str) -> Optional[Dict]:
+        """Entrada vigente de una clave, o None si no se ha visto o ya caducó"""
+        entry = self._keys(data).get(key)
+        if entry is None or entry["expires"] <= time.time():
+            return None
+        return entry
+
+    def remember(self, data: Dict, key: str, result) -> List[Tuple[str, str]]:
+        """Registra una clave con su resultado; devuelve las filas tocadas para save_data"""
+        try:
+            # Copia: el resultado puede ser un registro vivo que seguirá cambiando
+            stored = json.loads(dump(result))
+        except TypeError:
+            # Sólo lo devuelven respuestas sin cambios (p. ej. el cooldown de work)
+            logger.debug(f"Resultado no serializable para la clave {key}, no se recuerda")
+            return []
+        
+        keys = self._keys(data)
+        now = time.time()
+        keys.pop(key, None)
+        keys[key] = {"expires": round(now + self.ttl, 3), "result": stored}
+        touched = [(self.TABLE, key)]
+        while keys:
+            oldest = next(iter(keys))
+            if len(keys) <= self.max_keys and keys[oldest]["expires"] > now:
+                break
+            del keys[oldest]
+            touched.append((self.TABLE, oldest))
+        return touched
+
+
+def idempotent(method):
+    """Añade ``idempotency_key=`` a una operación que mueve coins.
+
+    Con una clave (derivada del ID de la interacción), la operación se aplica
+    una sola vez: repetirla devuelve el resultado de la primera sin tocar nada.
+    La clave es también la referencia de sus movimientos en el libro mayor.
+    """
+    signature = inspect.signature(method)
+    user_params = [param for param in signature.parameters if param in USER_PARAMS]
+
+    @functools.wraps(method)
+    def wrapper(self, *args, idempotency_key: str = None, **kwargs):
+        if idempotency_key is None:
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        user_ids = [str(bound.arguments[param]) for param in user_params if param in bound.arguments]
+        # Una operación anidada (p. ej. el cobro de una compra) conserva la referencia de la exterior
+        token = _operation_ref.set(str(idempotency_key)) if _operation_ref.get() is None else None
+        try:
+            return economy.run_once(str(idempotency_key), user_ids, lambda: method(self, *args, **kwargs))
+        finally:
+            if token is not None:
+                _operation_ref.reset(token)
+
+    key_param = inspect.Parameter("idempotency_key", inspect.Parameter.KEYWORD_ONLY, default=None)
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), key_param])
+    return wrapper
+
+
+class TransactionUsers(dict):
+    """Registros de los usuarios de una transacción.
+
+    Cada registro se obtiene al leerlo por primera vez (creando al usuario si
+    no existe), así que una operación que se rechaza antes de tocar a un
+    usuario no lo crea.
+    """
+
+    def __init__(self, economy: "EconomySystem", user_ids):
+        super().__init__()
+        self._economy = economy
+        self._user_ids = frozenset(str(user_id) for user_id in user_ids)
+
+    def __missing__(self, user_id):
+        if user_id not in self._user_ids:
+            raise KeyError(user_id)
+        record = self[user_id] = self._economy.get_user_economy(user_id)
+        return record
+
 
 class EconomySystem:
     def __init__(self):
+        self.leaderboard_index = LeaderboardIndex()
+        self.columns_index = EconomyColumns()
+        # Actividad aún no aplicada a las tareas: user_id -> {"day": fecha, "tasks": {task_id: n}}
+        self._activity = {}
+        self._activity_lock = threading.Lock()
+        self._activity_task = None
+        # Un lock por usuario para transaction(); se crean al primer uso
+        self._user_locks = {}
+        self._user_locks_guard = threading.Lock()
+        # Usuarios que ya tienen movimientos en el libro mayor (ver _open_ledger)
+        self._ledger_opened = set()
+        self.idempotency = IdempotencyKeys(IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_KEYS)
+        # Almacén cuyos usuarios ya se convirtieron a EconomyUser
+        self._compact_store = None
+        # Generador de los minijuegos (un random.Random(semilla) los hace reproducibles)
+        self.rng = random
         self.daily_tasks = {
             "send_messages": {"name": "Enviar 10 mensajes", "reward": 50, "target": 10, "type": "counter"},
             "use_commands": {"name": "Usar 5 comandos", "reward": 30, "target": 5, "type": "counter"},
@@ -53,13 +570,69 @@ class EconomySystem:
             "dice": {"name": "🎲 Dados", "min_bet": 20, "max_bet": 300},
             "slots": {"name": "🎰 Tragamonedas", "min_bet": 50, "max_bet": 1000},
             "blackjack": {"name": "🃏 Blackjack", "min_bet": 30, "max_bet": 800},
-            "roulette": {"name": "🎯 Ruleta", "min_bet": 25, "max_bet": 600}
+            "roulette": {"name": "🎯 Ruleta", "min_bet": 25, "max_bet": 600, "max_bets": 10}
         }
 
+    def _compact_users(self, data: Dict):
+        """Convierte los usuarios cargados a EconomyUser (una vez por almacén)"""
+        if data is self._compact_store:
+            return
+        with store_lock:
+            users = data.get("economy", {}).get("users", {})
+            for user_id, record in users.items():
+                users[user_id] = EconomyUser.from_dict(record)
+            self._compact_store = data
+
+    def columns(self) -> EconomyColumns:
+        """Instantánea columnar de todos los usuarios para consultas agregadas"""
+        data = load_data()
+        self._compact_users(data)
+        with store_lock:
+            self.columns_index.ensure(data)
+            return self.columns_index.snapshot()
+
     def get_user_economy(self, user_id: str) -> Dict:
         """Obtiene los datos económicos de un usuario"""
-        # Siempre cargar datos frescos
+        # El almacén residente siempre está actualizado
         data = load_data()
+        self._compact_users(data)
+        users = data.get("economy", {}).get("users", {})
+        if user_id in users:
+            if user_id not in self._ledger_opened:
+                self._open_ledger(user_id, users[user_id])
+            return users[user_id]
+        
+        with store_lock:
+            return self._create_user_economy(data, user_id)
+
+    def _open_ledger(self, user_id: str, user_economy: Dict):
+        """Anota el saldo de un usuario anterior al libro mayor la primera vez que opera.
+        
+        ``ledger.count`` usa el índice del libro, que main.py construye al
+        arrancar en un hilo (``ledger.build_index``).
+        """
+        with self._get_user_lock(user_id):
+            if user_id in self._ledger_opened:
+                return
+            if not ledger.count(user_id):
+                ledger.append(user_id, user_economy["coins"], "Saldo inicial", user_economy["coins"])
+            self._ledger_opened.add(user_id)
+
+    def peek_user_economy(self, user_id: str) -> Dict:
+        """Datos económicos de un usuario sin crear ni guardar nada.
+        
+        Para mostrar (balance, autocompletado, vistas). Si el usuario no existe
+        se devuelve un registro inicial virtual que no se guarda: el usuario se
+        crea de verdad en su primera operación. El resultado no debe modificarse.
+        """
+        data = load_data()
+        self._compact_users(data)
+        user_economy = data.get("economy", {}).get("users", {}).get(user_id)
+        if user_economy is None:
+            return self._new_user_record()
+        return user_economy
+
+    def _create_user_economy(self, data: Dict, user_id: str) -> Dict:
         if "economy" not in data:
             data["economy"] = {
                 "users": {},
@@ -75,34 +648,49 @@ class EconomySystem:
             data["economy"]["users"] = {}
         
         if user_id not in data["economy"]["users"]:
-            data["economy"]["users"][user_id] = {
-                "coins": 100,  # GameCoins iniciales
-                "level": 1,
-                "xp": 0,
-                "daily_tasks": {},
-                "last_daily": None,
-                "job": None,
-                "last_work": None,
-                "total_earned": 100,
-                "total_spent": 0,
-                "games_played": 0,
-                "games_won": 0,
-                "streak": 0,
-                "achievements": [],
-                "created_at": datetime.now().isoformat()
-            }
-            save_data(data)
+            new_user = data["economy"]["users"][user_id] = self._new_user_record()
+            ledger.append(user_id, new_user["coins"], "Saldo inicial", new_user["coins"])
+            self._ledger_opened.add(user_id)
+            self._save_user(data, user_id)
         
-        # Devolver una copia fresca de los datos
-        fresh_data = load_data()
-        return fresh_data["economy"]["users"][user_id]
+        return data["economy"]["users"][user_id]
 
-    def add_coins(self, user_id: str, amount: int, reason: str = "Unknown") -> int:
+    def _new_user_record(self) -> EconomyUser:
+        """Registro económico inicial de un usuario"""
+        return EconomyUser({
+            "coins": 100,  # GameCoins iniciales
+            "level": 1,
+            "xp": 0,
+            "daily_tasks": {},
+            "last_daily": None,
+            "job": None,
+            "last_work": None,
+            "total_earned": 100,
+            "total_spent": 0,
+            "games_played": 0,
+            "games_won": 0,
+            "streak": 0,
+            "achievements": [],
+            "created_at": datetime.now().isoformat()
+        })
+
+    @idempotent
+    def add_coins(self, user_id: str, amount: int, reason: str = "Unknown", ref: str = None) -> int:
         """Añade GameCoins a un usuario"""
-        data = load_data()
-        user_economy = self.get_user_economy(user_id)
+        with self.transaction([user_id]):
+            data = load_data()
+            user_economy = self.get_user_economy(user_id)
+            self._apply_earnings(user_id, user_economy, amount, reason, ref)
+            
+            data["economy"]["users"][user_id] = user_economy
+            self._save_user(data, user_id)
+            return user_economy["coins"]
+
+    def _apply_earnings(self, user_id: str, user_economy: Dict, amount: int, reason: str, ref: str = None):
+        """Suma coins, XP y el bonus de subida de nivel a un registro (sin guardar)"""
         user_economy["coins"] += amount
         user_economy["total_earned"] += amount
+        _record(user_id, amount, reason, user_economy["coins"], ref)
         
         # Añadir XP (1 XP por cada 10 coins ganados)
         xp_gained = amount // 10
@@ -117,61 +705,132 @@ class EconomySystem:
             bonus = new_level * 50
             user_economy["coins"] += bonus
             user_economy["total_earned"] += bonus
-        
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
-        return user_economy["coins"]
+            _record(user_id, bonus, f"Bonus nivel {new_level}", user_economy["coins"], ref)
 
-    def remove_coins(self, user_id: str, amount: int, reason: str = "Unknown") -> bool:
+    @idempotent
+    def remove_coins(self, user_id: str, amount: int, reason: str = "Unknown", ref: str = None) -> bool:
         """Remueve GameCoins de un usuario"""
-        # Cargar datos frescos para evitar condiciones de carrera
-        data = load_data()
-        
-        # Asegurar que la estructura existe
-        if "economy" not in data:
-            data["economy"] = {"users": {}}
-        if "users" not in data["economy"]:
-            data["economy"]["users"] = {}
-        
-        # Obtener datos del usuario directamente de data
-        if user_id not in data["economy"]["users"]:
-            # Crear usuario si no existe
-            data["economy"]["users"][user_id] = {
-                "coins": 100,
-                "level": 1,
-                "xp": 0,
-                "daily_tasks": {},
-                "last_daily": None,
-                "job": None,
-                "last_work": None,
-                "total_earned": 100,
-                "total_spent": 0,
-                "games_played": 0,
-                "games_won": 0,
-                "streak": 0,
-                "achievements": [],
-                "created_at": datetime.now().isoformat()
-            }
-        
-        user_economy = data["economy"]["users"][user_id]
-        
-        if user_economy["coins"] >= amount:
-            user_economy["coins"] -= amount
-            user_economy["total_spent"] += amount
+        # La transacción crea al usuario si no existe y evita que otra operación se intercale
+        with self.transaction([user_id]) as users:
+            data = load_data()
+            user_economy = users[user_id]
             
-            # Guardar inmediatamente y forzar escritura
-            save_data(data)
-            return True
-        
-        return False
+            if user_economy["coins"] >= amount:
+                user_economy["coins"] -= amount
+                user_economy["total_spent"] += amount
+                _record(user_id, -amount, reason, user_economy["coins"], ref)
+                
+                # Guardar inmediatamente y forzar escritura
+                self._save_user(data, user_id)
+                return True
+            
+            return False
+
+    def _save_user(self, data: Dict, user_id: str):
+        """Guarda el almacén indicando que sólo cambió la fila económica de este usuario"""
+        self._save_users(data, [user_id])
+
+    def _save_users(self, data: Dict, user_ids: List[str]):
+        with store_lock:
+            for user_id in user_ids:
+                self.leaderboard_index.update(data, user_id)
+                self.columns_index.update(data, user_id)
+            save_data(data, touched=[("economy_users", user_id) for user_id in user_ids])
+
+    def _get_user_lock(self, user_id: str) -> threading.RLock:
+        with self._user_locks_guard:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+
+    @contextmanager
+    def transaction(self, user_ids):
+        """Ejecuta un bloque con los usuarios indicados bloqueados.
+        
+        Sólo se toman los locks de esos usuarios, siempre en el mismo orden
+        (por ID), así que dos transacciones cruzadas no se interbloquean y
+        las de usuarios distintos corren en paralelo; el lock del almacén se
+        toma únicamente al crear o guardar registros. Dentro del bloque
+        comprobar un saldo y cobrarlo es atómico. Devuelve los registros
+        económicos de los usuarios (``TransactionUsers``). Es reentrante,
+        pero al ser locks de hilo el bloque no debe contener ``await``.
+        
+            with economy.transaction([from_user, to_user]) as users:
+                ...
+        """
+        with self.user_locks(user_ids):
+            yield TransactionUsers(self, user_ids)
+
+    @contextmanager
+    def user_locks(self, user_ids):
+        """Toma los locks de los usuarios (ordenados por ID) sin leer ni crear sus registros"""
+        locks = [self._get_user_lock(user_id) for user_id in sorted({str(u) for u in user_ids})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def run_once(self, key: str, user_ids: List[str], operation):
+        """Ejecuta ``operation()`` salvo que ``key`` ya se haya aplicado.
+        
+        La comprobación, la operación y el registro de la clave ocurren en la
+        misma transacción, así que un reintento concurrente espera y recibe el
+        resultado de la primera ejecución. El registro de claves es compartido
+        por todos los usuarios (y lo recorre el volcado): se lee y se modifica,
+        purga incluida, con el lock del almacén.
+        """
+        with self.transaction(user_ids):
+            with store_lock:
+                entry = self.idempotency.get(load_data(), key)
+            if entry is not None:
+                logger.info(f"Operación repetida ignorada (clave {key})")
+                return entry["result"]
+            
+            result = operation()
+            with store_lock:
+                data = load_data()
+                touched = self.idempotency.remember(data, key, result)
+                if touched:
+                    save_data(data, touched=touched)
+            return result
+
+    def get_balance(self, user_id: str) -> int:
+        """Obtiene los GameCoins actuales de un usuario"""
+        return self.peek_user_economy(user_id)["coins"]
 
     def _calculate_level(self, xp: int) -> int:
         """Calcula el nivel basado en XP"""
         return int((xp / 100) ** 0.5) + 1
 
     def get_daily_tasks(self, user_id: str) -> Dict:
-        """Obtiene las tareas diarias del usuario"""
-        user_economy = self.get_user_economy(user_id)
+        """Obtiene las tareas diarias del usuario (sólo lectura).
+        
+        El cambio de día y la actividad acumulada se aplican sobre una copia:
+        lo que se muestra es el progreso real, pero nada se escribe hasta el
+        siguiente cambio de verdad (progreso, reclamo o volcado de actividad).
+        """
+        user_economy = self.peek_user_economy(user_id)
+        tasks = {
+            "last_daily": user_economy.get("last_daily"),
+            "daily_tasks": {task_id: dict(task) for task_id, task in user_economy.get("daily_tasks", {}).items()}
+        }
+        self._refresh_daily_tasks(tasks)
+        
+        today = datetime.now().date().isoformat()
+        with self._activity_lock:
+            entry = self._activity.get(user_id)
+            pending = dict(entry["tasks"]) if entry and entry["day"] == today else {}
+        for task_id, amount in pending.items():
+            self._apply_task_progress(tasks, task_id, amount)
+        
+        return tasks["daily_tasks"]
+
+    def _refresh_daily_tasks(self, user_economy: Dict) -> bool:
+        """Reinicia o completa las tareas del día en el registro; indica si cambió"""
         today = datetime.now().date().isoformat()
         
         # Resetear tareas si es un nuevo día
@@ -184,39 +843,95 @@ class EconomySystem:
                     "claimed": False
                 }
             user_economy["last_daily"] = today
-            
-            data = load_data()
-            data["economy"]["users"][user_id] = user_economy
-            save_data(data)
-        else:
-            # Verificar si hay nuevas tareas que agregar
-            if "daily_tasks" not in user_economy:
-                user_economy["daily_tasks"] = {}
-            
-            updated = False
-            for task_id, task_info in self.daily_tasks.items():
-                if task_id not in user_economy["daily_tasks"]:
-                    user_economy["daily_tasks"][task_id] = {
-                        "progress": 0,
-                        "completed": False,
-                        "claimed": False
-                    }
-                    updated = True
-            
-            if updated:
-                data = load_data()
-                data["economy"]["users"][user_id] = user_economy
-                save_data(data)
+            return True
         
-        return user_economy["daily_tasks"]
+        # Verificar si hay nuevas tareas que agregar
+        if "daily_tasks" not in user_economy:
+            user_economy["daily_tasks"] = {}
+        
+        updated = False
+        for task_id, task_info in self.daily_tasks.items():
+            if task_id not in user_economy["daily_tasks"]:
+                user_economy["daily_tasks"][task_id] = {
+                    "progress": 0,
+                    "completed": False,
+                    "claimed": False
+                }
+                updated = True
+        return updated
 
     def update_task_progress(self, user_id: str, task_id: str, amount: int = 1) -> bool:
         """Actualiza el progreso de una tarea"""
         if task_id not in self.daily_tasks:
             return False
         
-        daily_tasks = self.get_daily_tasks(user_id)
-        task = daily_tasks.get(task_id)
+        with self.transaction([user_id]):
+            data = load_data()
+            user_economy = self.get_user_economy(user_id)
+            refreshed = self._refresh_daily_tasks(user_economy)
+            progressed = self._apply_task_progress(user_economy, task_id, amount)
+            if refreshed or progressed:
+                self._save_user(data, user_id)
+            return progressed
+
+    def record_activity(self, user_id: str, task_id: str, amount: int = 1):
+        """Acumula actividad en memoria; se aplica a las tareas por lotes.
+        
+        Pensado para eventos frecuentes (mensajes, reacciones, comandos): no
+        lee ni escribe el almacén. La actividad de un día que termina sin
+        aplicarse se descarta, igual que se reiniciaría la tarea.
+        """
+        if task_id not in self.daily_tasks:
+            return
+        today = datetime.now().date().isoformat()
+        with self._activity_lock:
+            entry = self._activity.get(user_id)
+            if entry is None or entry["day"] != today:
+                entry = self._activity[user_id] = {"day": today, "tasks": {}}
+            entry["tasks"][task_id] = entry["tasks"].get(task_id, 0) + amount
+
+    def flush_activity(self, user_id: str = None) -> int:
+        """Aplica la actividad acumulada (de un usuario o de todos) con una escritura por usuario"""
+        with self._activity_lock:
+            if user_id is None:
+                pending, self._activity = self._activity, {}
+            else:
+                entry = self._activity.pop(user_id, None)
+                pending = {user_id: entry} if entry else {}
+        
+        today = datetime.now().date().isoformat()
+        applied = 0
+        for pending_user, entry in pending.items():
+            if entry["day"] != today:
+                continue
+            with self.transaction([pending_user]):
+                data = load_data()
+                user_economy = self.get_user_economy(pending_user)
+                changed = self._refresh_daily_tasks(user_economy)
+                for task_id, amount in entry["tasks"].items():
+                    changed = self._apply_task_progress(user_economy, task_id, amount) or changed
+                if changed:
+                    self._save_user(data, pending_user)
+            applied += 1
+        return applied
+
+    async def _activity_flush_loop(self):
+        while True:
+            await asyncio.sleep(ACTIVITY_FLUSH_INTERVAL)
+            try:
+                self.flush_activity()
+            except Exception as e:
+                logger.error(f"Error al aplicar actividad acumulada: {e}")
+
+    async def start_activity_flush(self):
+        """Arranca el volcado periódico de la actividad acumulada en el loop actual"""
+        if self._activity_task is not None and not self._activity_task.done():
+            return
+        self._activity_task = asyncio.create_task(self._activity_flush_loop())
+
+    def _apply_task_progress(self, user_economy: Dict, task_id: str, amount: int = 1) -> bool:
+        """Suma progreso a una tarea del registro (sin guardar)"""
+        task = user_economy["daily_tasks"].get(task_id)
         
         if task and not task["completed"]:
             task["progress"] += amount
@@ -225,35 +940,38 @@ class EconomySystem:
             if task["progress"] >= target:
                 task["progress"] = target
                 task["completed"] = True
-            
-            data = load_data()
-            data["economy"]["users"][user_id]["daily_tasks"] = daily_tasks
-            save_data(data)
             return True
         
         return False
 
+    @idempotent
     def claim_task_reward(self, user_id: str, task_id: str) -> Optional[int]:
         """Reclama la recompensa de una tarea completada"""
-        daily_tasks = self.get_daily_tasks(user_id)
-        task = daily_tasks.get(task_id)
+        if task_id not in self.daily_tasks:
+            return None
         
-        if task and task["completed"] and not task["claimed"]:
-            reward = self.daily_tasks[task_id]["reward"]
-            self.add_coins(user_id, reward, f"Tarea diaria: {self.daily_tasks[task_id]['name']}")
-            
-            task["claimed"] = True
+        # La actividad acumulada puede ser la que completa la tarea
+        self.flush_activity(user_id)
+        with self.transaction([user_id]) as users:
             data = load_data()
-            data["economy"]["users"][user_id]["daily_tasks"] = daily_tasks
-            save_data(data)
+            user_economy = users[user_id]
+            refreshed = self._refresh_daily_tasks(user_economy)
+            task = user_economy["daily_tasks"].get(task_id)
+            
+            if not (task and task["completed"] and not task["claimed"]):
+                if refreshed:
+                    self._save_user(data, user_id)
+                return None
             
+            reward = self.daily_tasks[task_id]["reward"]
+            task["claimed"] = True
+            self._apply_earnings(user_id, user_economy, reward, f"Tarea diaria: {self.daily_tasks[task_id]['name']}")
+            self._save_user(data, user_id)
             return reward
-        
-        return None
 
     def get_available_jobs(self, user_id: str) -> List[Dict]:
         """Obtiene los trabajos disponibles para un usuario"""
-        user_economy = self.get_user_economy(user_id)
+        user_economy = self.peek_user_economy(user_id)
         available = []
         
         for job_id, job_info in self.jobs.items():
@@ -277,41 +995,42 @@ class EconomySystem:
         user_economy = self.get_user_economy(user_id)
         user_economy["job"] = job_id
         data["economy"]["users"][user_id] = user_economy
-        save_data(data)
+        self._save_user(data, user_id)
         return True
 
+    @idempotent
     def work(self, user_id: str) -> Optional[Dict]:
         """Permite al usuario trabajar y ganar dinero"""
-        user_economy = self.get_user_economy(user_id)
-        job_id = user_economy.get("job")
-        
+        # Sin trabajo no hay nada que hacer: no se crea el usuario
+        job_id = self.peek_user_economy(user_id).get("job")
         if not job_id or job_id not in self.jobs:
             return None
         
-        # Verificar cooldown
-        last_work = user_economy.get("last_work")
-        if last_work:
-            last_work_time = datetime.fromisoformat(last_work)
-            cooldown_hours = self.jobs[job_id]["cooldown"]
-            if datetime.now() < last_work_time + timedelta(hours=cooldown_hours):
-                time_left = (last_work_time + timedelta(hours=cooldown_hours)) - datetime.now()
-                return {"error": "cooldown", "time_left": time_left}
-        
-        # Calcular salario con variación aleatoria (±20%)
-        base_salary = self.jobs[job_id]["salary"]
-        variation = random.uniform(0.8, 1.2)
-        salary = int(base_salary * variation)
-        
-        # Bonus por nivel
-        level_bonus = user_economy["level"] * 5
-        total_earned = salary + level_bonus
-        
-        self.add_coins(user_id, total_earned, f"Trabajo: {self.jobs[job_id]['name']}")
-        
-        data = load_data()
-        user_economy["last_work"] = datetime.now().isoformat()
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
+        with self.transaction([user_id]) as users:
+            data = load_data()
+            user_economy = users[user_id]
+            
+            # Verificar cooldown
+            last_work = user_economy.get("last_work")
+            if last_work:
+                last_work_time = datetime.fromisoformat(last_work)
+                cooldown_hours = self.jobs[job_id]["cooldown"]
+                if datetime.now() < last_work_time + timedelta(hours=cooldown_hours):
+                    time_left = (last_work_time + timedelta(hours=cooldown_hours)) - datetime.now()
+                    return {"error": "cooldown", "time_left": time_left}
+            
+            # Calcular salario con variación aleatoria (±20%)
+            base_salary = self.jobs[job_id]["salary"]
+            variation = random.uniform(0.8, 1.2)
+            salary = int(base_salary * variation)
+            
+            # Bonus por nivel
+            level_bonus = user_economy["level"] * 5
+            total_earned = salary + level_bonus
+            
+            self._apply_earnings(user_id, user_economy, total_earned, f"Trabajo: {self.jobs[job_id]['name']}")
+            user_economy["last_work"] = datetime.now().isoformat()
+            self._save_user(data, user_id)
         
         return {
             "success": True,
@@ -321,208 +1040,108 @@ class EconomySystem:
             "job_name": self.jobs[job_id]["name"]
         }
 
+    @idempotent
     def play_coinflip(self, user_id: str, bet: int, choice: str) -> Dict:
         """Juego de cara o cruz"""
         if not self._validate_bet("coinflip", bet):
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Coinflip bet"):
-            return {"error": "insufficient_funds"}
-        
-        result = random.choice(["cara", "cruz"])
-        won = choice.lower() == result
-        
-        if won:
-            winnings = bet * 2
-            self.add_coins(user_id, winnings, "Coinflip win")
-            self._update_game_stats(user_id, True)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": True, "winnings": winnings}
-        else:
-            self._update_game_stats(user_id, False)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": False, "lost": bet}
+        with self.transaction([user_id]):
+            if not self.can_afford(user_id, bet):
+                return {"error": "insufficient_funds"}
+            
+            result = engine.flip_coin(self.rng)
+            won = choice.lower() == result
+            
+            if won:
+                winnings = rules.payout(bet, rules.COINFLIP_MULTIPLIER)
+                self.settle_game(user_id, bet, winnings, True, game="Coinflip")
+                return {"success": True, "result": result, "won": True, "winnings": winnings}
+            else:
+                self.settle_game(user_id, bet, 0, False, game="Coinflip")
+                return {"success": True, "result": result, "won": False, "lost": bet}
 
+    @idempotent
     def play_dice(self, user_id: str, bet: int, guess: int) -> Dict:
         """Juego de dados"""
-        if not self._validate_bet("dice", bet) or guess < 1 or guess > 6:
+        if not self._validate_bet("dice", bet) or guess < 1 or guess > rules.DICE_FACES:
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Dice bet"):
-            return {"error": "insufficient_funds"}
-        
-        result = random.randint(1, 6)
-        won = guess == result
-        
-        if won:
-            winnings = bet * 6  # 6x multiplier for exact guess
-            self.add_coins(user_id, winnings, "Dice win")
-            self._update_game_stats(user_id, True)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": True, "winnings": winnings}
-        else:
-            self._update_game_stats(user_id, False)
-            self.update_task_progress(user_id, "play_minigames")
-            return {"success": True, "result": result, "won": False, "lost": bet}
+        with self.transaction([user_id]):
+            if not self.can_afford(user_id, bet):
+                return {"error": "insufficient_funds"}
+            
+            result = engine.roll_die(self.rng)
+            won = guess == result
+            
+            if won:
+                winnings = rules.payout(bet, rules.DICE_MULTIPLIER)
+                self.settle_game(user_id, bet, winnings, True, game="Dice")
+                return {"success": True, "result": result, "won": True, "winnings": winnings}
+            else:
+                self.settle_game(user_id, bet, 0, False, game="Dice")
+                return {"success": True, "result": result, "won": False, "lost": bet}
 
+    @idempotent
     def play_slots(self, user_id: str, bet: int) -> Dict:
         """Juego de tragamonedas"""
         if not self._validate_bet("slots", bet):
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Slots bet"):
-            return {"error": "insufficient_funds"}
-        
-        symbols = ["🍒", "🍋", "🍊", "🍇", "⭐", "💎"]
-        result = [random.choice(symbols) for _ in range(3)]
-        
-        # Calcular multiplicador
-        if result[0] == result[1] == result[2]:  # Tres iguales
-            if result[0] == "💎":
-                multiplier = 10
-            elif result[0] == "⭐":
-                multiplier = 5
-            else:
-                multiplier = 3
-        elif result[0] == result[1] or result[1] == result[2] or result[0] == result[2]:  # Dos iguales
-            multiplier = 1.5
-        else:
-            multiplier = 0
+        with self.transaction([user_id]):
+            if not self.can_afford(user_id, bet):
+                return {"error": "insufficient_funds"}
+            return self._play_slots(user_id, bet)
+
+    def _play_slots(self, user_id: str, bet: int) -> Dict:
+        reels = engine.spin_slots(self.rng)
+        result = [rules.SLOT_SYMBOLS[reel] for reel in reels]
+        multiplier = rules.slots_multiplier(reels)
         
         if multiplier > 0:
-            winnings = int(bet * multiplier)
-            self.add_coins(user_id, winnings, "Slots win")
-            self._update_game_stats(user_id, True)
-            self.update_task_progress(user_id, "play_minigames")
+            winnings = rules.payout(bet, multiplier)
+            self.settle_game(user_id, bet, winnings, True, game="Slots")
             return {"success": True, "result": result, "won": True, "winnings": winnings, "multiplier": multiplier}
         else:
-            self._update_game_stats(user_id, False)
-            self.update_task_progress(user_id, "play_minigames")
+            self.settle_game(user_id, bet, 0, False, game="Slots")
             return {"success": True, "result": result, "won": False, "lost": bet}
 
+    @idempotent
     def play_blackjack(self, user_id: str, bet: int) -> Dict:
         """Juego de Blackjack"""
         if not self._validate_bet("blackjack", bet):
             return {"error": "invalid_bet"}
         
-        if not self.remove_coins(user_id, bet, "Blackjack bet"):
-            return {"error": "insufficient_funds"}
-        
-        # Crear baraja
-        suits = ["♠️", "♥️", "♦️", "♣️"]
-        ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-        deck = [(rank, suit) for suit in suits for rank in ranks]
-        random.shuffle(deck)
-        
-        # Repartir cartas iniciales
-        player_hand = [deck.pop(), deck.pop()]
-        dealer_hand = [deck.pop(), deck.pop()]
-        
-        # Calcular valores
-        def calculate_hand_value(hand):
-            value = 0
-            aces = 0
-            for card, _ in hand:
-                if card in ["J", "Q", "K"]:
-                    value += 10
-                elif card == "A":
-                    aces += 1
-                    value += 11
-                else:
-                    value += int(card)
-            
-            # Ajustar ases
-            while value > 21 and aces > 0:
-                value -= 10
-                aces -= 1
-            
-            return value
-        
-        player_value = calculate_hand_value(player_hand)
-        dealer_value = calculate_hand_value(dealer_hand)
-        
-        # Verificar blackjack natural
-        player_blackjack = player_value == 21
-        dealer_blackjack = dealer_value == 21
-        
-        if player_blackjack and dealer_blackjack:
-            # Empate
-            self.add_coins(user_id, bet, "Blackjack tie")
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "tie", "won": False, "tied": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "returned": bet
-            }
-        elif player_blackjack:
-            # Blackjack del jugador
-            winnings = int(bet * 2.5)  # Blackjack paga 3:2
-            self.add_coins(user_id, winnings, "Blackjack win")
-            self._update_game_stats(user_id, True)
-            return {
-                "success": True, "result": "blackjack", "won": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "winnings": winnings
-            }
-        elif dealer_blackjack:
-            # Blackjack del dealer
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "dealer_blackjack", "won": False,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "lost": bet
-            }
-        
-        # Juego normal - el dealer toma cartas hasta 17
-        while dealer_value < 17:
-            dealer_hand.append(deck.pop())
-            dealer_value = calculate_hand_value(dealer_hand)
-        
-        # Determinar ganador
-        if dealer_value > 21:
-            # Dealer se pasa
-            winnings = bet * 2
-            self.add_coins(user_id, winnings, "Blackjack win")
-            self._update_game_stats(user_id, True)
-            return {
-                "success": True, "result": "dealer_bust", "won": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "winnings": winnings
-            }
-        elif player_value > dealer_value:
-            # Jugador gana
-            winnings = bet * 2
-            self.add_coins(user_id, winnings, "Blackjack win")
-            self._update_game_stats(user_id, True)
-            return {
-                "success": True, "result": "player_wins", "won": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "winnings": winnings
-            }
-        elif player_value == dealer_value:
-            # Empate
-            self.add_coins(user_id, bet, "Blackjack tie")
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "tie", "won": False, "tied": True,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "returned": bet
-            }
+        with self.transaction([user_id]):
+            if not self.can_afford(user_id, bet):
+                return {"error": "insufficient_funds"}
+            return self._play_blackjack(user_id, bet)
+
+    def _play_blackjack(self, user_id: str, bet: int) -> Dict:
+        # Repartir y jugar la mano (el jugador se planta con dos cartas)
+        hand = engine.AutoBlackjack(self.rng)
+        outcome = hand.outcome
+        player_hand = [engine.card_tuple(card) for card in hand.player]
+        dealer_hand = [engine.card_tuple(card) for card in hand.dealer]
+        player_value, dealer_value = hand.player_value, hand.dealer_value
+        
+        won = hand.multiplier > 1
+        amount = rules.payout(bet, hand.multiplier)
+        self.settle_game(user_id, bet, amount, won, count_task=False, game="Blackjack")
+        
+        result = {
+            "success": True, "result": outcome, "won": won,
+            "player_hand": player_hand, "dealer_hand": dealer_hand,
+            "player_value": player_value, "dealer_value": dealer_value
+        }
+        if outcome == "tie":
+            result["tied"] = True
+            result["returned"] = amount
+        elif won:
+            result["winnings"] = amount
         else:
-            # Dealer gana
-            self._update_game_stats(user_id, False)
-            return {
-                "success": True, "result": "dealer_wins", "won": False,
-                "player_hand": player_hand, "dealer_hand": dealer_hand,
-                "player_value": player_value, "dealer_value": dealer_value,
-                "lost": bet
-            }
+            result["lost"] = bet
+        return result
 
     def _validate_bet(self, game: str, bet: int) -> bool:
         """Valida si la apuesta es válida para el juego"""
@@ -532,160 +1151,167 @@ class EconomySystem:
         game_info = self.minigames[game]
         return game_info["min_bet"] <= bet <= game_info["max_bet"]
 
+    @idempotent
     def play_roulette(self, user_id: str, bet_amount: int, bet_type: str, bet_value: str = None) -> Dict:
-        """Juega a la ruleta"""
-        import random
-        
-        # Validar apuesta
-        if bet_amount < self.minigames["roulette"]["min_bet"] or bet_amount > self.minigames["roulette"]["max_bet"]:
+        """Juega a la ruleta con una sola apuesta"""
+        result = self._play_roulette_bets(user_id, [(bet_type, bet_value, bet_amount)])
+        if "error" not in result:
+            result["bet_type"] = bet_type
+            result["bet_value"] = bet_value
+        return result
+
+    @idempotent
+    def play_roulette_bets(self, user_id: str, bets: List[Tuple[str, str, int]]) -> Dict:
+        """Un giro de ruleta con varias apuestas ``(tipo, valor, cantidad)``.
+        
+        Todas se liquidan juntas: el pago sale de la tabla de 37 casillas de
+        la jugada y la partida se guarda con una sola escritura.
+        """
+        return self._play_roulette_bets(user_id, bets)
+
+    def _validate_roulette_bets(self, bets) -> Optional[List[Tuple[str, str, int]]]:
+        limits = self.minigames["roulette"]
+        if not bets or len(bets) > limits["max_bets"]:
+            return None
+        valid = []
+        for bet_type, bet_value, amount in bets:
+            key = rules.roulette_bet_key(bet_type, bet_value)
+            if key is None or not isinstance(amount, int) or not limits["min_bet"] <= amount <= limits["max_bet"]:
+                return None
+            valid.append((key[0], key[1], amount))
+        return valid
+
+    def _play_roulette_bets(self, user_id: str, bets) -> Dict:
+        bets = self._validate_roulette_bets(bets)
+        if bets is None:
             return {"error": "invalid_bet"}
+        total_bet = sum(amount for _, _, amount in bets)
         
-        user_economy = self.get_user_economy(user_id)
-        if user_economy["coins"] < bet_amount:
-            return {"error": "insufficient_funds"}
-        
-        # Quitar la apuesta
-        self.remove_coins(user_id, bet_amount, "Roulette bet")
-        
-        # Generar número ganador (0-36)
-        winning_number = random.randint(0, 36)
-        
-        # Determinar color del número ganador
-        red_numbers = [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36]
-        black_numbers = [2, 4, 6, 8, 10, 11, 13, 15, 17, 20, 22, 24, 26, 28, 29, 31, 33, 35]
-        
-        if winning_number == 0:
-            winning_color = "green"
-        elif winning_number in red_numbers:
-            winning_color = "red"
-        else:
-            winning_color = "black"
-        
-        # Calcular ganancia según el tipo de apuesta
-        winnings = 0
-        win = False
-        
-        if bet_type == "number" and bet_value:
-            # Apuesta a número específico (paga 35:1)
-            if int(bet_value) == winning_number:
-                winnings = bet_amount * 36  # 35:1 + apuesta original
-                win = True
-        elif bet_type == "color":
-            # Apuesta a color (paga 1:1)
-            if bet_value == winning_color and winning_number != 0:
-                winnings = bet_amount * 2  # 1:1 + apuesta original
-                win = True
-        elif bet_type == "even_odd":
-            # Apuesta a par/impar (paga 1:1)
-            if winning_number != 0:
-                is_even = winning_number % 2 == 0
-                if (bet_value == "even" and is_even) or (bet_value == "odd" and not is_even):
-                    winnings = bet_amount * 2
-                    win = True
-        elif bet_type == "high_low":
-            # Apuesta a alto/bajo (paga 1:1)
-            if winning_number != 0:
-                if (bet_value == "low" and 1 <= winning_number <= 18) or (bet_value == "high" and 19 <= winning_number <= 36):
-                    winnings = bet_amount * 2
-                    win = True
-        
-        # Añadir ganancias si ganó
-        if win:
-            self.add_coins(user_id, winnings, "Roulette win")
-        
-        # Actualizar estadísticas
-        user_economy = self.get_user_economy(user_id)
-        user_economy["games_played"] += 1
-        if win:
-            user_economy["games_won"] += 1
-        
-        # Actualizar progreso de tarea de minijuegos
-        self.update_task_progress(user_id, "play_minigames")
-        
-        data = load_data()
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
+        with self.transaction([user_id]):
+            if not self.can_afford(user_id, total_bet):
+                return {"error": "insufficient_funds"}
+            
+            # Pago de la jugada completa para cada casilla; el giro sólo elige una
+            slip = engine.roulette_slip(bets)
+            winning_number = engine.spin_roulette(self.rng)
+            winnings = slip[winning_number]
+            won = winnings > total_bet
+            
+            # Cobrar apuestas, pagar ganancias y actualizar estadísticas de una vez
+            user_economy = self.settle_game(user_id, total_bet, winnings, won, game="Roulette")
         
         return {
-            "result": "win" if win else "lose",
+            "result": "win" if won else "lose",
             "winning_number": winning_number,
-            "winning_color": winning_color,
-            "bet_type": bet_type,
-            "bet_value": bet_value,
-            "winnings": winnings if win else 0,
+            "winning_color": rules.ROULETTE_COLORS[winning_number],
+            "bets": [
+                {"bet_type": bet_type, "bet_value": bet_value, "amount": amount,
+                 "payout": rules.payout(amount, rules.roulette_multiplier(bet_type, bet_value, winning_number))}
+                for bet_type, bet_value, amount in bets
+            ],
+            "total_bet": total_bet,
+            "winnings": winnings,
             "new_balance": user_economy["coins"]
         }
 
-    def _update_game_stats(self, user_id: str, won: bool):
-        """Actualiza las estadísticas de juegos del usuario"""
-        data = load_data()
-        user_economy = self.get_user_economy(user_id)
-        
+    def _apply_game_stats(self, user_economy: Dict, won: bool):
         user_economy["games_played"] += 1
         if won:
             user_economy["games_won"] += 1
             user_economy["streak"] += 1
         else:
             user_economy["streak"] = 0
-        
-        data["economy"]["users"][user_id] = user_economy
-        save_data(data)
+
+    def can_afford(self, user_id: str, amount: int) -> bool:
+        """Indica si el usuario tiene al menos ``amount`` GameCoins"""
+        return self.peek_user_economy(user_id)["coins"] >= amount
+
+    @idempotent
+    def settle_game(self, user_id: str, bet: int, payout: int, won: bool,
+                    count_task: bool = True, game: str = "Minijuego", ref: str = None) -> Optional[Dict]:
+        """Liquida una partida completa con una sola escritura.
+        
+        Cobra la apuesta, paga ``payout`` (con su XP y subida de nivel),
+        actualiza estadísticas y racha y, si ``count_task``, el progreso de la
+        tarea de minijuegos. Apuesta y pago quedan en el libro mayor con
+        ``game`` como motivo. Devuelve el registro del usuario, o None sin
+        modificar nada si no le alcanza para la apuesta.
+        """
+        with self.transaction([user_id]):
+            data = load_data()
+            user_economy = self.get_user_economy(user_id)
+            if user_economy["coins"] < bet:
+                return None
+            
+            user_economy["coins"] -= bet
+            user_economy["total_spent"] += bet
+            _record(user_id, -bet, f"{game} bet", user_economy["coins"], ref)
+            if payout > 0:
+                self._apply_earnings(user_id, user_economy, payout, f"{game} win" if won else f"{game} return", ref)
+            self._apply_game_stats(user_economy, won)
+            if count_task:
+                self._refresh_daily_tasks(user_economy)
+                self._apply_task_progress(user_economy, "play_minigames")
+            
+            self._save_user(data, user_id)
+            return user_economy
 
     def get_leaderboard(self, category: str = "coins", limit: int = 10) -> List[Dict]:
         """Obtiene el leaderboard de la economía"""
+        if category not in LeaderboardIndex.CATEGORIES:
+            return []
+        
         data = load_data()
         economy_data = data.get("economy", {}).get("users", {})
-        
-        # Ordenar usuarios según la categoría
-        if category == "coins":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["coins"], reverse=True)
-        elif category == "level":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["level"], reverse=True)
-        elif category == "total_earned":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["total_earned"], reverse=True)
-        elif category == "games_won":
-            sorted_users = sorted(economy_data.items(), key=lambda x: x[1]["games_won"], reverse=True)
-        else:
-            return []
+        with store_lock:
+            self.leaderboard_index.ensure(data)
+            top_users = self.leaderboard_index.top(category, limit)
         
         leaderboard = []
-        for i, (user_id, user_data) in enumerate(sorted_users[:limit]):
+        for i, (user_id, value) in enumerate(top_users):
+            user_data = economy_data[user_id]
             leaderboard.append({
                 "rank": i + 1,
                 "user_id": user_id,
-                "value": user_data[category],
+                "value": value,
                 "level": user_data["level"],
                 "coins": user_data["coins"]
             })
         
         return leaderboard
 
+    @idempotent
     def transfer_coins(self, from_user: str, to_user: str, amount: int) -> bool:
         """Transfiere GameCoins entre usuarios"""
         if amount <= 0:
             return False
         
-        # Verificar que el usuario tenga suficientes coins
-        from_economy = self.get_user_economy(from_user)
-        if from_economy["coins"] < amount:
+        if from_user == to_user:
             return False
         
-        # Realizar la transferencia
-        if self.remove_coins(from_user, amount, f"Transfer to {to_user}"):
-            self.add_coins(to_user, amount, f"Transfer from {from_user}")
+        # Comprobar, cobrar y abonar sin que nada se intercale, con una sola escritura
+        with self.transaction([from_user, to_user]) as users:
+            from_economy = users[from_user]
+            if from_economy["coins"] < amount:
+                return False
+            
+            from_economy["coins"] -= amount
+            from_economy["total_spent"] += amount
+            _record(from_user, -amount, f"Transfer to {to_user}", from_economy["coins"])
+            self._apply_earnings(to_user, users[to_user], amount, f"Transfer from {from_user}")
+            self._save_users(load_data(), [from_user, to_user])
             return True
-        
-        return False
 
     def get_user_rank(self, user_id: str, category: str = "coins") -> Optional[int]:
         """Obtiene el ranking de un usuario en una categoría específica"""
-        leaderboard = self.get_leaderboard(category, limit=1000)  # Obtener más usuarios para encontrar el rank
-        
-        for entry in leaderboard:
-            if entry["user_id"] == user_id:
-                return entry["rank"]
+        if category not in LeaderboardIndex.CATEGORIES:
+            return None
         
-        return None
+        with store_lock:
+            self.leaderboard_index.ensure(load_data())
+            return self.leaderboard_index.rank(category, user_id)
 
 # Instancia global del sistema de economía
-economy = EconomySystem()
\ No newline at end of file
+economy = EconomySystem()
+# Se registra después que el volcado de data_manager, así que corre antes al salir
+atexit.register(economy.flush_activity)
\ No newline at end of file
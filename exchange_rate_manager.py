@@ -1,213 +1,291 @@
-import aiohttp
 import asyncio
-import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional
-from data_manager import load_data, save_data
+
+import numpy as np
+
+import config
+import currencies
+from data_manager import load_data, save_data, store_lock
+from http_client import http_client
+from rate_history import RATE_HISTORY_FILE, RateHistory
 
 logger = logging.getLogger(__name__)
 
+# Segundos que una tabla de tasas se considera actualizada
+EXCHANGE_RATE_TTL = getattr(config, "EXCHANGE_RATE_TTL", 3600)
+
+
 class ExchangeRateManager:
+    """Tasas cruzadas compartidas en memoria entre las monedas del registro.
+
+    De las tasas con base USD de la API se deriva en una sola operación la
+    matriz ``cruzada[i, j]`` (1 unidad de la moneda i -> moneda j), así que
+    convertir entre cualquier par es una búsqueda. Cuando la tabla
+    caduca se sigue sirviendo la anterior mientras una única actualización
+    (compartida por todos los que la pidan) consulta la API en segundo plano.
+    La última tabla obtenida se guarda en el almacén (``exchange_rates``) y
+    todas se añaden al historial (``rate_history``), cuya versión guardan los
+    tickets.
+    """
+
+    TABLE = "exchange_rates"
+
     def __init__(self):
         # API gratuita de exchangerate-api.com usando USD como base
         self.api_url = "https://api.exchangerate-api.com/v4/latest/USD"
-        self.cache_duration = timedelta(hours=1)  # Actualizar cada hora
+        self.api_base = "USD"
+        self.cache_duration = timedelta(seconds=EXCHANGE_RATE_TTL)
+        # Los precios del catálogo están en MXN
+        self.base_currency = currencies.BASE_CURRENCY
+        self.currencies = currencies.CURRENCIES
         self.fallback_rates = {
-            "ARS": 72.3,  # 1 MXN = 72.3 ARS
-            "COP": 216.0,
-            "USD": 0.054 # 
+            currency: rate for currency, rate in currencies.FALLBACK_RATES.items()
+            if currency != self.base_currency
         }
-    
+        self._index = {currency: i for i, currency in enumerate(self.currencies)}
+        fallback = np.array([currencies.FALLBACK_RATES.get(currency, 1.0) for currency in self.currencies])
+        self._set_table(fallback / fallback[self._index[self.api_base]])
+        self._last_updated: Optional[datetime] = None
+        self._source = "Tasas predeterminadas"
+        self._loaded = False
+        # Aumenta cada vez que cambia la tabla (ver price_matrix)
+        self.version = 0
+        self.history = RateHistory(RATE_HISTORY_FILE, self.currencies)
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    # --- Tabla en memoria ---
+
+    def _ensure_loaded(self):
+        """Carga la última tabla guardada en el almacén (sólo la primera vez)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with store_lock:
+                cache_data = dict(load_data().get("exchange_rates") or {})
+            # Las cachés anteriores guardaban la base USD como si fuera MXN: se ignoran
+            if cache_data.get("base") != self.api_base:
+                return
+            self._apply(cache_data.get("rates", {}), datetime.fromisoformat(cache_data["last_updated"]),
+                        cache_data.get("source", "Desconocido"))
+            # Una tabla guardada antes de que existiera el historial (o sin llegar
+            # a él) se añade, para que los tickets con su versión se puedan resolver
+            latest = self.history.latest()
+            if latest is None or self.rate_version > latest[0]:
+                self.history.append(self.rate_version, cache_data["rates"])
+        except Exception as e:
+            logger.error(f"Error leyendo caché de tasas de cambio: {e}")
+
+    def _set_table(self, per_api_base: np.ndarray):
+        """Deriva la matriz cruzada de las tasas (unidades por ``api_base``) de cada moneda"""
+        self._per_api_base = per_api_base
+        self._cross = np.outer(1.0 / per_api_base, per_api_base)
+        self._rates = dict(zip(self.currencies, self._cross[self._index[self.base_currency]].tolist()))
+
+    def _apply(self, api_rates: Dict[str, float], last_updated: datetime, source: str):
+        """Reemplaza la tabla a partir de tasas con base ``api_base``"""
+        if self.base_currency not in api_rates:
+            raise ValueError(f"Faltan tasas de {self.base_currency}")
+        fresh = np.array([api_rates.get(currency, np.nan) for currency in self.currencies], dtype=float)
+        # Si falta alguna moneda (o llega inválida) se conserva la tasa anterior
+        self._set_table(np.where(fresh > 0, fresh, self._per_api_base))
+        self._last_updated = last_updated
+        self._source = source
+        self.version += 1
+
+    @property
+    def rate_version(self) -> Optional[float]:
+        """Versión de la tabla actual (su timestamp en el historial); None con tasas predeterminadas"""
+        self._ensure_loaded()
+        if self._last_updated is None:
+            return None
+        return round(self._last_updated.timestamp(), 3)
+
+    def rate_stamp(self, currency: str = "MXN") -> Dict:
+        """Versión y tasa vigentes, para guardar con un ticket.
+
+        Con tasas predeterminadas ``version`` es None y ``fallback`` es True: la
+        tasa es la de ``currencies.FALLBACK_RATES`` y no está en el historial.
+        """
+        version = self.rate_version
+        return {"version": version, "fallback": version is None, "currency": currency,
+                "rate": self.convert(1, currency)}
+
+    def rates_at(self, timestamp: float) -> Optional[Dict]:
+        """Tabla (1 MXN -> moneda) vigente en un momento, según el historial"""
+        entry = self.history.at(timestamp)
+        if entry is None:
+            return None
+        version, api_rates = entry
+        if self.base_currency not in api_rates:
+            return None
+        base = api_rates[self.base_currency]
+        return {
+            "version": version,
+            "last_updated": datetime.fromtimestamp(version),
+            "rates": {currency: rate / base for currency, rate in api_rates.items()}
+        }
+
+    def is_stale(self) -> bool:
+        self._ensure_loaded()
+        return self._last_updated is None or datetime.now() - self._last_updated > self.cache_duration
+
+    def get_rates(self) -> Dict[str, float]:
+        """Tabla actual (1 MXN -> moneda), revalidándola en segundo plano si caducó"""
+        self.revalidate()
+        return dict(self._rates)
+
+    def cross_rate(self, source_currency: str, target_currency: str) -> Optional[float]:
+        """1 unidad de ``source_currency`` en ``target_currency`` (None si no está soportada)"""
+        i = self._index.get(source_currency)
+        j = self._index.get(target_currency)
+        if i is None or j is None:
+            return None
+        return float(self._cross[i, j])
+
+    def convert(self, amount: float, target_currency: str, source_currency: str = "MXN") -> float:
+        """Convierte entre dos monedas con la tabla actual (sin esperar a la API)"""
+        self.revalidate()
+        if target_currency == source_currency:
+            return amount
+        rate = self.cross_rate(source_currency, target_currency)
+        if rate is None:
+            unsupported = source_currency if source_currency not in self._index else target_currency
+            logger.warning(f"Moneda {unsupported} no soportada")
+            return amount
+        return amount * rate
+
+    # --- Actualización ---
+
+    def revalidate(self):
+        """Si la tabla caducó, lanza una actualización sin esperarla"""
+        if not self.is_stale():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin loop (scripts, pruebas) se sirven las tasas actuales
+            return
+        self._start_refresh()
+
+    def _start_refresh(self) -> asyncio.Task:
+        # Una sola consulta a la API a la vez: las demás esperan a la misma
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def refresh(self) -> bool:
+        """Actualiza la tabla desde la API (compartiendo una consulta en curso)"""
+        return await asyncio.shield(self._start_refresh())
+
+    async def _refresh(self) -> bool:
+        fresh_rates = await self._fetch_fresh_rates()
+        if not fresh_rates:
+            return False
+        try:
+            self._apply(fresh_rates, datetime.now(), "exchangerate-api.com")
+        except ValueError as e:
+            logger.error(f"Respuesta de tasas de cambio incompleta: {e}")
+            return False
+        self._cache_rates(fresh_rates)
+        self.history.append(self.rate_version, fresh_rates)
+        logger.info("Tasas de cambio actualizadas desde API")
+        return True
+
+    async def _refresh_loop(self):
+        while True:
+            if self.is_stale():
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error(f"Error actualizando tasas de cambio: {e}")
+            await asyncio.sleep(min(EXCHANGE_RATE_TTL, 300))
+
+    async def start_refresh(self):
+        """Arranca la actualización periódica de la tabla en el loop actual"""
+        if self._loop_task is not None and not self._loop_task.done():
+            return
+        self._loop_task = asyncio.create_task(self._refresh_loop())
+
     async def get_exchange_rates(self) -> Dict[str, float]:
-        """Obtiene las tasas de cambio, usando caché si está disponible y actualizado"""
+        """Obtiene las tasas de cambio (1 MXN -> moneda), esperando a la API sólo si nunca se obtuvieron"""
         try:
-            # Verificar caché primero
-            cached_rates = self._get_cached_rates()
-            if cached_rates:
-                logger.info("Usando tasas de cambio desde caché")
-                return cached_rates
-            
-            # Obtener tasas frescas de la API
-            fresh_rates = await self._fetch_fresh_rates()
-            if fresh_rates:
-                self._cache_rates(fresh_rates)
-                logger.info("Tasas de cambio actualizadas desde API")
-                return fresh_rates
-            
-            # Fallback a tasas predeterminadas
-            logger.warning("Usando tasas de cambio predeterminadas")
-            return self.fallback_rates
-            
+            if self.is_stale() and self._last_updated is None:
+                await self.refresh()
+            if self._last_updated is None:
+                logger.warning("Usando tasas de cambio predeterminadas")
+            rates = self.get_rates()
+            return {currency: rate for currency, rate in rates.items() if currency != self.base_currency}
         except Exception as e:
             logger.error(f"Error obteniendo tasas de cambio: {e}")
             return self.fallback_rates
-    
-    def _get_cached_rates(self) -> Optional[Dict[str, float]]:
-        """Obtiene tasas de cambio del caché si están actualizadas"""
+
+    async def _fetch_fresh_rates(self) -> Optional[Dict[str, float]]:
+        """Obtiene tasas de cambio frescas de la API (base ``api_base``)"""
         try:
-            data = load_data()
-            
-            if "exchange_rates" not in data:
+            response = await http_client.get(self.api_url)
+            if response.from_cache:
+                # La API no responde: se sigue sirviendo la tabla actual
                 return None
-            
-            cache_data = data["exchange_rates"]
-            
-            # Verificar si el caché ha expirado
-            last_updated = datetime.fromisoformat(cache_data.get("last_updated", ""))
-            if datetime.now() - last_updated > self.cache_duration:
+            if response.status == 200:
+                rates = response.data.get("rates", {})
+                # Sólo las monedas que usamos
+                return {
+                    currency: float(rates[currency])
+                    for currency in self.currencies if currency in rates
+                }
+            else:
+                logger.error(f"API respondió con código {response.status}")
                 return None
-            
-            rates = cache_data.get("rates", {})
-            
-            # Verificar que tenemos todas las monedas necesarias (sin MXN ya que es la base)
-            required_currencies = ["ARS", "COP", "USD"]
-            if all(currency in rates for currency in required_currencies):
-                return {currency: rates[currency] for currency in required_currencies}
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error leyendo caché de tasas de cambio: {e}")
-            return None
-    
-    async def _fetch_fresh_rates(self) -> Optional[Dict[str, float]]:
-        """Obtiene tasas de cambio frescas de la API"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.api_url, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        rates = data.get("rates", {})
-                        
-                        # Extraer solo las monedas que necesitamos (sin MXN ya que es la base)
-                        required_currencies = ["ARS", "COP", "USD"]
-                        filtered_rates = {}
-                        
-                        for currency in required_currencies:
-                            if currency in rates:
-                                filtered_rates[currency] = float(rates[currency])
-                            else:
-                                # Si falta alguna moneda, usar fallback
-                                filtered_rates[currency] = self.fallback_rates[currency]
-                        
-                        return filtered_rates
-                    
-                    else:
-                        logger.error(f"API respondió con código {response.status}")
-                        return None
-                        
-        except asyncio.TimeoutError:
-            logger.error("Timeout al obtener tasas de cambio de la API")
-            return None
+
         except Exception as e:
             logger.error(f"Error obteniendo tasas de cambio de la API: {e}")
             return None
-    
+
     def _cache_rates(self, rates: Dict[str, float]):
-        """Guarda las tasas de cambio en caché"""
+        """Guarda las tasas de cambio en el almacén (sólo sus filas)"""
         try:
-            data = load_data()
-            
-            data["exchange_rates"] = {
-                "rates": rates,
-                "last_updated": datetime.now().isoformat(),
-                "source": "exchangerate-api.com"
-            }
-            
-            save_data(data)
+            with store_lock:
+                data = load_data()
+                data["exchange_rates"] = {
+                    "rates": rates,
+                    "base": self.api_base,
+                    "last_updated": self._last_updated.isoformat(),
+                    "source": self._source
+                }
+                save_data(data, touched=[(self.TABLE, key) for key in data["exchange_rates"]])
             logger.info("Tasas de cambio guardadas en caché")
-            
+
         except Exception as e:
             logger.error(f"Error guardando tasas de cambio en caché: {e}")
-    
+
     def get_country_info(self) -> Dict[str, Dict]:
-        """Retorna información de países con sus monedas"""
-        return {
-            "mexico": {
-                "name": "🇲🇽 México",
-                "currency": "MXN",
-                "currency_symbol": "$",
-                "flag": "🇲🇽"
-            },
-            "argentina": {
-                "name": "🇦🇷 Argentina", 
-                "currency": "ARS",
-                "currency_symbol": "$",
-                "flag": "🇦🇷"
-            },
-            "colombia": {
-                "name": "🇨🇴 Colombia",
-                "currency": "COP",
-                "currency_symbol": "$",
-                "flag": "🇨🇴"
-            },
-            "usa": {
-                "name": "🇺🇸 Estados Unidos",
-                "currency": "USD",
-                "currency_symbol": "$",
-                "flag": "🇺🇸"
-            }
-        }
-    
+        """Retorna información de países con sus monedas (registro ``currencies``, no modificar)"""
+        return currencies.COUNTRIES
+
     async def convert_price(self, price_mxn: float, target_currency: str) -> float:
-        """Convierte precio de MXN a moneda local"""
-        try:
-            # Si la moneda objetivo es MXN, no hay conversión
-            if target_currency == "MXN":
-                return price_mxn
-            
-            # Usar directamente las tasas fallback que son correctas (MXN a target)
-            if target_currency in self.fallback_rates:
-                return price_mxn * self.fallback_rates[target_currency]
-            else:
-                logger.warning(f"Moneda {target_currency} no soportada")
-                return price_mxn
-                
-        except Exception as e:
-            logger.error(f"Error convirtiendo precio: {e}")
-            # Fallback calculation
-            return price_mxn * self.fallback_rates.get(target_currency, 1.0)
-    
+        """Convierte precio de MXN a moneda local (ver ``convert``)"""
+        return self.convert(price_mxn, target_currency)
+
     async def get_rate_info(self) -> Dict:
         """Obtiene información sobre las tasas de cambio actuales"""
-        try:
-            data = load_data()
-            
-            if "exchange_rates" in data:
-                cache_data = data["exchange_rates"]
-                last_updated = cache_data.get("last_updated", "Desconocido")
-                source = cache_data.get("source", "Desconocido")
-                
-                # Convertir timestamp a formato legible
-                try:
-                    last_updated_dt = datetime.fromisoformat(last_updated)
-                    last_updated_str = last_updated_dt.strftime("%d/%m/%Y %H:%M")
-                except:
-                    last_updated_str = "Desconocido"
-                
-                return {
-                    "last_updated": last_updated_str,
-                    "source": source,
-                    "rates": cache_data.get("rates", {}),
-                    "is_cached": True
-                }
-            
+        self._ensure_loaded()
+        if self._last_updated is None:
             return {
                 "last_updated": "Nunca",
                 "source": "Tasas predeterminadas",
                 "rates": self.fallback_rates,
                 "is_cached": False
             }
-            
-        except Exception as e:
-            logger.error(f"Error obteniendo información de tasas: {e}")
-            return {
-                "last_updated": "Error",
-                "source": "Tasas predeterminadas",
-                "rates": self.fallback_rates,
-                "is_cached": False
-            }
+        return {
+            "last_updated": self._last_updated.strftime("%d/%m/%Y %H:%M"),
+            "source": self._source,
+            "rates": {currency: rate for currency, rate in self._rates.items() if currency != self.base_currency},
+            "is_cached": True
+        }
 
 # Instancia global del manager
-exchange_rate_manager = ExchangeRateManager()
\ No newline at end of file
+exchange_rate_manager = ExchangeRateManager()
@@ -0,0 +1,244 @@
+"""Motor de los minijuegos: reglas puras, sin economía ni Discord.
+
+Cada función recibe el generador aleatorio (``rng``, cualquier objeto con la
+interfaz de ``random.Random``; por defecto el módulo ``random``) y devuelve
+el resultado de la ronda. No cobra ni paga nada: quien la llama liquida la
+partida después en un solo paso (``EconomySystem.settle_game``). Con un
+``random.Random(semilla)`` las partidas son reproducibles, lo que usan el
+simulador y las pruebas.
+
+Las cartas son enteros 0-51 (``palo * 13 + rango``, el mismo orden en que se
+construía la baraja de tuplas) y sus atributos se leen de tablas
+precalculadas; ``card_tuple`` da el par ``(rango, palo)`` para mostrarlas.
+"""
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from games import rules
+
+Card = int
+
+DECK_SIZE = len(rules.CARD_SUITS) * len(rules.CARD_RANKS)
+_RANKS_PER_SUIT = len(rules.CARD_RANKS)
+
+# Atributos de cada carta, indexados por la carta
+CARD_RANK = tuple(rules.CARD_RANKS[card % _RANKS_PER_SUIT] for card in range(DECK_SIZE))
+CARD_TUPLE = tuple((CARD_RANK[card], rules.CARD_SUITS[card // _RANKS_PER_SUIT]) for card in range(DECK_SIZE))
+# Valor con el As contando 1; la mano suma 10 más si tiene As y no se pasa
+CARD_HARD_VALUE = tuple(1 if rank == "A" else rules.RANK_VALUES[rank] for rank in CARD_RANK)
+CARD_IS_ACE = tuple(rank == "A" for rank in CARD_RANK)
+
+
+def _rng(rng):
+    return random if rng is None else rng
+
+
+# --- Juegos de una tirada ---
+
+def flip_coin(rng=None) -> str:
+    return _rng(rng).choice(rules.COINFLIP_SIDES)
+
+
+def roll_die(rng=None) -> int:
+    return _rng(rng).randint(1, rules.DICE_FACES)
+
+
+def spin_slots(rng=None) -> Tuple[int, int, int]:
+    """Tres carretes (índices en ``rules.SLOT_SYMBOLS``)"""
+    rng = _rng(rng)
+    symbols = len(rules.SLOT_SYMBOLS)
+    return (rng.randrange(symbols), rng.randrange(symbols), rng.randrange(symbols))
+
+
+def spin_roulette(rng=None) -> int:
+    return _rng(rng).randrange(rules.ROULETTE_POCKETS)
+
+
+RouletteBet = Tuple[str, str, int]  # (tipo, valor, GameCoins apostados)
+
+
+def roulette_slip(bets: Sequence[RouletteBet]) -> Tuple[int, ...]:
+    """Pago total de varias apuestas para cada una de las 37 casillas.
+
+    Se arma una vez por giro sumando las tablas de cada apuesta; liquidar es
+    leer la casilla que salió.
+    """
+    totals = [0] * rules.ROULETTE_POCKETS
+    for bet_type, bet_value, amount in bets:
+        for number, multiplier in enumerate(rules.roulette_payout_table(bet_type, bet_value)):
+            if multiplier:
+                totals[number] += rules.payout(amount, multiplier)
+    return tuple(totals)
+
+
+# --- Blackjack ---
+
+def new_deck(rng=None) -> List[Card]:
+    """Baraja mezclada; se reparte con ``pop()`` desde el final"""
+    deck = list(range(DECK_SIZE))
+    _rng(rng).shuffle(deck)
+    return deck
+
+
+def hand_value(hand: Sequence[Card]) -> int:
+    """Valor de una mano (equivale a ``rules.hand_value`` sobre los rangos)"""
+    value = 0
+    ace = False
+    for card in hand:
+        value += CARD_HARD_VALUE[card]
+        ace = ace or CARD_IS_ACE[card]
+    return value + 10 if ace and value <= 11 else value
+
+
+def is_natural(hand: Sequence[Card]) -> bool:
+    return len(hand) == 2 and hand_value(hand) == 21
+
+
+def dealer_play(deck: List[Card], dealer: List[Card]) -> int:
+    """El dealer pide carta hasta llegar a ``rules.DEALER_STANDS_ON``"""
+    value = hand_value(dealer)
+    while value < rules.DEALER_STANDS_ON:
+        dealer.append(deck.pop())
+        value = hand_value(dealer)
+    return value
+
+
+class AutoBlackjack:
+    """Mano de ``play_blackjack``: el jugador se planta con sus dos cartas"""
+    __slots__ = ("player", "dealer", "player_value", "dealer_value", "outcome")
+
+    def __init__(self, rng=None, deck: Optional[List[Card]] = None):
+        deck = new_deck(rng) if deck is None else deck
+        self.player = [deck.pop(), deck.pop()]
+        self.dealer = [deck.pop(), deck.pop()]
+        self.player_value = hand_value(self.player)
+        self.dealer_value = hand_value(self.dealer)
+        player_natural = self.player_value == 21
+        dealer_natural = self.dealer_value == 21
+        if not player_natural and not dealer_natural:
+            self.dealer_value = dealer_play(deck, self.dealer)
+        self.outcome = rules.blackjack_outcome(
+            self.player_value, self.dealer_value, player_natural, dealer_natural
+        )
+
+    @property
+    def multiplier(self) -> float:
+        return rules.BLACKJACK_PAYOUTS[self.outcome]
+
+
+class BlackjackGame:
+    """Estado de una partida interactiva (``BlackjackView``).
+
+    Las acciones sólo cambian el estado; cobrar el double, el split o el
+    seguro y pagar el resultado le corresponde a la vista.
+    """
+    __slots__ = ("deck", "player", "dealer", "bet", "original_bet",
+                 "has_split", "has_insurance", "finished", "outcome")
+
+    def __init__(self, bet: int, rng=None, deck: Optional[List[Card]] = None):
+        self.deck = new_deck(rng) if deck is None else deck
+        self.player = [self.deck.pop(), self.deck.pop()]
+        self.dealer = [self.deck.pop(), self.deck.pop()]
+        self.bet = bet
+        self.original_bet = bet
+        self.has_split = False
+        self.has_insurance = False
+        self.finished = False
+        self.outcome: Optional[str] = None
+
+    @property
+    def player_value(self) -> int:
+        return hand_value(self.player)
+
+    @property
+    def dealer_value(self) -> int:
+        return hand_value(self.dealer)
+
+    @property
+    def dealer_natural(self) -> bool:
+        return is_natural(self.dealer)
+
+    @property
+    def insurance_cost(self) -> int:
+        return self.original_bet // 2
+
+    # Acciones disponibles (sólo con las dos cartas iniciales)
+    def can_hit(self) -> bool:
+        return not self.finished and self.player_value < 21
+
+    def can_double(self) -> bool:
+        return not self.finished and len(self.player) == 2
+
+    def can_insure(self) -> bool:
+        return (not self.finished and not self.has_insurance and len(self.player) == 2
+                and CARD_IS_ACE[self.dealer[1]])
+
+    def can_split(self) -> bool:
+        return (not self.finished and not self.has_split and len(self.player) == 2
+                and CARD_RANK[self.player[0]] == CARD_RANK[self.player[1]])
+
+    def hit(self) -> Card:
+        card = self.deck.pop()
+        self.player.append(card)
+        return card
+
+    def double(self) -> Card:
+        """Dobla la apuesta y toma exactamente una carta (luego hay que plantarse)"""
+        self.bet *= 2
+        return self.hit()
+
+    def split(self) -> Card:
+        # Versión simplificada: se duplica la apuesta y se sigue con una sola mano
+        self.has_split = True
+        self.bet *= 2
+        return self.hit()
+
+    def take_insurance(self):
+        self.has_insurance = True
+
+    def finish(self) -> str:
+        """Juega la mano del dealer y fija ``outcome`` (clave de ``rules.BLACKJACK_PAYOUTS``)"""
+        if self.finished:
+            return self.outcome
+        self.finished = True
+        player_value = self.player_value
+        dealer_natural = self.dealer_natural
+        dealer_value = self.dealer_value
+        if player_value <= 21 and not dealer_natural:
+            dealer_value = dealer_play(self.deck, self.dealer)
+
+        if player_value > 21:
+            self.outcome = "player_bust"
+        elif dealer_natural and player_value != 21:
+            self.outcome = "dealer_blackjack"
+        elif dealer_value > 21:
+            self.outcome = "dealer_bust"
+        elif is_natural(self.player) and not dealer_natural:
+            self.outcome = "blackjack"
+        elif player_value > dealer_value:
+            self.outcome = "player_wins"
+        elif player_value == dealer_value:
+            self.outcome = "tie"
+        else:
+            self.outcome = "dealer_wins"
+        return self.outcome
+
+    @property
+    def payout(self) -> int:
+        """GameCoins que devuelve la mano terminada (la apuesta ya se cobró)"""
+        return rules.payout(self.bet, rules.BLACKJACK_PAYOUTS[self.outcome])
+
+    @property
+    def won(self) -> bool:
+        return rules.BLACKJACK_PAYOUTS[self.outcome] > 1
+
+    @property
+    def insurance_payout(self) -> int:
+        """El seguro paga 2:1 (más lo apostado) si el dealer tiene blackjack"""
+        if self.has_insurance and self.dealer_natural:
+            return self.insurance_cost * rules.INSURANCE_PAYOUT
+        return 0
+
+
+def card_tuple(card: Card) -> Tuple[str, str]:
+    return CARD_TUPLE[card]
@@ -0,0 +1,160 @@
+"""Reglas de pago de los minijuegos, compartidas por el juego real y el simulador.
+
+Cada regla es una tabla (multiplicador por resultado) y no una cadena de
+``if``: ``EconomySystem`` la consulta para una partida y ``games.simulator``
+la indexa con millones de resultados a la vez. Cambiar un pago aquí cambia
+ambos, así que el simulador mide exactamente lo que pagan los comandos.
+"""
+from typing import Optional, Sequence, Tuple
+
+
+def payout(bet: int, multiplier: float) -> int:
+    """GameCoins pagados por una apuesta (incluye la apuesta; se trunca a entero)"""
+    return int(bet * multiplier)
+
+
+# 🪙 Coinflip: acertar el lado paga 2x
+COINFLIP_SIDES = ("cara", "cruz")
+COINFLIP_MULTIPLIER = 2
+
+# 🎲 Dados: acertar el número exacto paga 6x
+DICE_FACES = 6
+DICE_MULTIPLIER = 6
+
+# 🎰 Tragamonedas: tres iguales pagan según el símbolo, dos iguales 1.5x
+SLOT_SYMBOLS = ("🍒", "🍋", "🍊", "🍇", "⭐", "💎")
+SLOT_TRIPLE_MULTIPLIERS = {"💎": 10, "⭐": 5}
+SLOT_TRIPLE_DEFAULT = 3
+SLOT_PAIR_MULTIPLIER = 1.5
+
+
+def _slots_paytable() -> Tuple[float, ...]:
+    n = len(SLOT_SYMBOLS)
+    table = []
+    for a in range(n):
+        for b in range(n):
+            for c in range(n):
+                if a == b == c:
+                    table.append(SLOT_TRIPLE_MULTIPLIERS.get(SLOT_SYMBOLS[a], SLOT_TRIPLE_DEFAULT))
+                elif a == b or b == c or a == c:
+                    table.append(SLOT_PAIR_MULTIPLIER)
+                else:
+                    table.append(0)
+    return tuple(table)
+
+
+# Multiplicador de cada combinación de carretes, índice ``a*36 + b*6 + c``
+SLOTS_PAYTABLE = _slots_paytable()
+
+
+def slots_index(reels: Sequence[int]) -> int:
+    n = len(SLOT_SYMBOLS)
+    return (reels[0] * n + reels[1]) * n + reels[2]
+
+
+def slots_multiplier(reels: Sequence[int]) -> float:
+    """Multiplicador de tres carretes (índices en ``SLOT_SYMBOLS``)"""
+    return SLOTS_PAYTABLE[slots_index(reels)]
+
+
+# 🃏 Blackjack automático (``play_blackjack``: el jugador se planta con dos cartas)
+CARD_RANKS = ("A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K")
+CARD_SUITS = ("♠️", "♥️", "♦️", "♣️")
+# Valor de cada rango (el As cuenta 11 y baja a 1 si la mano se pasa)
+RANK_VALUES = {rank: 11 if rank == "A" else 10 if rank in ("10", "J", "Q", "K") else int(rank) for rank in CARD_RANKS}
+DEALER_STANDS_ON = 17
+BLACKJACK_PAYOUTS = {
+    "blackjack": 2.5,         # 3:2 más la apuesta
+    "dealer_bust": 2,
+    "player_wins": 2,
+    "tie": 1,                 # se devuelve la apuesta
+    "dealer_blackjack": 0,
+    "dealer_wins": 0,
+    "player_bust": 0,         # sólo en la partida interactiva
+}
+# El seguro (la mitad de la apuesta) devuelve 3 veces lo asegurado si el dealer tiene natural
+INSURANCE_PAYOUT = 3
+
+
+def hand_value(ranks: Sequence[str]) -> int:
+    """Valor de una mano; cada As baja de 11 a 1 mientras la mano se pase de 21"""
+    value = sum(RANK_VALUES[rank] for rank in ranks)
+    aces = sum(1 for rank in ranks if rank == "A")
+    while value > 21 and aces:
+        value -= 10
+        aces -= 1
+    return value
+
+
+def blackjack_outcome(player_value: int, dealer_value: int, player_natural: bool, dealer_natural: bool) -> str:
+    """Resultado de ``play_blackjack`` (clave de ``BLACKJACK_PAYOUTS``)"""
+    if player_natural and dealer_natural:
+        return "tie"
+    if player_natural:
+        return "blackjack"
+    if dealer_natural:
+        return "dealer_blackjack"
+    if dealer_value > 21:
+        return "dealer_bust"
+    if player_value > dealer_value:
+        return "player_wins"
+    if player_value == dealer_value:
+        return "tie"
+    return "dealer_wins"
+
+
+# 🎯 Ruleta europea (0-36)
+ROULETTE_POCKETS = 37
+RED_NUMBERS = frozenset((1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36))
+# Color de cada casilla: una consulta por índice en lugar de buscar en listas
+ROULETTE_COLORS = tuple(
+    "green" if n == 0 else "red" if n in RED_NUMBERS else "black" for n in range(ROULETTE_POCKETS)
+)
+# Multiplicador de cada tipo de apuesta cuando gana
+ROULETTE_MULTIPLIERS = {"number": 36, "color": 2, "even_odd": 2, "high_low": 2, "dozen": 3, "column": 3}
+# Casillas ganadoras de las apuestas exteriores (el 0 pierde todas)
+ROULETTE_WINNERS = {
+    ("color", "red"): frozenset(n for n in range(1, ROULETTE_POCKETS) if ROULETTE_COLORS[n] == "red"),
+    ("color", "black"): frozenset(n for n in range(1, ROULETTE_POCKETS) if ROULETTE_COLORS[n] == "black"),
+    ("even_odd", "even"): frozenset(n for n in range(1, ROULETTE_POCKETS) if n % 2 == 0),
+    ("even_odd", "odd"): frozenset(n for n in range(1, ROULETTE_POCKETS) if n % 2 == 1),
+    ("high_low", "low"): frozenset(range(1, 19)),
+    ("high_low", "high"): frozenset(range(19, ROULETTE_POCKETS)),
+    ("dozen", "1"): frozenset(range(1, 13)),
+    ("dozen", "2"): frozenset(range(13, 25)),
+    ("dozen", "3"): frozenset(range(25, ROULETTE_POCKETS)),
+    # Columnas del paño: 1, 4, 7... / 2, 5, 8... / 3, 6, 9...
+    ("column", "1"): frozenset(range(1, ROULETTE_POCKETS, 3)),
+    ("column", "2"): frozenset(range(2, ROULETTE_POCKETS, 3)),
+    ("column", "3"): frozenset(range(3, ROULETTE_POCKETS, 3)),
+}
+ROULETTE_WINNERS.update({("number", str(n)): frozenset((n,)) for n in range(ROULETTE_POCKETS)})
+
+# Multiplicador de cada apuesta válida para cada una de las 37 casillas
+ROULETTE_PAYOUT_TABLES = {
+    bet: tuple(ROULETTE_MULTIPLIERS[bet[0]] if n in winners else 0 for n in range(ROULETTE_POCKETS))
+    for bet, winners in ROULETTE_WINNERS.items()
+}
+_NO_PAYOUT = (0,) * ROULETTE_POCKETS
+
+
+def roulette_bet_key(bet_type: str, bet_value) -> Optional[Tuple[str, str]]:
+    """Clave normalizada de una apuesta (``("number", "7")`` para "07"), o None si no es válida"""
+    if bet_type == "number":
+        try:
+            bet_value = str(int(bet_value))
+        except (TypeError, ValueError):
+            return None
+    key = (bet_type, str(bet_value))
+    return key if key in ROULETTE_PAYOUT_TABLES else None
+
+
+def roulette_payout_table(bet_type: str, bet_value) -> Tuple[int, ...]:
+    """Multiplicador de la apuesta para cada una de las 37 casillas (todo 0 si no es válida)"""
+    key = roulette_bet_key(bet_type, bet_value)
+    return ROULETTE_PAYOUT_TABLES[key] if key else _NO_PAYOUT
+
+
+def roulette_multiplier(bet_type: str, bet_value, number: int) -> int:
+    """Multiplicador que paga una apuesta si sale ``number`` (0 si pierde)"""
+    return roulette_payout_table(bet_type, bet_value)[number]
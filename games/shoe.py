@@ -0,0 +1,62 @@
+"""Zapato de blackjack con varias barajas y carta de corte.
+
+Se reparte con ``pop()`` como la baraja de una sola partida, así que
+``BlackjackGame`` lo acepta tal cual en ``deck=``. El zapato se mezcla entre
+rondas cuando se pasó la penetración (la fracción repartida antes de la
+carta de corte), nunca a mitad de una mano salvo que se agote.
+"""
+from typing import Dict, List, Optional
+
+from games.engine import DECK_SIZE, Card, _rng
+
+
+class Shoe:
+    __slots__ = ("decks", "penetration", "cards", "shuffles")
+
+    def __init__(self, decks: int = 6, penetration: float = 0.75, cards: Optional[List[Card]] = None,
+                 shuffles: int = 0):
+        if decks < 1:
+            raise ValueError("El zapato necesita al menos una baraja")
+        if not 0 < penetration < 1:
+            raise ValueError("La penetración debe estar entre 0 y 1")
+        self.decks = decks
+        self.penetration = penetration
+        self.cards = cards if cards is not None else []
+        self.shuffles = shuffles
+
+    @property
+    def size(self) -> int:
+        return self.decks * DECK_SIZE
+
+    @property
+    def dealt(self) -> int:
+        return self.size - len(self.cards)
+
+    def needs_shuffle(self) -> bool:
+        """La carta de corte ya salió (o el zapato nunca se mezcló)"""
+        return self.dealt >= self.size * self.penetration
+
+    def shuffle(self, rng=None):
+        self.cards = list(range(DECK_SIZE)) * self.decks
+        _rng(rng).shuffle(self.cards)
+        self.shuffles += 1
+
+    def start_round(self, rng=None) -> "Shoe":
+        """Mezcla si hace falta antes de repartir una ronda"""
+        if self.needs_shuffle():
+            self.shuffle(rng)
+        return self
+
+    def pop(self) -> Card:
+        if not self.cards:
+            # Sólo ocurre si una ronda agota el zapato: se sigue con uno nuevo
+            self.shuffle()
+        return self.cards.pop()
+
+    def to_dict(self) -> Dict:
+        return {"decks": self.decks, "penetration": self.penetration,
+                "cards": list(self.cards), "shuffles": self.shuffles}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Shoe":
+        return cls(data["decks"], data["penetration"], list(data["cards"]), data.get("shuffles", 0))
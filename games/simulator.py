@@ -0,0 +1,273 @@
+"""Simulador Monte Carlo del retorno al jugador (RTP) de los minijuegos.
+
+Juega millones de rondas por lotes con el generador de NumPy, indexando las
+mismas tablas de ``games.rules`` que usa ``EconomySystem``, y reporta por
+juego y por tipo de apuesta el RTP, la varianza del resultado neto y la
+ventaja de la casa. Cuando el RTP se puede calcular exactamente a partir de
+las tablas también se muestra, para contrastarlo con la simulación.
+
+Uso::
+
+    python -m games.simulator --rounds 1000000 --seed 42
+    python -m games.simulator --game roulette --bet 100
+"""
+import argparse
+import logging
+import math
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from games import engine, rules, strategy
+from games.shoe import Shoe
+
+logger = logging.getLogger(__name__)
+
+# Rondas por lote: acota la memoria (blackjack mezcla 52 flotantes por ronda)
+DEFAULT_BATCH = 200_000
+DEFAULT_ROUNDS = 1_000_000
+# Zapato del blackjack interactivo simulado
+DEFAULT_DECKS = 6
+DEFAULT_PENETRATION = 0.75
+
+# Apuestas de la ruleta que se reportan por separado
+ROULETTE_BETS = (
+    ("number", "17"),
+    ("color", "red"),
+    ("even_odd", "even"),
+    ("high_low", "high"),
+    ("dozen", "1"),
+    ("column", "2"),
+)
+
+
+@dataclass
+class SimulationResult:
+    """Resumen de una simulación (montos por unidad apostada)"""
+    game: str
+    bet_type: str
+    rounds: int
+    bet: int
+    rtp: float
+    variance: float
+    exact_rtp: Optional[float] = None
+
+    @property
+    def house_edge(self) -> float:
+        return 1.0 - self.rtp
+
+    @property
+    def margin(self) -> float:
+        """Semiamplitud del intervalo de confianza del 95% del RTP"""
+        return 1.96 * math.sqrt(self.variance / self.rounds) if self.rounds else 0.0
+
+
+# --- Muestreadores: devuelven el multiplicador pagado de cada ronda ---
+
+def _coinflip(rng: np.random.Generator, n: int) -> np.ndarray:
+    # El jugador elige siempre el mismo lado; la moneda es la que varía
+    sides = rng.integers(0, len(rules.COINFLIP_SIDES), n)
+    return np.where(sides == 0, rules.COINFLIP_MULTIPLIER, 0.0)
+
+
+def _dice(rng: np.random.Generator, n: int) -> np.ndarray:
+    faces = rng.integers(1, rules.DICE_FACES + 1, n)
+    return np.where(faces == 1, rules.DICE_MULTIPLIER, 0.0)
+
+
+_SLOTS_TABLE = np.array(rules.SLOTS_PAYTABLE, dtype=np.float64)
+
+
+def _slots(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Los tres carretes codificados en un único índice de la tabla de pagos
+    return _SLOTS_TABLE[rng.integers(0, len(_SLOTS_TABLE), n)]
+
+
+def _roulette(bet_type: str, bet_value: str) -> Callable[[np.random.Generator, int], np.ndarray]:
+    table = np.array(rules.roulette_payout_table(bet_type, bet_value), dtype=np.float64)
+
+    def sample(rng: np.random.Generator, n: int) -> np.ndarray:
+        return table[rng.integers(0, rules.ROULETTE_POCKETS, n)]
+    return sample
+
+
+# Tablas del motor por carta (0-51), para indexarlas con lotes de cartas
+_CARD_HARD_VALUE = np.array(engine.CARD_HARD_VALUE, dtype=np.int16)
+_CARD_IS_ACE = np.array(engine.CARD_IS_ACE, dtype=bool)
+# Cartas que pueden hacer falta: 2 del jugador y hasta 10 del dealer
+_BLACKJACK_CARDS = 12
+_OUTCOMES = tuple(rules.BLACKJACK_PAYOUTS)
+_OUTCOME_PAYOUTS = np.array([rules.BLACKJACK_PAYOUTS[o] for o in _OUTCOMES], dtype=np.float64)
+
+
+def _hand_totals(cards: np.ndarray) -> np.ndarray:
+    """``engine.hand_value`` vectorizado sobre filas de cartas"""
+    hard = _CARD_HARD_VALUE[cards].sum(axis=1)
+    soft = _CARD_IS_ACE[cards].any(axis=1) & (hard <= 11)
+    return np.where(soft, hard + 10, hard)
+
+
+def _blackjack(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Barajar = ordenar claves aleatorias; sólo se usan las primeras cartas
+    cards = np.argsort(rng.random((n, engine.DECK_SIZE)), axis=1)[:, :_BLACKJACK_CARDS]
+    # ``play_blackjack`` saca con pop(): jugador, jugador, dealer, dealer, ...
+    player = _hand_totals(cards[:, 0:2])
+    dealer = _hand_totals(cards[:, 2:4])
+    player_natural = player == 21
+    dealer_natural = dealer == 21
+
+    drawn = 4
+    drawing = ~player_natural & ~dealer_natural & (dealer < rules.DEALER_STANDS_ON)
+    while drawing.any() and drawn < _BLACKJACK_CARDS:
+        drawn += 1
+        dealer = np.where(drawing, _hand_totals(cards[:, 2:drawn]), dealer)
+        drawing &= dealer < rules.DEALER_STANDS_ON
+
+    index = {outcome: i for i, outcome in enumerate(_OUTCOMES)}
+    outcome = np.select(
+        [
+            player_natural & dealer_natural,
+            player_natural,
+            dealer_natural,
+            dealer > 21,
+            player > dealer,
+            player == dealer,
+        ],
+        [index["tie"], index["blackjack"], index["dealer_blackjack"],
+         index["dealer_bust"], index["player_wins"], index["tie"]],
+        default=index["dealer_wins"],
+    )
+    return _OUTCOME_PAYOUTS[outcome]
+
+
+def _blackjack_interactive(decks: int, penetration: float) -> Callable[[np.random.Generator, int], np.ndarray]:
+    """Partidas de ``BlackjackView`` jugadas con el motor desde un zapato, con la mejor jugada"""
+    tables = strategy.build_tables()
+    state = {}
+
+    def sample(rng: np.random.Generator, n: int) -> np.ndarray:
+        if "shoe" not in state:
+            state["deals"] = random.Random(int(rng.integers(2 ** 63)))
+            state["shoe"] = Shoe(decks, penetration)
+        deals, shoe = state["deals"], state["shoe"]
+        payouts = np.empty(n)
+        for i in range(n):
+            game = engine.BlackjackGame(1, deck=shoe.start_round(deals))
+            while not game.finished:
+                action, _ = strategy.best_action(tables, game)
+                if action == "stand":
+                    game.finish()
+                elif action == "double":
+                    game.double()
+                    game.finish()
+                else:
+                    if action == "split":
+                        game.split()
+                    else:
+                        game.hit()
+                    if game.player_value >= 21:
+                        game.finish()
+            # Neto por apuesta inicial (doblar o dividir arriesga una apuesta más), más 1
+            payouts[i] = game.bet * (rules.BLACKJACK_PAYOUTS[game.outcome] - 1) + 1
+        return payouts
+    return sample
+
+
+def _exact_rtp(table, bet: int) -> float:
+    """RTP exacto de un resultado uniforme sobre ``table`` (con truncado a entero)"""
+    return sum(rules.payout(bet, m) for m in table) / (len(table) * bet)
+
+
+def _games(decks: int = DEFAULT_DECKS,
+           penetration: float = DEFAULT_PENETRATION) -> Dict[str, List[Tuple[str, Callable, Optional[Callable[[int], float]]]]]:
+    """Juego -> [(tipo de apuesta, muestreador, RTP exacto por apuesta)]"""
+    coinflip_table = [rules.COINFLIP_MULTIPLIER] + [0] * (len(rules.COINFLIP_SIDES) - 1)
+    dice_table = [rules.DICE_MULTIPLIER] + [0] * (rules.DICE_FACES - 1)
+    return {
+        "coinflip": [("cara", _coinflip, lambda bet: _exact_rtp(coinflip_table, bet))],
+        "dice": [("numero", _dice, lambda bet: _exact_rtp(dice_table, bet))],
+        "slots": [("tirada", _slots, lambda bet: _exact_rtp(rules.SLOTS_PAYTABLE, bet))],
+        "blackjack": [
+            ("automatico", _blackjack, None),
+            # El valor exacto es el de mazo infinito; un zapato de 6 barajas difiere en centésimas
+            (f"optimo {decks}b", _blackjack_interactive(decks, penetration),
+             lambda bet: 1 + strategy.build_tables()["ev"]),
+        ],
+        "roulette": [
+            (f"{bet_type}:{bet_value}", _roulette(bet_type, bet_value),
+             lambda bet, t=rules.roulette_payout_table(bet_type, bet_value): _exact_rtp(t, bet))
+            for bet_type, bet_value in ROULETTE_BETS
+        ],
+    }
+
+
+GAMES = ("coinflip", "dice", "slots", "blackjack", "roulette")
+
+
+def simulate(game: str, rounds: int = DEFAULT_ROUNDS, bet: int = 100, seed: Optional[int] = None,
+             batch: int = DEFAULT_BATCH, decks: int = DEFAULT_DECKS,
+             penetration: float = DEFAULT_PENETRATION) -> List[SimulationResult]:
+    """Simula ``rounds`` rondas de ``game`` por cada tipo de apuesta"""
+    if game not in GAMES:
+        raise ValueError(f"Juego desconocido: {game}")
+    if rounds <= 0 or bet <= 0:
+        raise ValueError("rounds y bet deben ser positivos")
+
+    rng = np.random.default_rng(seed)
+    results = []
+    for bet_type, sampler, exact in _games(decks, penetration)[game]:
+        total = 0.0
+        total_sq = 0.0
+        done = 0
+        while done < rounds:
+            n = min(batch, rounds - done)
+            # Pagos enteros como en el juego real, expresados por unidad apostada
+            net = np.floor(sampler(rng, n) * bet) / bet - 1.0
+            total += float(net.sum())
+            total_sq += float(np.square(net).sum())
+            done += n
+        mean = total / rounds
+        variance = max(0.0, total_sq / rounds - mean * mean)
+        results.append(SimulationResult(
+            game=game, bet_type=bet_type, rounds=rounds, bet=bet,
+            rtp=1.0 + mean, variance=variance,
+            exact_rtp=exact(bet) if exact else None,
+        ))
+    return results
+
+
+def format_results(results: List[SimulationResult]) -> str:
+    lines = [f"{'juego':<10} {'apuesta':<16} {'RTP':>9} {'±95%':>7} {'exacto':>9} {'ventaja':>8} {'varianza':>9}"]
+    for r in results:
+        exact = f"{r.exact_rtp:.4%}" if r.exact_rtp is not None else "-"
+        lines.append(
+            f"{r.game:<10} {r.bet_type:<16} {r.rtp:>9.4%} {r.margin:>7.3%} {exact:>9} "
+            f"{r.house_edge:>8.3%} {r.variance:>9.3f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Simulador Monte Carlo de RTP de los minijuegos")
+    parser.add_argument("--game", choices=GAMES, action="append",
+                        help="Juego a simular (repetible; por defecto todos)")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Rondas por tipo de apuesta")
+    parser.add_argument("--bet", type=int, default=100, help="Apuesta por ronda en GameCoins")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para reproducir resultados")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="Rondas por lote")
+    parser.add_argument("--decks", type=int, default=DEFAULT_DECKS, help="Barajas del zapato de blackjack")
+    parser.add_argument("--penetration", type=float, default=DEFAULT_PENETRATION,
+                        help="Fracción del zapato repartida antes de mezclar")
+    args = parser.parse_args(argv)
+
+    results = []
+    for offset, game in enumerate(args.game or GAMES):
+        seed = None if args.seed is None else args.seed + offset
+        results.extend(simulate(game, args.rounds, args.bet, seed, args.batch, args.decks, args.penetration))
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
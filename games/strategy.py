@@ -0,0 +1,253 @@
+"""Valor esperado exacto de cada jugada del blackjack interactivo.
+
+Las tablas se calculan con programación dinámica sobre las reglas de
+``BlackjackGame`` (el dealer no revisa su carta oculta, se planta con 17 y
+un natural contra un dealer que se pasa cobra 1:1) con el modelo de mazo
+infinito, que para un zapato de varias barajas difiere en centésimas de
+punto. Para cada carta visible del dealer y cada mano del jugador guardan
+el valor esperado de plantarse, pedir, doblar y dividir, en unidades de la
+apuesta inicial. Calcularlas es instantáneo pero se guardan en disco con
+una firma de las reglas: si cambia un pago se recalculan solas.
+"""
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from games import engine, rules
+
+logger = logging.getLogger(__name__)
+
+# Cambiar si cambia el formato de las tablas
+TABLES_VERSION = 1
+
+# Valores de carta (el As vale 11) con su probabilidad en un mazo infinito
+_RANK_PROB = 1 / len(rules.CARD_RANKS)
+CARD_PROBS: Dict[int, float] = {}
+for _rank in rules.CARD_RANKS:
+    CARD_PROBS[rules.RANK_VALUES[_rank]] = CARD_PROBS.get(rules.RANK_VALUES[_rank], 0) + _RANK_PROB
+UP_CARDS = tuple(sorted(CARD_PROBS))
+
+# Resultado neto (en apuestas) de cada desenlace
+_NET = {outcome: payout - 1 for outcome, payout in rules.BLACKJACK_PAYOUTS.items()}
+_BUST = 22
+_NATURAL = "natural"
+
+ACTIONS = ("stand", "hit", "double", "split")
+
+
+def _add(total: int, soft: bool, value: int) -> Tuple[int, bool]:
+    """Suma una carta a una mano (``soft``: hay un As contando 11)"""
+    if value == 11:
+        if total + 11 <= 21:
+            return total + 11, True
+        value = 1
+    total += value
+    if total > 21 and soft:
+        return total - 10, False
+    return total, soft
+
+
+@lru_cache(maxsize=None)
+def _dealer_from(total: int, soft: bool) -> Tuple[Tuple[int, float], ...]:
+    """Distribución del total final del dealer (22 = se pasa) desde una mano"""
+    if total >= rules.DEALER_STANDS_ON:
+        return ((min(total, _BUST), 1.0),)
+    dist: Dict[int, float] = {}
+    for value, p in CARD_PROBS.items():
+        for final, q in _dealer_from(*_add(total, soft, value)):
+            dist[final] = dist.get(final, 0.0) + p * q
+    return tuple(dist.items())
+
+
+def dealer_distribution(up: int) -> Dict:
+    """Totales finales del dealer con una carta visible (incluye su natural)"""
+    dist: Dict = {}
+    start = _add(0, False, up)
+    for hole, p in CARD_PROBS.items():
+        total, soft = _add(*start, hole)
+        if total == 21:
+            dist[_NATURAL] = dist.get(_NATURAL, 0.0) + p
+            continue
+        for final, q in _dealer_from(total, soft):
+            dist[final] = dist.get(final, 0.0) + p * q
+    return dist
+
+
+def _stand(total: int, natural: bool, dealer: Dict) -> float:
+    ev = 0.0
+    for final, p in dealer.items():
+        # Mismo orden de resolución que BlackjackGame.finish
+        if final == _NATURAL:
+            ev += p * (_NET["tie"] if total == 21 else _NET["dealer_blackjack"])
+        elif final == _BUST:
+            ev += p * _NET["dealer_bust"]
+        elif natural:
+            ev += p * _NET["blackjack"]
+        elif total > final:
+            ev += p * _NET["player_wins"]
+        elif total == final:
+            ev += p * _NET["tie"]
+        else:
+            ev += p * _NET["dealer_wins"]
+    return ev
+
+
+def build_tables() -> Dict:
+    """Calcula las tablas de valor esperado (ver ``best_action``)"""
+    tables = {"signature": rules_signature(), "actions": {}}
+    for up in UP_CARDS:
+        dealer = dealer_distribution(up)
+
+        @lru_cache(maxsize=None)
+        def stand(total: int) -> float:
+            return _stand(total, False, dealer)
+
+        @lru_cache(maxsize=None)
+        def hit(total: int, soft: bool) -> float:
+            ev = 0.0
+            for value, p in CARD_PROBS.items():
+                new_total, new_soft = _add(total, soft, value)
+                ev += p * (_NET["player_bust"] if new_total > 21 else best(new_total, new_soft))
+            return ev
+
+        def best(total: int, soft: bool) -> float:
+            # Con varias cartas sólo queda pedir o plantarse (con 21 no se pide)
+            return stand(total) if total == 21 else max(stand(total), hit(total, soft))
+
+        def double(total: int, soft: bool) -> float:
+            ev = 0.0
+            for value, p in CARD_PROBS.items():
+                new_total, _ = _add(total, soft, value)
+                ev += p * (_NET["player_bust"] if new_total > 21 else stand(new_total))
+            return 2 * ev
+
+        def split(total: int, soft: bool) -> float:
+            # Split simplificado: apuesta doble, una carta más y se sigue jugando
+            ev = 0.0
+            for value, p in CARD_PROBS.items():
+                new_total, new_soft = _add(total, soft, value)
+                ev += p * (_NET["player_bust"] if new_total > 21 else best(new_total, new_soft))
+            return 2 * ev
+
+        actions = {}
+        for total in range(4, 22):
+            actions[f"h{total}"] = _entry(stand(total), hit(total, False), double(total, False), total)
+        for total in range(12, 22):
+            actions[f"s{total}"] = _entry(stand(total), hit(total, True), double(total, True), total)
+        actions["bj"] = {"stand": _stand(21, True, dealer), "double": double(21, True)}
+        for value in UP_CARDS:
+            total, soft = _add(*_add(0, False, value), value)
+            actions[f"p{value}"] = {"split": split(total, soft)}
+        tables["actions"][str(up)] = actions
+
+    # Seguro: paga INSURANCE_PAYOUT veces lo asegurado si el dealer tiene natural con As visible
+    ace = _add(0, False, 11)
+    natural = sum(p for hole, p in CARD_PROBS.items() if _add(*ace, hole)[0] == 21)
+    tables["insurance"] = rules.INSURANCE_PAYOUT * natural - 1
+    tables["ev"] = _initial_ev(tables)
+    return tables
+
+
+def _entry(stand: float, hit: float, double: float, total: int) -> Dict[str, float]:
+    entry = {"stand": stand, "double": double}
+    if total < 21:
+        entry["hit"] = hit
+    return entry
+
+
+def _initial_ev(tables: Dict) -> float:
+    """Valor esperado de una partida entera jugando siempre la mejor opción"""
+    ev = 0.0
+    for first in rules.CARD_RANKS:
+        for second in rules.CARD_RANKS:
+            hand = [engine.CARD_RANK.index(first), engine.CARD_RANK.index(second)]
+            for up, p in CARD_PROBS.items():
+                options = _options(tables, hand, up, hand_can_split=first == second)
+                ev += _RANK_PROB * _RANK_PROB * p * max(options.values())
+    return ev
+
+
+def _state_key(hand) -> str:
+    if engine.is_natural(hand):
+        return "bj"
+    total = engine.hand_value(hand)
+    hard = sum(engine.CARD_HARD_VALUE[card] for card in hand)
+    return f"{'s' if total != hard else 'h'}{total}"
+
+
+def _options(tables: Dict, hand, up: int, can_hit: bool = True, can_double: bool = True,
+             hand_can_split: bool = False) -> Dict[str, float]:
+    entry = tables["actions"][str(up)][_state_key(hand)]
+    options = {"stand": entry["stand"]}
+    if can_hit and "hit" in entry:
+        options["hit"] = entry["hit"]
+    if can_double and len(hand) == 2:
+        options["double"] = entry["double"]
+    if hand_can_split:
+        value = rules.RANK_VALUES[engine.CARD_RANK[hand[0]]]
+        options["split"] = tables["actions"][str(up)][f"p{value}"]["split"]
+    return options
+
+
+def up_card_value(card: engine.Card) -> int:
+    return rules.RANK_VALUES[engine.CARD_RANK[card]]
+
+
+def evaluate(tables: Dict, game: engine.BlackjackGame) -> Dict[str, float]:
+    """Valor esperado de cada acción disponible en la partida (en apuestas iniciales)"""
+    options = _options(
+        tables, game.player, up_card_value(game.dealer[1]),
+        can_hit=game.can_hit(), can_double=game.can_double(), hand_can_split=game.can_split(),
+    )
+    if game.has_split:
+        # Tras dividir la apuesta ya es doble: los valores escalan con ella
+        options = {action: 2 * ev for action, ev in options.items()}
+    return options
+
+
+def best_action(tables: Dict, game: engine.BlackjackGame) -> Tuple[str, Dict[str, float]]:
+    """Mejor jugada y valor esperado de cada opción"""
+    options = evaluate(tables, game)
+    return max(options, key=options.get), options
+
+
+def house_edge(tables: Dict) -> float:
+    """Ventaja de la casa jugando la estrategia óptima (fracción de la apuesta)"""
+    return -tables["ev"]
+
+
+def rules_signature() -> str:
+    rules_data = {
+        "version": TABLES_VERSION,
+        "payouts": rules.BLACKJACK_PAYOUTS,
+        "stands_on": rules.DEALER_STANDS_ON,
+        "values": rules.RANK_VALUES,
+        "insurance": rules.INSURANCE_PAYOUT,
+    }
+    return hashlib.sha1(json.dumps(rules_data, sort_keys=True).encode()).hexdigest()
+
+
+def load_tables(path: Optional[str] = None) -> Dict:
+    """Tablas desde la caché en disco, recalculándolas si faltan o son de otras reglas"""
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tables = json.load(f)
+            if tables.get("signature") == rules_signature():
+                return tables
+            logger.info("Las reglas del blackjack cambiaron, se recalculan las tablas de valor esperado")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer {path}, se recalculan las tablas: {e}")
+
+    tables = build_tables()
+    if path:
+        from storage import atomic_write
+        try:
+            atomic_write(path, json.dumps(tables))
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la caché de tablas en {path}: {e}")
+    return tables
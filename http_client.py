@@ -0,0 +1,235 @@
+"""Cliente HTTP compartido para las APIs externas (tasas de cambio, Roblox, Fortnite).
+
+Todo el bot usa una sola ``aiohttp.ClientSession`` con pool de conexiones,
+así que se reutilizan las conexiones TCP/TLS y se cachea el DNS. Además:
+
+- cada petición tiene timeout (``HTTP_TIMEOUT``);
+- hay como mucho ``HTTP_MAX_PER_HOST`` peticiones simultáneas por host;
+- los errores de red, timeouts, 429 y 5xx se reintentan con espera
+  exponencial y jitter (``utils.retry_operation``);
+- cada host tiene un circuit breaker: tras ``HTTP_BREAKER_THRESHOLD``
+  peticiones fallidas seguidas deja de llamarlo durante
+  ``HTTP_BREAKER_COOLDOWN`` segundos y luego deja pasar una sola de prueba.
+  Mientras el host falla se responde con la última respuesta correcta de la
+  misma petición (``from_cache``) si la hay. Esa caché es LRU y guarda como
+  mucho ``HTTP_CACHE_MAX_ENTRIES`` peticiones distintas.
+
+La sesión se crea en el primer uso dentro del loop y se cierra con ``close()``.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import config
+from utils import retry_operation
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = getattr(config, "HTTP_TIMEOUT", 10)
+HTTP_MAX_CONNECTIONS = getattr(config, "HTTP_MAX_CONNECTIONS", 50)
+HTTP_MAX_PER_HOST = getattr(config, "HTTP_MAX_PER_HOST", 4)
+HTTP_RETRIES = getattr(config, "HTTP_RETRIES", 3)
+HTTP_BACKOFF = getattr(config, "HTTP_BACKOFF", 0.5)
+HTTP_BACKOFF_MAX = getattr(config, "HTTP_BACKOFF_MAX", 8.0)
+HTTP_BREAKER_THRESHOLD = getattr(config, "HTTP_BREAKER_THRESHOLD", 5)
+HTTP_BREAKER_COOLDOWN = getattr(config, "HTTP_BREAKER_COOLDOWN", 60)
+HTTP_CACHE_MAX_ENTRIES = getattr(config, "HTTP_CACHE_MAX_ENTRIES", 256)
+
+# Respuestas que indican un problema pasajero del servidor
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class HttpError(Exception):
+    """La petición falló (tras los reintentos) y no hay respuesta en caché"""
+
+
+class RetryableStatus(HttpError):
+    def __init__(self, status: int, url: str):
+        super().__init__(f"{url} respondió con código {status}")
+        self.status = status
+
+
+class CircuitOpenError(HttpError):
+    """El circuit breaker del host está abierto"""
+
+
+class HttpResponse:
+    __slots__ = ("status", "data", "from_cache")
+
+    def __init__(self, status: int, data, from_cache: bool = False):
+        self.status = status
+        # JSON decodificado (o el texto si no era JSON)
+        self.data = data
+        self.from_cache = from_cache
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class CircuitBreaker:
+    """Estado de un host: cerrado, abierto hasta ``open_until`` o medio abierto (una prueba)"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.threshold:
+            self.open_until = time.monotonic() + self.cooldown
+
+
+def _cache_key(method: str, url: str, params, payload) -> Tuple:
+    encode = lambda value: None if value is None else json.dumps(value, sort_keys=True)
+    return method, url, encode(params), encode(payload)
+
+
+class HttpClient:
+    def __init__(self, timeout: float = HTTP_TIMEOUT, max_per_host: int = HTTP_MAX_PER_HOST,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF,
+                 breaker_threshold: int = HTTP_BREAKER_THRESHOLD, breaker_cooldown: float = HTTP_BREAKER_COOLDOWN,
+                 cache_size: int = HTTP_CACHE_MAX_ENTRIES):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Última respuesta correcta de cada petición, para cuando el host falla.
+        # LRU: al pasar de ``cache_size`` se descarta la usada hace más tiempo
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, HttpResponse]" = OrderedDict()
+        self._send = retry_operation(
+            max_retries=retries, delay=backoff, backoff=2.0, max_delay=HTTP_BACKOFF_MAX, jitter=True,
+            retry_on=(aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus),
+        )(self._attempt)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # Una sesión sólo sirve en el loop donde se creó
+            connector = aiohttp.TCPConnector(limit=HTTP_MAX_CONNECTIONS, limit_per_host=self.max_per_host,
+                                             ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._loop = loop
+            self._semaphores = {}
+        return self._session
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
+
+    async def _attempt(self, method: str, url: str, host: str, **kwargs) -> HttpResponse:
+        session = self._get_session()
+        async with self._semaphore(host):
+            async with session.request(method, url, **kwargs) as response:
+                if response.status in RETRY_STATUSES:
+                    raise RetryableStatus(response.status, url)
+                text = await response.text()
+                status = response.status
+        try:
+            data = json.loads(text) if text else None
+        except ValueError:
+            data = text
+        return HttpResponse(status, data)
+
+    def _from_cache(self, key: Tuple, error: Exception) -> HttpResponse:
+        cached = self._cache.get(key)
+        if cached is None:
+            if isinstance(error, HttpError):
+                raise error
+            raise HttpError(str(error) or type(error).__name__) from error
+        self._cache.move_to_end(key)
+        logger.warning(f"Usando la última respuesta guardada de {key[1]}: {error}")
+        return HttpResponse(cached.status, cached.data, from_cache=True)
+
+    async def request(self, method: str, url: str, *, params: Optional[Dict] = None, json=None,
+                      headers: Optional[Dict] = None) -> HttpResponse:
+        """Hace una petición; lanza ``HttpError`` si falla y no hay respuesta guardada.
+
+        Las respuestas 4xx se devuelven tal cual (``ok`` es False): el host
+        respondió, así que no se reintentan ni cuentan para el circuit breaker.
+        """
+        host = urlsplit(url).netloc
+        key = _cache_key(method, url, params, json)
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            return self._from_cache(key, CircuitOpenError(f"{host} no disponible temporalmente"))
+        try:
+            response = await self._send(method, url, host, params=params, json=json, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, HttpError) as e:
+            breaker.record_failure()
+            if breaker.state != "closed":
+                logger.error(f"Circuit breaker abierto para {host} durante {self.breaker_cooldown}s")
+            return self._from_cache(key, e)
+        except BaseException:
+            # Cancelada o error inesperado: libera la prueba del breaker
+            breaker.probing = False
+            raise
+        breaker.record_success()
+        if response.ok:
+            self._remember(key, response)
+        return response
+
+    def _remember(self, key: Tuple, response: HttpResponse):
+        self._cache[key] = response
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        """Cierra la sesión y sus conexiones (se abrirá otra si se vuelve a usar)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Cliente global del bot
+http_client = HttpClient()
@@ -0,0 +1,155 @@
+"""Libro mayor de GameCoins: un registro de sólo-añadir de cada movimiento.
+
+Cada línea del archivo (NDJSON) es un movimiento::
+
+    {"ts": 1718000000.123, "user": "123", "delta": -50, "reason": "Coinflip bet",
+     "balance": 450, "ref": "1234567890"}
+
+Añadir un movimiento es escribir una línea al final, sin tocar el almacén
+principal. Para auditar, la primera consulta construye un índice en memoria
+con la posición de cada línea por usuario (y se mantiene en cada añadido), así
+que el historial de un usuario se lee saltando directo a sus líneas.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+import config
+from config import DATA_FILE
+
+logger = logging.getLogger(__name__)
+
+LEDGER_FILE = getattr(config, "LEDGER_FILE", os.path.splitext(DATA_FILE)[0] + ".ledger.ndjson")
+
+
+class Ledger:
+    """Registro de movimientos con índice por usuario (posición y fecha)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        # Índice (se construye en la primera consulta): user_id -> posiciones / fechas
+        self._offsets = None
+        self._times = {}
+        self._totals = {}
+
+    def _open(self):
+        if self._file is not None:
+            return
+        self._file = open(self.path, "ab")
+        # Un corte a mitad de línea no debe pegar la siguiente entrada a la rota
+        if self._file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write(b"\n")
+                    self._file.flush()
+
+    def append(self, user_id: str, delta: int, reason: str, balance: int, ref: Optional[str] = None):
+        """Registra un movimiento. No hace fsync: es un registro de auditoría."""
+        if not delta:
+            return
+        entry = {
+            "ts": round(time.time(), 3),
+            "user": str(user_id),
+            "delta": delta,
+            "reason": reason,
+            "balance": balance,
+            "ref": None if ref is None else str(ref)
+        }
+        line = (json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                self._open()
+                offset = self._file.tell()
+                self._file.write(line)
+                self._file.flush()
+            except OSError as e:
+                logger.error(f"No se pudo escribir en el libro mayor: {e}")
+                return
+            if self._offsets is not None:
+                self._index(entry, offset)
+
+    def _index(self, entry: Dict, offset: int):
+        user_id = entry["user"]
+        self._offsets.setdefault(user_id, []).append(offset)
+        self._times.setdefault(user_id, []).append(entry["ts"])
+        self._totals[user_id] = self._totals.get(user_id, 0) + entry["delta"]
+
+    def _ensure_index(self):
+        if self._offsets is not None:
+            return
+        self._offsets = {}
+        self._times = {}
+        self._totals = {}
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    self._index(json.loads(line), offset)
+                except (ValueError, KeyError):
+                    if line.strip():
+                        logger.warning(f"Línea inválida en el libro mayor (posición {offset}), se ignora")
+                offset += len(line)
+
+    def _read(self, offsets: List[int]) -> List[Dict]:
+        entries = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                entries.append(json.loads(f.readline()))
+        return entries
+
+    def tail(self, user_id: str, limit: int = 10) -> List[Dict]:
+        """Últimos movimientos de un usuario, del más reciente al más antiguo"""
+        with self._lock:
+            self._ensure_index()
+            offsets = self._offsets.get(str(user_id), [])[-limit:]
+        return self._read(reversed(offsets))
+
+    def history(self, user_id: str, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        """Movimientos de un usuario con ``start <= ts < end`` (timestamps Unix), en orden"""
+        with self._lock:
+            self._ensure_index()
+            times = self._times.get(str(user_id), [])
+            first = 0 if start is None else bisect_left(times, start)
+            last = len(times) if end is None else bisect_left(times, end)
+            offsets = self._offsets.get(str(user_id), [])[first:last]
+        return self._read(offsets)
+
+    def build_index(self):
+        """Construye el índice por usuario si aún no existe (lee el libro completo).
+
+        Se llama al arrancar desde un hilo, para que la primera consulta desde
+        el loop no tenga que recorrer el archivo.
+        """
+        with self._lock:
+            self._ensure_index()
+
+    def count(self, user_id: str) -> int:
+        with self._lock:
+            self._ensure_index()
+            return len(self._offsets.get(str(user_id), []))
+
+    def total(self, user_id: str) -> int:
+        """Suma de todos los movimientos registrados de un usuario"""
+        with self._lock:
+            self._ensure_index()
+            return self._totals.get(str(user_id), 0)
+
+    def totals(self) -> Dict[str, int]:
+        """Suma de movimientos por usuario, para conciliar con los balances"""
+        with self._lock:
+            self._ensure_index()
+            return dict(self._totals)
+
+
+# Instancia global del libro mayor
+ledger = Ledger(LEDGER_FILE)
@@ -1,3 +1,4 @@
+import asyncio
 import discord
 from discord import app_commands
 import sys
@@ -16,6 +17,11 @@ from commands.economy_commands import setup as setup_economy_commands
 from commands.virtual_shop_commands import setup as setup_virtual_shop_commands
 
 from utils import setup_error_handlers
+from data_manager import start_autoflush
+from economy_system import economy
+from ledger import ledger
+from exchange_rate_manager import exchange_rate_manager
+from http_client import http_client
 
 from reminder_system import initialize_reminder_system
 
@@ -53,6 +59,16 @@ async def on_ready():
     except Exception as e:
         print(f"Ocurrió un error al sincronizar los comandos: {e}")
     
+    # Los datos viven en memoria y se guardan a disco en segundo plano
+    await start_autoflush()
+    # El índice del libro mayor (que consulta la primera operación de cada usuario)
+    # se construye una sola vez y fuera del loop
+    await asyncio.to_thread(ledger.build_index)
+    # La actividad (mensajes, reacciones, comandos) se aplica a las tareas por lotes
+    await economy.start_activity_flush()
+    # Las tasas de cambio se actualizan en segundo plano; las conversiones no esperan a la API
+    await exchange_rate_manager.start_refresh()
+    
     # Arrancamos el sistema que recuerda a los usuarios sobre sus Robux
     try:
         reminder_system = initialize_reminder_system(client)
@@ -72,7 +88,11 @@ if not DISCORD_TOKEN:
 # Esta es la función principal que arranca todo
 async def main():
     await setup()  
-    await client.start(DISCORD_TOKEN)  
+    try:
+        await client.start(DISCORD_TOKEN)  
+    finally:
+        # Cerramos las conexiones compartidas con las APIs externas
+        await http_client.close()
 
 #
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+"""Precios del catálogo ya convertidos a cada moneda.
+
+La matriz (productos × monedas) se calcula de una vez con NumPy a partir de
+los precios en MXN y la tabla de tasas compartida, y se guarda con su sello
+de versión ``(versión del catálogo, versión de las tasas)``. Se recalcula
+sólo cuando cambia alguna de las dos: al editar productos (``invalidate``),
+al recargar el almacén o al llegar tasas nuevas. Mostrar un precio o cambiar
+de país es una búsqueda en la matriz.
+"""
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from data_manager import load_data, store_lock
+from exchange_rate_manager import exchange_rate_manager
+
+logger = logging.getLogger(__name__)
+
+
+class PriceMatrix:
+    """Matriz de precios locales del catálogo (``products``)"""
+
+    def __init__(self, rate_manager):
+        self.rate_manager = rate_manager
+        self.catalog_version = 0
+        self.version: Optional[Tuple[int, int]] = None
+        self.products: Dict[str, int] = {}
+        self.currencies: Dict[str, int] = {}
+        self.matrix = np.zeros((0, 0))
+        self._columns: Dict[str, Dict[str, float]] = {}
+        self._store = None
+
+    def invalidate(self):
+        """Marca el catálogo como modificado (productos añadidos, editados o borrados)"""
+        self.catalog_version += 1
+
+    def _current(self):
+        self.rate_manager.revalidate()
+        data = load_data()
+        if data is not self._store:
+            # El almacén se recargó: el catálogo puede ser otro
+            self._store = data
+            self.catalog_version += 1
+        version = (self.catalog_version, self.rate_manager.version)
+        if version != self.version:
+            self._build(data, version)
+
+    def _build(self, data: Dict, version: Tuple[int, int]):
+        with store_lock:
+            catalog = [(product_id, product.get("price", 0)) for product_id, product in data["products"].items()]
+        rates = self.rate_manager.get_rates()
+        prices = np.array([price for _, price in catalog], dtype=float)
+        rate_row = np.array(list(rates.values()), dtype=float)
+        self.matrix = np.round(np.outer(prices, rate_row), 2)
+        self.products = {product_id: row for row, (product_id, _) in enumerate(catalog)}
+        self.currencies = {currency: column for column, currency in enumerate(rates)}
+        self._columns = {}
+        self.version = version
+        logger.debug(f"Matriz de precios {version}: {len(catalog)} productos × {len(rates)} monedas")
+
+    def price(self, product_id: str, currency: str, default: float = 0.0) -> float:
+        """Precio de un producto en una moneda (``default`` si no está en el catálogo)"""
+        self._current()
+        row = self.products.get(product_id)
+        column = self.currencies.get(currency)
+        if row is None or column is None:
+            return default
+        return float(self.matrix[row, column])
+
+    def column(self, currency: str) -> Dict[str, float]:
+        """Precios de todo el catálogo en una moneda (product_id -> precio, no modificar)"""
+        self._current()
+        prices = self._columns.get(currency)
+        if prices is None:
+            column = self.currencies.get(currency)
+            if column is None:
+                return {}
+            prices = self._columns[currency] = dict(zip(self.products, self.matrix[:, column].tolist()))
+        return prices
+
+
+price_matrix = PriceMatrix(exchange_rate_manager)
@@ -0,0 +1,151 @@
+"""Historial de tasas de cambio: un archivo binario de sólo-añadir.
+
+Cada tabla obtenida de la API se añade como un registro de ancho fijo
+(little-endian, float64)::
+
+    [timestamp Unix][tasa moneda 1][tasa moneda 2]...
+
+con una columna por moneda (tasas con base USD, tal como las da la API; NaN
+si faltaba). La cabecera guarda las columnas, así que un registro ocupa
+``8 × (1 + monedas)`` bytes y se lee saltando directo a su posición. El
+timestamp de cada registro es la versión de esa tabla: los tickets la
+guardan y ``at(t)`` devuelve la tabla vigente en ``t`` con búsqueda binaria
+sobre los timestamps (que se cargan en memoria en la primera consulta).
+"""
+import logging
+import math
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Optional, Tuple
+
+import config
+from config import DATA_FILE
+
+logger = logging.getLogger(__name__)
+
+RATE_HISTORY_FILE = getattr(config, "RATE_HISTORY_FILE", os.path.splitext(DATA_FILE)[0] + ".rates.bin")
+
+MAGIC = b"RATEHIS1"
+_COUNT = struct.Struct("<H")
+_CODE_SIZE = 3
+
+
+class RateHistory:
+    """Serie temporal de tablas de tasas con búsqueda por fecha"""
+
+    def __init__(self, path: str, currencies: Iterable[str]):
+        self.path = path
+        # Columnas pedidas; las del archivo pueden incluir además otras antiguas
+        self.wanted: Tuple[str, ...] = tuple(currencies)
+        self.currencies = self.wanted
+        self._lock = threading.Lock()
+        self._record: Optional[struct.Struct] = None
+        self._header_size = 0
+        # Timestamps de todos los registros (se cargan la primera vez)
+        self._times: Optional[array] = None
+
+    @staticmethod
+    def _header(currencies: Tuple[str, ...]) -> bytes:
+        codes = b"".join(code.encode("ascii") for code in currencies)
+        return MAGIC + _COUNT.pack(len(currencies)) + codes
+
+    def _use_columns(self, currencies: Tuple[str, ...]):
+        self.currencies = currencies
+        self._header_size = len(self._header(currencies))
+        self._record = struct.Struct(f"<{1 + len(currencies)}d")
+
+    def _ensure_loaded(self):
+        if self._times is not None:
+            return
+        for code in self.wanted:
+            if len(code) != _CODE_SIZE or not code.isascii():
+                raise ValueError(f"Código de moneda inválido: {code}")
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self._use_columns(self.currencies)
+            with open(self.path, "wb") as f:
+                f.write(self._header(self.currencies))
+            self._times = array("d")
+            return
+
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} no es un historial de tasas")
+            count, = _COUNT.unpack(f.read(_COUNT.size))
+            stored = f.read(count * _CODE_SIZE).decode("ascii")
+            columns = tuple(stored[i:i + _CODE_SIZE] for i in range(0, len(stored), _CODE_SIZE))
+            self._use_columns(columns)
+            body = f.read()
+
+        # Un corte a mitad de registro se descarta
+        usable = len(body) - len(body) % self._record.size
+        if usable != len(body):
+            logger.warning(f"Registro incompleto al final de {self.path}, se descarta")
+            with open(self.path, "r+b") as f:
+                f.truncate(self._header_size + usable)
+        self._times = array("d", (record[0] for record in self._record.iter_unpack(body[:usable])))
+
+        missing = tuple(code for code in self.wanted if code not in columns)
+        if missing:
+            self._add_columns(body[:usable], columns + missing)
+
+    def _add_columns(self, body: bytes, columns: Tuple[str, ...]):
+        """Reescribe el archivo con columnas nuevas (NaN en los registros antiguos)"""
+        old = self._record
+        padding = (math.nan,) * (len(columns) - len(self.currencies))
+        self._use_columns(columns)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._header(columns))
+            for record in old.iter_unpack(body):
+                f.write(self._record.pack(*record, *padding))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        logger.info(f"Historial de tasas ampliado a {len(columns)} monedas")
+
+    def append(self, timestamp: float, rates: Dict[str, float]) -> bool:
+        """Añade una tabla de tasas; los timestamps deben ir en orden"""
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                if self._times and timestamp <= self._times[-1]:
+                    logger.warning(f"Tasas con fecha {timestamp} anteriores al último registro, se ignoran")
+                    return False
+                values = [float(rates.get(code, math.nan)) for code in self.currencies]
+                with open(self.path, "ab") as f:
+                    f.write(self._record.pack(timestamp, *values))
+            except (OSError, ValueError) as e:
+                logger.error(f"No se pudo escribir en el historial de tasas: {e}")
+                return False
+            self._times.append(timestamp)
+            return True
+
+    def _read(self, index: int) -> Tuple[float, Dict[str, float]]:
+        with open(self.path, "rb") as f:
+            f.seek(self._header_size + index * self._record.size)
+            timestamp, *values = self._record.unpack(f.read(self._record.size))
+        return timestamp, {code: value for code, value in zip(self.currencies, values) if not math.isnan(value)}
+
+    def at(self, timestamp: float) -> Optional[Tuple[float, Dict[str, float]]]:
+        """Tabla vigente en ``timestamp``: (versión, tasas) o None si es anterior al historial"""
+        with self._lock:
+            self._ensure_loaded()
+            index = bisect_right(self._times, timestamp) - 1
+            if index < 0:
+                return None
+            return self._read(index)
+
+    def latest(self) -> Optional[Tuple[float, Dict[str, float]]]:
+        with self._lock:
+            self._ensure_loaded()
+            if not self._times:
+                return None
+            return self._read(len(self._times) - 1)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._times)
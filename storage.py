@@ -0,0 +1,800 @@
+"""Backends de persistencia para el almacén residente de data_manager.
+
+El almacén siempre es un diccionario en memoria; estos backends sólo deciden
+cómo se guarda en disco:
+
+- ``JsonBackend``: el formato clásico, un único ``data.json`` escrito de
+  forma atómica (archivo temporal + fsync + rename).
+- ``JournaledJsonBackend``: como el anterior, pero en cada volcado las filas
+  cambiadas se añaden a un journal (``data.json.journal``) y el snapshot
+  completo sólo se reescribe al compactar; al arrancar se reaplica la cola
+  del journal. Como el resto de backends escribe en cada volcado (no en cada
+  cambio): un corte pierde como mucho lo ocurrido desde el último.
+- ``ShardedJsonBackend``: un archivo JSON por dominio (economía, tickets,
+  catálogo, tienda virtual, roblox y configuración); cada archivo se lee la
+  primera vez que se usa y cada volcado reescribe sólo los que cambiaron.
+- ``SqliteBackend``: una tabla SQLite (modo WAL) por colección, de forma que
+  actualizar un balance toca una sola fila en lugar de reescribir todo.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Colección del almacén que se guarda como tabla propia en SQLite.
+# ``path`` es la ruta dentro del diccionario y ``columns`` los campos del
+# registro que se copian a columnas indexadas para poder consultarlos.
+Table = namedtuple("Table", ["name", "path", "columns"])
+
+TABLES = (
+    Table("users", ("users",), ()),
+    Table("products", ("products",), ()),
+    Table("categories", ("categories",), ()),
+    Table("tickets", ("tickets",), ("user_id", "status")),
+    Table("economy_users", ("economy", "users"), ("coins", "level")),
+    Table("economy_idempotency", ("economy", "idempotency"), ()),
+    Table("blackjack_shoes", ("economy", "blackjack_shoes"), ()),
+    Table("virtual_shop_products", ("virtual_shop", "products"), ()),
+    Table("virtual_shop_purchases", ("virtual_shop", "purchases"), ("user_id", "purchased_at")),
+    Table("roblox_accounts", ("roblox_accounts",), ()),
+    Table("pending_verifications", ("pending_verifications",), ()),
+    Table("exchange_rates", ("exchange_rates",), ()),
+)
+
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+# Claves de primer nivel de cada shard; las que no aparecen van a DEFAULT_SHARD
+SHARDS = {
+    "economy": ("economy",),
+    "tickets": ("tickets", "ticket_counter"),
+    "catalog": ("products", "categories", "gifts", "shop"),
+    "virtual_shop": ("virtual_shop",),
+    "roblox": ("roblox_accounts", "pending_verifications", "reminded_users"),
+}
+DEFAULT_SHARD = "config"
+SHARD_OF_KEY = {key: shard for shard, keys in SHARDS.items() for key in keys}
+
+# Filas cambiadas: (tabla, id, json o None si se eliminó)
+RowChange = Tuple[str, str, Optional[str]]
+# Claves sueltas cambiadas: (clave, json o None si se eliminó)
+KvChange = Tuple[str, Optional[str]]
+
+
+def _encode(value):
+    # Registros compactos en memoria (p. ej. EconomyUser) se guardan en su forma persistida
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return to_dict()
+
+
+def dump(value) -> str:
+    """Serialización compacta usada para el almacén y para comparar filas."""
+    return json.dumps(value, separators=(",", ":"), default=_encode)
+
+
+def get_path(data: Dict, path: Tuple[str, ...]):
+    node = data
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return None
+        node = node[key]
+    return node
+
+
+def split_store(data: Dict):
+    """Separa el almacén en filas de tablas y claves sueltas (todo lo demás)."""
+    rows = {}
+    for table in TABLES:
+        container = get_path(data, table.path)
+        rows[table.name] = container if isinstance(container, dict) else None
+
+    kv = {}
+    for key, value in data.items():
+        nested = [t for t in TABLES if t.path[0] == key]
+        if any(len(t.path) == 1 and rows[t.name] is not None for t in nested):
+            continue
+        if nested and isinstance(value, dict):
+            stripped = {t.path[1] for t in nested if len(t.path) == 2 and rows[t.name] is not None}
+            value = {k: v for k, v in value.items() if k not in stripped}
+        kv[key] = value
+    return rows, kv
+
+
+def atomic_write(path: str, payload: str):
+    """Escribe ``payload`` en ``path`` sin dejar nunca un archivo a medias."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
+def _fsync_dir(directory: str):
+    # Hace durable el rename; no todos los sistemas permiten abrir directorios
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except (OSError, AttributeError):
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def apply_change(data: Dict, entry: Dict):
+    """Aplica al almacén una entrada del journal (fila de tabla o clave suelta)."""
+    value = entry.get("v")
+    if "t" in entry:
+        table = TABLES_BY_NAME[entry["t"]]
+        parent = data
+        for key in table.path[:-1]:
+            if not isinstance(parent.get(key), dict):
+                parent[key] = {}
+            parent = parent[key]
+        if not isinstance(parent.get(table.path[-1]), dict):
+            parent[table.path[-1]] = {}
+        container = parent[table.path[-1]]
+        if value is None:
+            container.pop(entry["k"], None)
+        else:
+            container[entry["k"]] = value
+        return
+
+    key = entry["k"]
+    if value is None:
+        data.pop(key, None)
+        return
+    old = data.get(key)
+    if isinstance(old, dict) and isinstance(value, dict):
+        # Las subcolecciones que son tablas viajan como filas, no dentro de la clave
+        for table in TABLES:
+            if len(table.path) == 2 and table.path[0] == key and table.path[1] in old and table.path[1] not in value:
+                value[table.path[1]] = old[table.path[1]]
+    data[key] = value
+
+
+def ensure_tables(data: Dict):
+    """Recrea los contenedores vacíos de las tablas anidadas (no viajan como filas)."""
+    for table in TABLES:
+        if len(table.path) == 2 and isinstance(data.get(table.path[0]), dict):
+            data[table.path[0]].setdefault(table.path[1], {})
+
+
+class RowTracker:
+    """Recuerda la última versión persistida de cada fila para escribir sólo lo que cambió.
+
+    Un cambio calculado por ``changes`` queda pendiente (los siguientes
+    volcados lo comparan con él) y cuenta como persistido cuando el backend
+    lo confirma con ``commit`` tras escribirlo. Si la escritura falla,
+    ``abort`` descarta lo pendiente y el siguiente volcado lo vuelve a encontrar.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, str]] = {table.name: {} for table in TABLES}
+        self.kv: Dict[str, str] = {}
+        # Calculado pero aún no escrito (None = eliminado)
+        self._pending_rows: Dict[str, Dict[str, Optional[str]]] = {table.name: {} for table in TABLES}
+        self._pending_kv: Dict[str, Optional[str]] = {}
+        # changes() corre con el almacén bloqueado y commit() en el hilo que escribe
+        self._lock = threading.Lock()
+
+    def reset(self, rows: Dict[str, Dict[str, str]], kv: Dict[str, str]):
+        with self._lock:
+            self.rows = {table.name: dict(rows.get(table.name, {})) for table in TABLES}
+            self.kv = dict(kv)
+            self._pending_rows = {table.name: {} for table in TABLES}
+            self._pending_kv = {}
+
+    def invalidate(self):
+        """Olvida lo persistido; el siguiente volcado reescribe todo."""
+        self.reset({}, {})
+
+    @staticmethod
+    def _overlay(known: Dict[str, str], pending: Dict[str, Optional[str]]) -> Dict[str, str]:
+        if not pending:
+            return known
+        merged = dict(known)
+        for key, serialized in pending.items():
+            if serialized is None:
+                merged.pop(key, None)
+            else:
+                merged[key] = serialized
+        return merged
+
+    def changes(self, data: Dict, touched: Optional[Set[Tuple[str, str]]] = None) -> Tuple[List[RowChange], List[KvChange]]:
+        """Calcula las filas y claves que difieren de lo persistido o pendiente.
+
+        Con ``touched`` sólo se revisan esas filas (tabla, id); con ``None``
+        se compara el almacén completo. Los cambios quedan pendientes hasta
+        ``commit`` o ``abort``.
+        """
+        row_changes: List[RowChange] = []
+        kv_changes: List[KvChange] = []
+        if touched is not None:
+            # Sólo las tablas tocadas (un almacén por shards no carga los demás)
+            rows = {}
+            for table_name in {table_name for table_name, _ in touched}:
+                container = get_path(data, TABLES_BY_NAME[table_name].path)
+                rows[table_name] = container if isinstance(container, dict) else None
+        else:
+            rows, kv = split_store(data)
+
+        with self._lock:
+            if touched is not None:
+                for table_name, row_id in touched:
+                    container = rows.get(table_name) or {}
+                    pending = self._pending_rows[table_name]
+                    known = pending[row_id] if row_id in pending else self.rows[table_name].get(row_id)
+                    if row_id in container:
+                        serialized = dump(container[row_id])
+                        if known != serialized:
+                            row_changes.append((table_name, row_id, serialized))
+                    elif known is not None:
+                        row_changes.append((table_name, row_id, None))
+            else:
+                for table in TABLES:
+                    container = rows[table.name] or {}
+                    known = self._overlay(self.rows[table.name], self._pending_rows[table.name])
+                    for row_id, row in container.items():
+                        serialized = dump(row)
+                        if known.get(row_id) != serialized:
+                            row_changes.append((table.name, row_id, serialized))
+                    row_changes.extend((table.name, row_id, None) for row_id in known if row_id not in container)
+
+                known = self._overlay(self.kv, self._pending_kv)
+                for key, value in kv.items():
+                    serialized = dump(value)
+                    if known.get(key) != serialized:
+                        kv_changes.append((key, serialized))
+                kv_changes.extend((key, None) for key in known if key not in kv)
+
+            # Sólo se anota cuando la comparación terminó sin errores
+            for table_name, row_id, serialized in row_changes:
+                self._pending_rows[table_name][row_id] = serialized
+            for key, serialized in kv_changes:
+                self._pending_kv[key] = serialized
+
+        return row_changes, kv_changes
+
+    def commit(self, row_changes: List[RowChange], kv_changes: List[KvChange]):
+        """Marca como persistidos unos cambios ya escritos."""
+        with self._lock:
+            for table_name, row_id, serialized in row_changes:
+                if serialized is None:
+                    self.rows[table_name].pop(row_id, None)
+                else:
+                    self.rows[table_name][row_id] = serialized
+                pending = self._pending_rows[table_name]
+                # Un volcado posterior pudo dejar pendiente otra versión de la fila
+                if row_id in pending and pending[row_id] == serialized:
+                    del pending[row_id]
+            for key, serialized in kv_changes:
+                if serialized is None:
+                    self.kv.pop(key, None)
+                else:
+                    self.kv[key] = serialized
+                if key in self._pending_kv and self._pending_kv[key] == serialized:
+                    del self._pending_kv[key]
+
+    def abort(self):
+        """Descarta lo pendiente tras una escritura fallida."""
+        with self._lock:
+            self._pending_rows = {table.name: {} for table in TABLES}
+            self._pending_kv = {}
+
+    def prime(self, data: Dict):
+        """Toma ``data`` como persistido (recién cargado de disco); puede ser sólo una parte del almacén."""
+        rows, kv = split_store(data)
+        with self._lock:
+            for table_name, container in rows.items():
+                if container:
+                    self.rows[table_name].update((row_id, dump(row)) for row_id, row in container.items())
+            self.kv.update((key, dump(value)) for key, value in kv.items())
+
+
+class JsonBackend:
+    """Guarda el almacén completo en un único archivo JSON."""
+
+    name = "json"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            # Nunca se sobrescribe un archivo dañado: se aparta para recuperarlo a mano
+            corrupt_path = f"{self.path}.corrupt-{int(time.time())}"
+            os.replace(self.path, corrupt_path)
+            logger.critical(f"{self.path} está dañado ({e}); copia guardada en {corrupt_path}")
+            return None
+
+    def prepare(self, data: Dict, touched=None):
+        return dump(data)
+
+    def write(self, payload: str):
+        atomic_write(self.path, payload)
+
+
+class JournaledJsonBackend(JsonBackend):
+    """JSON con journal de sólo-añadir: cada volcado escribe únicamente lo que cambió.
+
+    El primer volcado sin ``data.json`` escribe el snapshot completo, así que
+    el journal siempre se reaplica sobre uno.
+    """
+
+    name = "json+journal"
+
+    def __init__(self, path: str, compact_every: int = 1000):
+        super().__init__(path)
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self.tracker = RowTracker()
+        self._entries = 0
+        # El primer volcado siempre compara el almacén completo
+        self._primed = False
+
+    def load(self) -> Optional[Dict]:
+        data = super().load()
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Sólo la última línea puede quedar a medias tras un corte
+                        logger.warning("Entrada incompleta al final del journal, se descarta")
+                        break
+                    if data is None:
+                        data = {}
+                    apply_change(data, entry)
+                    replayed += 1
+        if data is None:
+            return None
+
+        ensure_tables(data)
+        self.tracker.prime(data)
+        if replayed:
+            logger.info(f"Recuperadas {replayed} entradas del journal, compactando")
+            self._compact(dump(data))
+        return data
+
+    def prepare(self, data: Dict, touched=None):
+        row_changes, kv_changes = self.tracker.changes(data, None if not self._primed else touched)
+        self._primed = True
+        snapshot = None
+        if (self._entries + len(row_changes) + len(kv_changes) >= self.compact_every
+                or not os.path.exists(self.path)):
+            try:
+                snapshot = dump(data)
+            except BaseException:
+                self.tracker.abort()
+                self._primed = False
+                raise
+            self._entries = 0
+        else:
+            self._entries += len(row_changes) + len(kv_changes)
+        return row_changes, kv_changes, snapshot
+
+    def write(self, payload):
+        row_changes, kv_changes, snapshot = payload
+        if row_changes or kv_changes:
+            lines = [
+                f'{{"k":{dump(key)},"v":{serialized or "null"}}}\n'
+                for key, serialized in kv_changes
+            ]
+            lines.extend(
+                f'{{"t":{dump(table_name)},"k":{dump(row_id)},"v":{serialized or "null"}}}\n'
+                for table_name, row_id, serialized in row_changes
+            )
+            try:
+                with open(self.journal_path, "a") as f:
+                    f.write("".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except BaseException:
+                # Lo no confirmado se vuelve a buscar comparando el almacén completo
+                self.tracker.abort()
+                self._primed = False
+                raise
+            self.tracker.commit(row_changes, kv_changes)
+        if snapshot is not None:
+            self._compact(snapshot)
+
+    def _compact(self, snapshot: str):
+        """Escribe el snapshot completo y vacía el journal que ya contiene."""
+        atomic_write(self.path, snapshot)
+        with open(self.journal_path, "w") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def shard_of(key: str) -> str:
+    return SHARD_OF_KEY.get(key, DEFAULT_SHARD)
+
+
+class ShardedStore(dict):
+    """Almacén de ``ShardedJsonBackend``: cada shard se lee la primera vez que se usa una de sus claves.
+
+    Las operaciones sobre una clave cargan sólo su shard; las que recorren el
+    almacén completo (``items``, ``len``, comparar...) cargan todos.
+    """
+
+    def __init__(self, loader, shards):
+        super().__init__()
+        self._loader = loader
+        self._pending = set(shards)
+        self._defaults = {}
+        self._lock = threading.RLock()
+
+    def _load(self, shard: str):
+        with self._lock:
+            if shard not in self._pending:
+                return
+            part = self._loader(shard) or {}
+            for key, value in part.items():
+                super().setdefault(key, value)
+            for key, value in self._defaults.items():
+                if shard_of(key) == shard:
+                    super().setdefault(key, value)
+            self._pending.discard(shard)
+
+    def _need(self, key):
+        if self._pending and shard_of(key) in self._pending:
+            self._load(shard_of(key))
+
+    def _need_all(self):
+        for shard in list(self._pending):
+            self._load(shard)
+
+    def add_defaults(self, defaults: Dict):
+        """Valores de las claves que falten; se aplican al cargar cada shard."""
+        with self._lock:
+            self._defaults.update(defaults)
+            for key, value in defaults.items():
+                if shard_of(key) not in self._pending:
+                    super().setdefault(key, value)
+
+    def shard(self, shard: str) -> Dict:
+        """Claves de un shard (cargándolo si hace falta)."""
+        self._load(shard)
+        return {key: value for key, value in super().items() if shard_of(key) == shard}
+
+    def __getitem__(self, key):
+        self._need(key)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._need(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._need(key)
+        super().__delitem__(key)
+
+    def __contains__(self, key):
+        self._need(key)
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self._need(key)
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self._need(key)
+        return super().setdefault(key, default)
+
+    def pop(self, key, *default):
+        self._need(key)
+        return super().pop(key, *default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __iter__(self):
+        self._need_all()
+        return super().__iter__()
+
+    def __len__(self):
+        self._need_all()
+        return super().__len__()
+
+    def keys(self):
+        self._need_all()
+        return super().keys()
+
+    def values(self):
+        self._need_all()
+        return super().values()
+
+    def items(self):
+        self._need_all()
+        return super().items()
+
+    def popitem(self):
+        self._need_all()
+        return super().popitem()
+
+    def copy(self):
+        self._need_all()
+        return dict(super().items())
+
+    def __eq__(self, other):
+        self._need_all()
+        return dict(super().items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._need_all()
+        return repr(dict(super().items()))
+
+
+class ShardedJsonBackend:
+    """Un archivo JSON por dominio; sólo se leen y se reescriben los shards que se usan."""
+
+    name = "sharded"
+
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        stem = os.path.splitext(json_path)[0]
+        self.shards = {
+            shard: JsonBackend(f"{stem}.{shard}.json")
+            for shard in (*SHARDS, DEFAULT_SHARD)
+        }
+        # Existe cuando data.json ya se dividió por completo
+        self.marker_path = f"{stem}.shards-complete"
+        self.tracker = RowTracker()
+        # El tracker aprende cada shard al cargarlo, así que no hace falta
+        # comparar el almacén completo (lo que cargaría todos los shards)
+        self._primed = True
+
+    def load(self) -> Optional[Dict]:
+        missing = [shard for shard, backend in self.shards.items() if not os.path.exists(backend.path)]
+        if not os.path.exists(self.marker_path):
+            # Sin marca la división inicial no terminó (o no empezó): como cada
+            # shard se escribe de forma atómica, los que faltan se toman de data.json
+            legacy = JsonBackend(self.json_path).load() if missing else None
+            if legacy is None and len(missing) == len(self.shards):
+                return None
+            if legacy is not None:
+                # Se conserva data.json como copia de seguridad
+                logger.info(f"Dividiendo {self.json_path} en shards: {', '.join(missing)}")
+                for shard in missing:
+                    self.shards[shard].write(dump(self._shard_data(legacy, shard)))
+            self._mark_complete()
+        elif missing:
+            # Con la división terminada data.json puede ser muy antiguo: no se usa
+            logger.error(f"Faltan los shards {', '.join(missing)}; se cargan vacíos "
+                         f"(data.json es una copia anterior a la división)")
+        return ShardedStore(self._load_shard, self.shards)
+
+    def _load_shard(self, shard: str) -> Optional[Dict]:
+        part = self.shards[shard].load()
+        if part:
+            self.tracker.prime(part)
+        return part
+
+    def _mark_complete(self):
+        atomic_write(self.marker_path, "")
+
+    @staticmethod
+    def _shard_data(data: Dict, shard: str) -> Dict:
+        if isinstance(data, ShardedStore):
+            return data.shard(shard)
+        return {key: value for key, value in data.items() if shard_of(key) == shard}
+
+    def prepare(self, data: Dict, touched=None):
+        row_changes, kv_changes = self.tracker.changes(data, None if not self._primed else touched)
+        self._primed = True
+        dirty = {shard_of(TABLES_BY_NAME[table_name].path[0]) for table_name, _, _ in row_changes}
+        dirty.update(shard_of(key) for key, _ in kv_changes)
+        try:
+            shards = [(shard, dump(self._shard_data(data, shard))) for shard in dirty]
+        except BaseException:
+            # Nada se escribirá: lo calculado no debe quedar como pendiente
+            self.tracker.abort()
+            self._primed = False
+            raise
+        return (row_changes, kv_changes), shards
+
+    def write(self, payload):
+        changes, shards = payload
+        try:
+            for shard, text in shards:
+                self.shards[shard].write(text)
+            if shards and not os.path.exists(self.marker_path):
+                # Instalación nueva: no hay data.json que dividir
+                self._mark_complete()
+        except BaseException:
+            self.tracker.abort()
+            self._primed = False
+            raise
+        self.tracker.commit(*changes)
+
+
+class SqliteBackend:
+    """Guarda cada colección como tabla SQLite en modo WAL, fila por fila."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, json_path: Optional[str] = None):
+        self.path = path
+        self.json_path = json_path
+        self.tracker = RowTracker()
+        self._conn = None
+        # El primer volcado siempre compara el almacén completo
+        self._primed = False
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+        return self._conn
+
+    def _create_schema(self):
+        with self._conn:
+            for table in TABLES:
+                extra = "".join(f", {column}" for column in table.columns)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table.name} (id TEXT PRIMARY KEY{extra}, data TEXT NOT NULL)"
+                )
+                for column in table.columns:
+                    self._conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{table.name}_{column} ON {table.name} ({column})"
+                    )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def is_empty(self) -> bool:
+        if self.conn.execute("SELECT 1 FROM kv LIMIT 1").fetchone():
+            return False
+        return not any(
+            self.conn.execute(f"SELECT 1 FROM {table.name} LIMIT 1").fetchone() for table in TABLES
+        )
+
+    def load(self) -> Optional[Dict]:
+        if self.is_empty():
+            if self.json_path and os.path.exists(self.json_path):
+                logger.info(f"Base SQLite vacía, migrando desde {self.json_path}")
+                data = JsonBackend(self.json_path).load()
+                if data is not None:
+                    self.write(self.tracker.changes(data))
+                    return data
+            return None
+
+        kv = {key: value for key, value in self.conn.execute("SELECT key, value FROM kv")}
+        rows = {
+            table.name: {
+                row_id: row for row_id, row in
+                self.conn.execute(f"SELECT id, data FROM {table.name} ORDER BY rowid")
+            }
+            for table in TABLES
+        }
+        self.tracker.reset(rows, kv)
+
+        data = {key: json.loads(value) for key, value in kv.items()}
+        for table in TABLES:
+            if not rows[table.name] and table.path[0] not in data:
+                continue
+            parent = data
+            for key in table.path[:-1]:
+                parent = parent.setdefault(key, {})
+            leaf = table.path[-1]
+            if rows[table.name] or not isinstance(parent.get(leaf), list):
+                parent[leaf] = {row_id: json.loads(row) for row_id, row in rows[table.name].items()}
+        return data
+
+    def prepare(self, data: Dict, touched=None):
+        changes = self.tracker.changes(data, None if not self._primed else touched)
+        self._primed = True
+        return changes
+
+    def write(self, payload):
+        row_changes, kv_changes = payload
+        if not row_changes and not kv_changes:
+            return
+        try:
+            with self.conn:
+                for table_name, row_id, serialized in row_changes:
+                    table = TABLES_BY_NAME[table_name]
+                    if serialized is None:
+                        self.conn.execute(f"DELETE FROM {table.name} WHERE id = ?", (row_id,))
+                        continue
+                    row = json.loads(serialized) if table.columns else None
+                    values = [row.get(column) if isinstance(row, dict) else None for column in table.columns]
+                    columns = ", ".join(("id",) + table.columns + ("data",))
+                    placeholders = ", ".join("?" * (len(table.columns) + 2))
+                    updates = ", ".join(f"{column} = excluded.{column}" for column in table.columns + ("data",))
+                    self.conn.execute(
+                        f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders}) "
+                        f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                        [row_id] + values + [serialized]
+                    )
+                for key, serialized in kv_changes:
+                    if serialized is None:
+                        self.conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+                    else:
+                        self.conn.execute(
+                            "INSERT INTO kv (key, value) VALUES (?, ?) "
+                            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                            (key, serialized)
+                        )
+        except BaseException:
+            # La transacción se deshizo: el siguiente volcado compara el almacén completo
+            self.tracker.abort()
+            self._primed = False
+            raise
+        self.tracker.commit(row_changes, kv_changes)
+
+
+def create_backend(kind: str, json_path: str, sqlite_path: str,
+                   journal: bool = False, compact_every: int = 1000):
+    """Crea el backend configurado (``json``, ``sharded`` o ``sqlite``)."""
+    if kind == "sqlite":
+        return SqliteBackend(sqlite_path, json_path=json_path)
+    if kind == "sharded":
+        return ShardedJsonBackend(json_path)
+    if kind != "json":
+        logger.warning(f"Backend de almacenamiento desconocido '{kind}', usando json")
+    if journal:
+        return JournaledJsonBackend(json_path, compact_every=compact_every)
+    return JsonBackend(json_path)
+
+
+def migrate_json_to_sqlite(json_path: str, sqlite_path: str) -> bool:
+    """Copia un ``data.json`` existente a una base SQLite nueva (una sola vez)."""
+    data = JsonBackend(json_path).load()
+    if data is None:
+        logger.error(f"No se pudo leer {json_path}")
+        return False
+
+    backend = SqliteBackend(sqlite_path)
+    if not backend.is_empty():
+        logger.error(f"{sqlite_path} ya contiene datos, no se migra")
+        return False
+
+    backend.write(backend.tracker.changes(data))
+    logger.info(f"Migración completada: {json_path} -> {sqlite_path}")
+    return True
+
+
+if __name__ == "__main__":
+    # Uso: python storage.py [data.json] [data.db]
+    from config import DATA_FILE
+    source = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + ".db"
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(0 if migrate_json_to_sqlite(source, target) else 1)
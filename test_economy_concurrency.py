@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de estrés de la economía: miles de transferencias y compras simultáneas
+(desde hilos y desde la fachada asíncrona) deben conservar el total de GameCoins.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import data_manager
+import storage
+from economy_system import economy
+from ledger import ledger
+from virtual_shop import virtual_shop
+from async_economy import async_economy, async_virtual_shop
+
+USERS = [str(100 + i) for i in range(20)]
+INITIAL_COINS = 1000
+PRICE = 7
+
+
+@contextmanager
+def _temporary_store(backend=None):
+    """Usa un almacén y un libro mayor temporales con usuarios y un producto de prueba.
+
+    ``backend`` crea el backend a partir del directorio temporal (JSON por
+    defecto). Al salir se restauran el almacén y el libro mayor anteriores,
+    para que el volcado de ``atexit`` y las demás pruebas no apunten a un
+    directorio borrado. Devuelve el ID del producto.
+    """
+    data_manager.flush_data()
+    saved_store = (data_manager._backend, data_manager._store)
+    saved_ledger = (ledger.path, ledger._file, ledger._offsets, ledger._times, ledger._totals)
+    saved_opened = set(economy._ledger_opened)
+    with tempfile.TemporaryDirectory() as directory:
+        data_manager._backend = (backend or _json_backend)(directory)
+        data_manager._store = None
+        ledger.path = os.path.join(directory, "ledger.ndjson")
+        ledger._file = None
+        ledger._offsets = None
+        economy._ledger_opened.clear()
+        try:
+            data = data_manager.load_data()
+            for user_id in USERS:
+                record = economy._new_user_record()
+                record["coins"] = INITIAL_COINS
+                data["economy"]["users"][user_id] = record
+                ledger.append(user_id, INITIAL_COINS, "Saldo inicial", INITIAL_COINS)
+            data_manager.save_data(data)
+            yield virtual_shop.add_virtual_product("Prueba", PRICE, "Producto de prueba")
+        finally:
+            data_manager.flush_data()
+            if ledger._file is not None:
+                ledger._file.close()
+            data_manager._backend, data_manager._store = saved_store
+            ledger.path, ledger._file, ledger._offsets, ledger._times, ledger._totals = saved_ledger
+            economy._ledger_opened.clear()
+            economy._ledger_opened.update(saved_opened)
+
+
+def _json_backend(directory):
+    return storage.JsonBackend(os.path.join(directory, "data.json"))
+
+
+def _sqlite_backend(directory):
+    return storage.SqliteBackend(os.path.join(directory, "data.db"))
+
+
+def _total_coins():
+    return sum(economy.get_user_economy(user_id)["coins"] for user_id in USERS)
+
+
+def _level_bonuses():
+    # Recibir una transferencia da XP y puede subir de nivel: el bonus es la única fuente de coins nuevos
+    return sum(
+        entry["delta"]
+        for user_id in USERS
+        for entry in ledger.history(user_id)
+        if entry["reason"].startswith("Bonus nivel")
+    )
+
+
+def _check(purchases):
+    bonuses = _level_bonuses()
+    expected = INITIAL_COINS * len(USERS) - PRICE * purchases + bonuses
+    total = _total_coins()
+    print(f"Total: {total:,} GameCoins (esperado {expected:,}, compras: {purchases}, bonus: {bonuses:,})")
+    assert total == expected
+    for user_id in USERS:
+        balance = economy.get_user_economy(user_id)["coins"]
+        assert balance >= 0
+        # El libro mayor debe explicar cada balance
+        assert ledger.total(user_id) == balance
+
+
+def _random_operation(rng):
+    a, b = rng.sample(USERS, 2)
+    if rng.random() < 0.8:
+        return ("transfer", a, b, rng.randint(1, 400))
+    return ("purchase", a, None, None)
+
+
+def test_threaded_operations_conserve_coins():
+    """Operaciones desde muchos hilos a la vez"""
+    with _temporary_store() as product_id:
+        rng = random.Random(1)
+        operations = [_random_operation(rng) for _ in range(4000)]
+
+        def run(operation):
+            kind, a, b, amount = operation
+            if kind == "transfer":
+                economy.transfer_coins(a, b, amount)
+                return 0
+            return 1 if virtual_shop.purchase_virtual_product(a, product_id)["success"] else 0
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            purchases = sum(pool.map(run, operations))
+        _check(purchases)
+        assert virtual_shop.get_virtual_products()[product_id]["purchases_count"] == purchases
+
+
+def test_async_operations_conserve_coins():
+    """Operaciones concurrentes a través de la fachada asíncrona"""
+    with _temporary_store() as product_id:
+        rng = random.Random(2)
+        operations = [_random_operation(rng) for _ in range(2000)]
+
+        async def run(operation):
+            kind, a, b, amount = operation
+            if kind == "transfer":
+                await async_economy.transfer_coins(a, b, amount)
+                return 0
+            result = await async_virtual_shop.purchase_virtual_product(a, product_id)
+            return 1 if result["success"] else 0
+
+        async def main():
+            return await asyncio.gather(*(run(operation) for operation in operations))
+
+        purchases = sum(asyncio.run(main()))
+        _check(purchases)
+
+
+def test_ledger_opening_balance_and_refs():
+    """Un usuario anterior al libro mayor recibe su saldo inicial y cada movimiento lleva la clave"""
+    with _temporary_store() as product_id:
+        data = data_manager.load_data()
+        legacy = economy._new_user_record()
+        legacy["coins"] = 500
+        data["economy"]["users"]["legacy"] = legacy
+        data_manager.save_data(data)
+
+        assert economy.transfer_coins("legacy", USERS[0], 50, idempotency_key="t1")
+        result = asyncio.run(async_virtual_shop.purchase_virtual_product("legacy", product_id, idempotency_key="p1"))
+        assert result["success"]
+
+        entries = ledger.history("legacy")
+        assert entries[0]["reason"] == "Saldo inicial" and entries[0]["delta"] == 500
+        assert [entry["ref"] for entry in entries[1:]] == ["t1", "p1"]
+        assert ledger.total("legacy") == economy.get_user_economy("legacy")["coins"] == 500 - 50 - PRICE
+
+
+def test_keyed_operations_during_flushes():
+    """Operaciones con clave desde varios hilos mientras se vuelca el almacén"""
+    # El volcado fila a fila recorre los diccionarios del almacén en Python
+    with _temporary_store(_sqlite_backend):
+        max_keys = economy.idempotency.max_keys
+        # Pocas claves: casi cada operación purga alguna
+        economy.idempotency.max_keys = 20
+        stop = threading.Event()
+        errors = []
+
+        def flush():
+            while not stop.is_set():
+                try:
+                    data_manager.flush_data()
+                except Exception as e:
+                    errors.append(e)
+
+        def run(i):
+            user_id = USERS[i % len(USERS)]
+            return economy.add_coins(user_id, 1, "Prueba", idempotency_key=f"flush:{i}")
+
+        # Cambios de hilo frecuentes para que las carreras se manifiesten
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        flusher = threading.Thread(target=flush)
+        flusher.start()
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(run, range(2000)))
+        finally:
+            stop.set()
+            flusher.join()
+            sys.setswitchinterval(interval)
+            economy.idempotency.max_keys = max_keys
+        assert not errors, errors
+        data_manager.flush_data()
+        assert len(data_manager.load_data()["economy"]["idempotency"]) <= 20
+        for user_id in USERS:
+            assert economy.get_user_economy(user_id)["coins"] == ledger.total(user_id)
+
+
+if __name__ == "__main__":
+    print("=== PRUEBA DE CONCURRENCIA DE LA ECONOMÍA ===")
+    test_threaded_operations_conserve_coins()
+    test_async_operations_conserve_coins()
+    test_ledger_opening_balance_and_refs()
+    test_keyed_operations_during_flushes()
+    print("✅ Total de GameCoins conservado")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del motor de minijuegos: es puro y determinista con una semilla, las
+tablas coinciden con las reglas y el simulador mide lo mismo que se juega.
+"""
+
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from games import engine, rules, simulator, strategy
+from games.shoe import Shoe
+
+
+def _card(rank):
+    return engine.CARD_RANK.index(rank)
+
+
+def test_hand_value_matches_rules():
+    """El valor por tablas coincide con la regla de ases sobre rangos"""
+    for size in (2, 3, 4):
+        for ranks in itertools.product(rules.CARD_RANKS, repeat=size):
+            assert engine.hand_value([_card(r) for r in ranks]) == rules.hand_value(ranks), ranks
+
+
+def test_seeded_games_are_reproducible():
+    """Con la misma semilla se reparten y juegan las mismas manos"""
+    def play(seed):
+        rng = random.Random(seed)
+        hands = []
+        for _ in range(200):
+            game = engine.BlackjackGame(10, rng=rng)
+            while game.can_hit() and game.player_value < 17:
+                game.hit()
+            hands.append((tuple(game.player), tuple(game.dealer), game.finish(), game.payout))
+        spins = [engine.spin_slots(rng) for _ in range(50)] + [engine.spin_roulette(rng) for _ in range(50)]
+        return hands, spins
+
+    assert play(7) == play(7)
+    assert play(7) != play(8)
+
+
+def test_interactive_outcomes():
+    """Orden de resolución de la partida interactiva"""
+    def game(player, dealer, rest=("2",) * 10):
+        # pop() reparte desde el final: jugador, jugador, dealer, dealer, resto
+        deck = [_card(r) for r in reversed(list(player) + list(dealer) + list(rest))]
+        return engine.BlackjackGame(100, deck=deck)
+
+    assert game(("A", "K"), ("A", "Q")).finish() == "tie"
+    assert game(("10", "9"), ("A", "Q")).finish() == "dealer_blackjack"
+
+    natural = game(("A", "K"), ("10", "6"), rest=("A",))
+    assert natural.finish() == "blackjack" and natural.payout == 250
+    # Como en la vista original, si el dealer se pasa un natural cobra 2x
+    assert game(("A", "K"), ("10", "6"), rest=("9",)).finish() == "dealer_bust"
+
+    bust = game(("10", "6"), ("10", "7"), rest=("9",))
+    bust.hit()
+    assert bust.finish() == "player_bust" and bust.payout == 0
+    # El dealer no juega si el jugador ya se pasó
+    assert len(bust.dealer) == 2
+
+    insured = game(("10", "6"), ("K", "A"))
+    assert insured.can_insure()
+    insured.take_insurance()
+    insured.finish()
+    assert insured.insurance_payout == 150 and insured.payout == 0
+
+    doubled = game(("5", "6"), ("10", "7"), rest=("10",))
+    doubled.double()
+    assert not doubled.can_double()
+    assert doubled.finish() == "player_wins" and doubled.payout == 400
+
+
+def test_simulator_matches_engine():
+    """El blackjack vectorizado del simulador reproduce las manos del motor"""
+    import numpy as np
+
+    rng = np.random.default_rng(3)
+    decks = np.argsort(rng.random((5000, engine.DECK_SIZE)), axis=1)
+    expected = [
+        rules.BLACKJACK_PAYOUTS[engine.AutoBlackjack(deck=list(deck[::-1])).outcome] for deck in decks
+    ]
+
+    class Replay:
+        def random(self, shape):
+            # argsort de estas claves devuelve exactamente ``decks``
+            keys = np.empty(shape)
+            np.put_along_axis(keys, decks, np.arange(shape[1], dtype=float), axis=1)
+            return keys
+
+    # El simulador reparte desde el inicio de la permutación y el motor desde el final
+    assert list(simulator._blackjack(Replay(), len(decks))) == expected
+
+
+def test_shoe_penetration():
+    """El zapato sólo se mezcla entre rondas, al pasar la carta de corte"""
+    rng = random.Random(5)
+    shoe = Shoe(decks=2, penetration=0.5)
+    shoe.start_round(rng)
+    assert shoe.shuffles == 1 and Counter(shoe.cards) == Counter(list(range(engine.DECK_SIZE)) * 2)
+    rounds = 0
+    while shoe.shuffles == 1:
+        game = engine.BlackjackGame(10, deck=shoe.start_round(rng))
+        game.finish()
+        rounds += 1
+    # Se mezcló al empezar la ronda en que ya se habían repartido 52 de 104 cartas
+    assert rounds > 5 and shoe.dealt <= 12
+    restored = Shoe.from_dict(json.loads(json.dumps(shoe.to_dict())))
+    assert restored.cards == shoe.cards and restored.shuffles == shoe.shuffles
+
+
+def test_strategy_tables():
+    """Las tablas se cachean en disco y se recalculan si cambian las reglas"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ev.json")
+        tables = strategy.load_tables(path)
+        assert os.path.exists(path)
+        assert strategy.load_tables(path) == tables
+
+        with open(path, "w") as f:
+            json.dump(dict(tables, signature="otras reglas", ev=1.0), f)
+        assert strategy.load_tables(path)["ev"] == tables["ev"]
+
+    # Seguro: con As visible el dealer tiene natural 4 de cada 13 veces
+    assert abs(tables["insurance"] - (3 * 4 / 13 - 1)) < 1e-12
+    # Jugadas de libro: doblar 11 contra 6, plantarse con 20, pedir con 16 contra un 10
+    game = engine.BlackjackGame(10, deck=[_card(r) for r in reversed(("5", "6", "10", "6"))])
+    assert strategy.best_action(tables, game)[0] == "double"
+    game = engine.BlackjackGame(10, deck=[_card(r) for r in reversed(("K", "Q", "10", "6"))])
+    assert strategy.best_action(tables, game)[0] == "stand"
+    game = engine.BlackjackGame(10, deck=[_card(r) for r in reversed(("10", "6", "7", "K"))])
+    assert strategy.best_action(tables, game)[0] == "hit"
+    assert 0 < strategy.house_edge(tables) < 0.05
+
+
+def test_engine_speed():
+    """Referencia rápida: miles de manos interactivas por segundo"""
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(20000):
+        game = engine.BlackjackGame(10, rng=rng)
+        while game.can_hit() and game.player_value < 17:
+            game.hit()
+        game.finish()
+    elapsed = time.perf_counter() - start
+    print(f"20,000 manos en {elapsed:.3f}s")
+    assert elapsed < 10
+
+
+if __name__ == "__main__":
+    print("=== PRUEBAS DEL MOTOR DE MINIJUEGOS ===")
+    test_hand_value_matches_rules()
+    test_seeded_games_are_reproducible()
+    test_interactive_outcomes()
+    test_simulator_matches_engine()
+    test_shoe_penetration()
+    test_strategy_tables()
+    test_engine_speed()
+    print("✅ Motor de minijuegos correcto")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del cliente HTTP compartido contra un servidor local de prueba:
+reutiliza conexiones, limita la concurrencia por host, reintenta errores
+pasajeros y el circuit breaker responde con la última respuesta guardada.
+"""
+
+import asyncio
+import time
+
+from aiohttp import web
+
+from http_client import CircuitOpenError, HttpClient, HttpError
+
+
+class StubServer:
+    """Servidor aiohttp en 127.0.0.1 con respuestas programables"""
+
+    def __init__(self):
+        self.hits = 0
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+        # Códigos a devolver en las siguientes peticiones (luego 200)
+        self.failures = []
+        self.delay = 0.0
+        self.down = False
+
+    async def handle(self, request):
+        self.hits += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if self.down:
+                return web.Response(status=503)
+            if self.failures:
+                return web.Response(status=self.failures.pop(0))
+            if request.path == "/missing":
+                return web.json_response({"error": "no existe"}, status=404)
+            return web.json_response({"hits": self.hits, "lang": request.query.get("lang")})
+        finally:
+            self.active -= 1
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = "http://127.0.0.1:%d" % self.runner.addresses[0][1]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def _client(**kwargs):
+    options = dict(retries=3, backoff=0.01, breaker_threshold=2, breaker_cooldown=0.3)
+    options.update(kwargs)
+    return HttpClient(**options)
+
+
+def test_pooled_session_and_per_host_limit():
+    """Todas las peticiones comparten conexiones y respetan el límite por host"""
+    async def main():
+        async with StubServer() as server:
+            client = _client(max_per_host=2)
+            for _ in range(5):
+                response = await client.get(f"{server.url}/shop", params={"lang": "es"})
+                assert response.ok and response.data["lang"] == "es"
+            assert len(server.connections) == 1
+
+            server.delay = 0.05
+            responses = await asyncio.gather(*(client.get(f"{server.url}/x{i}") for i in range(8)))
+            assert all(response.ok for response in responses)
+            assert server.max_active == 2
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_retries_transient_errors_only():
+    """503 y 429 se reintentan; un 404 se devuelve sin reintentar"""
+    async def main():
+        async with StubServer() as server:
+            client = _client()
+            server.failures = [503, 429]
+            response = await client.get(f"{server.url}/rates")
+            assert response.ok and server.hits == 3
+
+            response = await client.get(f"{server.url}/missing")
+            assert response.status == 404 and not response.ok and server.hits == 4
+            assert client.breaker(server.url.split("/")[2]).state == "closed"
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_circuit_breaker_serves_cached_response():
+    """Con el host caído se responde desde la caché y sin llamarlo hasta que pasa la espera"""
+    async def main():
+        async with StubServer() as server:
+            client = _client()
+            url = f"{server.url}/rates"
+            fresh = await client.get(url)
+            assert not fresh.from_cache
+
+            server.down = True
+            for _ in range(2):
+                stale = await client.get(url)
+                assert stale.from_cache and stale.data == fresh.data
+            host = url.split("/")[2]
+            assert client.breaker(host).state == "open"
+
+            # Abierto: no se llama al servidor y una petición sin caché falla al instante
+            hits = server.hits
+            assert (await client.get(url)).from_cache
+            start = time.monotonic()
+            try:
+                await client.get(f"{server.url}/other")
+                assert False, "debía fallar"
+            except CircuitOpenError:
+                pass
+            assert server.hits == hits and time.monotonic() - start < 0.1
+
+            # Tras la espera, una petición de prueba cierra el circuito si el host volvió
+            server.down = False
+            await asyncio.sleep(0.35)
+            response = await client.get(url)
+            assert response.ok and not response.from_cache
+            assert client.breaker(host).state == "closed"
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_cache_keeps_recent_requests_only():
+    """La caché de respaldo no crece sin límite: se descarta la petición menos usada"""
+    async def main():
+        async with StubServer() as server:
+            client = _client(cache_size=2)
+            for lang in ("es", "en", "fr"):
+                await client.get(f"{server.url}/shop", params={"lang": lang})
+            assert len(client._cache) == 2
+
+            server.down = True
+            assert (await client.get(f"{server.url}/shop", params={"lang": "fr"})).from_cache
+            try:
+                await client.get(f"{server.url}/shop", params={"lang": "es"})
+                assert False, "debía fallar"
+            except HttpError:
+                pass
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_unreachable_host_raises_http_error():
+    """Sin servidor y sin caché se lanza HttpError tras los reintentos"""
+    async def main():
+        client = _client(retries=2, timeout=1)
+        try:
+            await client.get("http://127.0.0.1:9/nada")
+            assert False, "debía fallar"
+        except HttpError:
+            pass
+        await client.close()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    print("=== PRUEBAS DEL CLIENTE HTTP ===")
+    test_pooled_session_and_per_host_limit()
+    test_retries_transient_errors_only()
+    test_circuit_breaker_serves_cached_response()
+    test_cache_keeps_recent_requests_only()
+    test_unreachable_host_raises_http_error()
+    print("✅ Cliente HTTP correcto")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de los backends de persistencia: el almacén sobrevive a un volcado y
+una recarga, la migración desde data.json y que un volcado fallido no dé por
+persistidas filas que nunca llegaron a disco.
+"""
+
+import json
+import os
+import tempfile
+
+import storage
+
+
+def _store():
+    return {
+        "ticket_counter": 3,
+        "payment_info": {"PayPal": "pagos@ejemplo.com"},
+        "tickets": {"1": {"user_id": "10", "status": "abierto"}},
+        "economy": {
+            "users": {"10": {"coins": 100, "level": 1}, "11": {"coins": 50, "level": 2}},
+            "global_stats": {"total_games_played": 4},
+            "idempotency": {},
+            "blackjack_shoes": {},
+        },
+        "virtual_shop": {
+            "products": {"p": {"name": "Rol", "price": 10}},
+            "purchases": {},
+            "settings": {"enabled": True},
+        },
+    }
+
+
+def _flush(backend, data, touched=None):
+    backend.write(backend.prepare(data, touched))
+
+
+def test_sqlite_round_trip():
+    """Lo volcado (completo y fila a fila) se vuelve a cargar igual"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.db")
+        data = _store()
+        backend = storage.SqliteBackend(path)
+        _flush(backend, data)
+        assert storage.SqliteBackend(path).load() == data
+
+        data["economy"]["users"]["10"]["coins"] = 75
+        del data["economy"]["users"]["11"]
+        _flush(backend, data, {("economy_users", "10"), ("economy_users", "11")})
+        assert storage.SqliteBackend(path).load() == data
+
+
+def test_sqlite_migrates_data_json():
+    """Una base vacía se llena desde data.json y después se carga de SQLite"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        with open(json_path, "w") as f:
+            json.dump(_store(), f)
+        path = os.path.join(directory, "data.db")
+        assert storage.SqliteBackend(path, json_path=json_path).load() == _store()
+
+        os.remove(json_path)
+        assert storage.SqliteBackend(path, json_path=json_path).load() == _store()
+
+
+def test_failed_write_is_flushed_again():
+    """Si la escritura falla, el siguiente volcado vuelve a escribir esas filas"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.db")
+        data = _store()
+        backend = storage.SqliteBackend(path)
+        _flush(backend, data)
+
+        data["economy"]["users"]["10"]["coins"] = 75
+        payload = backend.prepare(data, {("economy_users", "10")})
+        conn = backend._conn
+        backend._conn = None
+        conn.close()
+        backend._conn = conn
+        try:
+            backend.write(payload)
+            assert False, "debía fallar"
+        except storage.sqlite3.Error:
+            pass
+        backend._conn = None
+
+        # Sin nada nuevo que volcar, la fila sigue pendiente de escribirse
+        _flush(backend, data, set())
+        assert storage.SqliteBackend(path).load() == data
+
+
+def test_failed_prepare_is_flushed_again():
+    """Si preparar el volcado falla, nada de lo calculado cuenta como persistido"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        data = _store()
+        backend = storage.ShardedJsonBackend(json_path)
+        _flush(backend, data)
+
+        data["economy"]["users"]["10"]["coins"] = 75
+        # Otra clave del mismo volcado no se puede serializar
+        data["economy"]["global_stats"]["total_games_played"] = object()
+        try:
+            backend.prepare(data, {("economy_users", "10")})
+            assert False, "debía fallar"
+        except TypeError:
+            pass
+        data["economy"]["global_stats"]["total_games_played"] = 5
+
+        _flush(backend, data, set())
+        assert storage.ShardedJsonBackend(json_path).load() == data
+
+
+def test_journal_recovers_torn_last_line():
+    """Una línea cortada al final del journal se descarta y lo anterior se recupera"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        data = _store()
+        backend = storage.JournaledJsonBackend(json_path)
+        _flush(backend, data)
+        assert os.path.exists(json_path)
+
+        data["economy"]["users"]["10"]["coins"] = 75
+        _flush(backend, data, {("economy_users", "10")})
+        with open(backend.journal_path, "a") as f:
+            f.write('{"t":"economy_users","k":"11","v":{"coi')
+
+        assert storage.JournaledJsonBackend(json_path).load() == data
+
+
+def test_journal_without_snapshot():
+    """Sin data.json el almacén se reconstruye del journal con sus tablas vacías"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        with open(json_path + ".journal", "w") as f:
+            f.write('{"k":"virtual_shop","v":{"settings":{"enabled":true}}}\n')
+            f.write('{"k":"economy","v":{"global_stats":{}}}\n')
+            f.write('{"t":"economy_users","k":"10","v":{"coins":100}}\n')
+
+        data = storage.JournaledJsonBackend(json_path).load()
+        assert data["virtual_shop"]["products"] == {} and data["virtual_shop"]["purchases"] == {}
+        assert data["economy"]["users"] == {"10": {"coins": 100}}
+
+
+def test_shards_load_lazily():
+    """Sólo se lee el shard de las claves que se usan"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        _flush(storage.ShardedJsonBackend(json_path), _store())
+
+        backend = storage.ShardedJsonBackend(json_path)
+        data = backend.load()
+        data["economy"]["users"]["10"]["coins"] = 75
+        _flush(backend, data, {("economy_users", "10")})
+        assert data._pending == set(storage.SHARDS) - {"economy"} | {storage.DEFAULT_SHARD}
+
+        expected = _store()
+        expected["economy"]["users"]["10"]["coins"] = 75
+        assert storage.ShardedJsonBackend(json_path).load() == expected
+
+
+def test_interrupted_split_is_completed():
+    """Si la división inicial se cortó, los shards que faltan salen de data.json"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        with open(json_path, "w") as f:
+            json.dump(_store(), f)
+        backend = storage.ShardedJsonBackend(json_path)
+        # Corte tras escribir sólo el shard de la economía
+        backend.shards["economy"].write(storage.dump({"economy": _store()["economy"]}))
+        assert not os.path.exists(backend.marker_path)
+
+        assert storage.ShardedJsonBackend(json_path).load() == _store()
+        assert os.path.exists(backend.marker_path)
+
+
+def test_missing_shard_after_split_is_not_restored():
+    """Con la división terminada, un shard borrado no revive desde el data.json antiguo"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "data.json")
+        with open(json_path, "w") as f:
+            json.dump(_store(), f)
+        backend = storage.ShardedJsonBackend(json_path)
+        backend.load()
+        os.remove(backend.shards["tickets"].path)
+
+        data = storage.ShardedJsonBackend(json_path).load()
+        assert "tickets" not in data and "ticket_counter" not in data
+        assert data["economy"] == _store()["economy"]
+
+
+def test_row_reverted_while_write_in_flight():
+    """Una fila que vuelve a su valor persistido antes de escribirse no se pierde"""
+    tracker = storage.RowTracker()
+    data = _store()
+    tracker.prime(data)
+    touched = {("economy_users", "10")}
+
+    data["economy"]["users"]["10"]["coins"] = 75
+    first = tracker.changes(data, touched)
+    data["economy"]["users"]["10"]["coins"] = 100
+    second = tracker.changes(data, touched)
+    tracker.commit(*first)
+    tracker.commit(*second)
+
+    assert json.loads(second[0][0][2])["coins"] == 100
+    assert tracker.changes(data) == ([], [])
+
+
+if __name__ == "__main__":
+    print("=== PRUEBAS DE PERSISTENCIA ===")
+    test_sqlite_round_trip()
+    test_sqlite_migrates_data_json()
+    test_failed_write_is_flushed_again()
+    test_failed_prepare_is_flushed_again()
+    test_journal_recovers_torn_last_line()
+    test_journal_without_snapshot()
+    test_shards_load_lazily()
+    test_interrupted_split_is_completed()
+    test_missing_shard_after_split_is_not_restored()
+    test_row_reverted_while_write_in_flight()
+    print("✅ Persistencia correcta")
@@ -1,6 +1,5 @@
 import discord
 from discord import app_commands
-import requests
 import uuid
 from datetime import datetime
 from typing import Optional, Callable, Any, Dict, List
@@ -9,6 +8,7 @@ import aiohttp
 import logging
 from functools import wraps
 import asyncio
+import random
 
 # Configuración del sistema de logging
 logging.basicConfig(
@@ -22,19 +22,30 @@ logging.basicConfig(
 logger = logging.getLogger('DiscordBot')
 
 # Decorador para reintentos en operaciones críticas
-def retry_operation(max_retries: int = 3, delay: float = 1.0):
+def retry_operation(max_retries: int = 3, delay: float = 1.0, backoff: float = 1.0,
+                    max_delay: Optional[float] = None, jitter: bool = False,
+                    retry_on: tuple = (Exception,)):
+    """Reintenta una corrutina que falla.
+
+    La espera entre intentos empieza en ``delay`` y se multiplica por
+    ``backoff`` en cada fallo (hasta ``max_delay``); con ``jitter`` se elige
+    al azar entre 0 y esa espera para que los clientes no reintenten a la
+    vez. Sólo se reintentan las excepciones de ``retry_on``.
+    """
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
+            wait = delay
             for attempt in range(max_retries):
                 try:
                     return await func(*args, **kwargs)
-                except Exception as e:
+                except retry_on as e:
                     if attempt == max_retries - 1:
                         logger.error(f'Error en {func.__name__} después de {max_retries} intentos: {str(e)}')
                         raise
                     logger.warning(f'Intento {attempt + 1} fallido para {func.__name__}: {str(e)}')
-                    await asyncio.sleep(delay)
+                    await asyncio.sleep(random.uniform(0, wait) if jitter else wait)
+                    wait = wait * backoff if max_delay is None else min(wait * backoff, max_delay)
             return None
         return wrapper
     return decorator
@@ -120,12 +131,18 @@ async def setup_error_handlers(tree: app_commands.CommandTree):
             print(f"Error al manejar error de comando: {e}")
             print(f"Error original: {error}")
 
-def sync_fortnite_shop():
+async def sync_fortnite_shop():
+    # Import diferido: http_client usa retry_operation de este módulo
+    from http_client import HttpError, http_client
     data = load_data()
     try:
-        response = requests.get(f"{FORTNITE_API_URL}/shop?lang=es", headers=FORTNITE_HEADERS)
-        response.raise_for_status()
-        shop_data = response.json().get("shop", [])
+        response = await http_client.get(f"{FORTNITE_API_URL}/shop", params={"lang": "es"}, headers=FORTNITE_HEADERS)
+        if response.from_cache:
+            # La API no responde: se siguen mostrando los regalos ya guardados
+            raise HttpError("La API de la tienda no está disponible")
+        if not response.ok or not isinstance(response.data, dict):
+            raise HttpError(f"La API de la tienda respondió con código {response.status}")
+        shop_data = response.data.get("shop", [])
         
         # Clear previously synced gifts, keep manual ones
         data["gifts"] = {k: v for k, v in data["gifts"].items() if v.get("source") == "manual"}
@@ -148,7 +165,7 @@ def sync_fortnite_shop():
             
         save_data(data)
         return True
-    except requests.RequestException as e:
+    except HttpError as e:
         logger.error(f"Error al sincronizar tienda: {e}")
         return False
 
@@ -1,117 +1,105 @@
 import discord
-import random
-from typing import Dict, List, Tuple
+from typing import List
+from async_economy import async_economy
+from blackjack_shoes import get_strategy_tables, shoes
+from games import strategy
+from games.engine import BlackjackGame, Card, card_tuple
+
+# Presentación de cada resultado: (color, título, texto); {amount} es lo pagado o lo perdido
+OUTCOME_EMBEDS = {
+    "player_bust": (0xff0000, "🃏 Te pasaste - Perdiste", "😢 Tu mano se pasó de 21\n-{amount} GameCoins"),
+    "dealer_blackjack": (0xff0000, "🃏 Perdiste - Blackjack del dealer", "😢 El dealer tiene Blackjack\n-{amount} GameCoins"),
+    "dealer_bust": (0x00ff00, "🃏 ¡Ganaste! - Dealer se pasó", "🎉 ¡El dealer se pasó de 21!\n+{amount} GameCoins"),
+    "blackjack": (0xffd700, "🃏 ¡BLACKJACK! 🎉", "🎉 ¡Blackjack natural!\n+{amount} GameCoins"),
+    "player_wins": (0x00ff00, "🃏 ¡Ganaste!", "🎉 ¡Tu mano es mejor!\n+{amount} GameCoins"),
+    "tie": (0xffff00, "🃏 Empate", "🤝 Empate - Apuesta devuelta\n+{amount} GameCoins"),
+    "dealer_wins": (0xff0000, "🃏 Perdiste", "😢 El dealer tiene mejor mano\n-{amount} GameCoins"),
+}
+
+ACTION_LABELS = {
+    "hit": "🃏 Hit",
+    "stand": "✋ Stand",
+    "double": "💰 Double",
+    "split": "✂️ Split",
+}
 
 class BlackjackView(discord.ui.View):
-    def __init__(self, user_id: str, bet: int, economy_system):
+    def __init__(self, user_id: str, bet: int, economy_system, game_id: str = None, rng=None, channel_id=None):
         super().__init__(timeout=300)  # 5 minutos de timeout
         self.user_id = user_id
-        self.bet = bet
-        self.original_bet = bet  # Guardar apuesta original para double
+        self.game_id = game_id  # ID de la interacción que abrió la partida
         self.economy = economy_system
-        self.game_over = False
-        self.can_split = False
-        self.has_split = False
-        self.can_double = True  # Permitir double en las primeras dos cartas
-        self.insurance_offered = False
-        self.has_insurance = False
-        
-        # Crear baraja
-        self.suits = ["♠️", "♥️", "♦️", "♣️"]
-        self.ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-        self.deck = [(rank, suit) for suit in self.suits for rank in self.ranks]
-        random.shuffle(self.deck)
-        
-        # Repartir cartas iniciales
-        self.player_hand = [self.deck.pop(), self.deck.pop()]
-        self.dealer_hand = [self.deck.pop(), self.deck.pop()]
-        
-        # Verificar si se puede dividir (par)
-        if self.player_hand[0][0] == self.player_hand[1][0]:
-            self.can_split = True
+        # Con canal se reparte de su zapato; sin él, de una baraja nueva
+        self.channel_id = channel_id
+        shoe = shoes.start_round(channel_id, rng) if channel_id is not None else None
+        # Reglas y estado de la partida; la vista sólo cobra, paga y dibuja
+        self.game = BlackjackGame(bet, rng=rng, deck=shoe)
+        # Acciones cuyo cobro está en curso (evita que un doble clic las repita)
+        self.pending = set()
         
         self.update_buttons()
     
-    def calculate_hand_value(self, hand: List[Tuple[str, str]]) -> int:
-        """Calcula el valor de una mano"""
-        value = 0
-        aces = 0
-        for card, _ in hand:
-            if card in ["J", "Q", "K"]:
-                value += 10
-            elif card == "A":
-                aces += 1
-                value += 11
-            else:
-                value += int(card)
-        
-        # Ajustar ases
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-        
-        return value
+    @property
+    def bet(self) -> int:
+        return self.game.bet
+    
+    @property
+    def game_over(self) -> bool:
+        return self.game.finished
+    
+    def operation_key(self, action: str):
+        """Clave de idempotencia de una acción de esta partida (una por partida)"""
+        if self.game_id is None:
+            return None
+        return f"blackjack:{self.game_id}:{action}"
     
-    def format_hand(self, hand: List[Tuple[str, str]], hide_first: bool = False) -> str:
+    async def refund_if_finished(self, interaction: discord.Interaction, action: str, amount: int) -> bool:
+        """Devuelve un cobro que terminó con la partida ya cerrada (p. ej. otra acción la terminó)"""
+        if not self.game.finished:
+            return False
+        await async_economy.add_coins(
+            self.user_id, amount, f"Blackjack {action} refund", idempotency_key=self.operation_key(f"{action}_refund")
+        )
+        await interaction.response.send_message(
+            "❌ La partida ya terminó; se te devolvieron los GameCoins.", ephemeral=True
+        )
+        return True
+    
+    def format_hand(self, hand: List[Card], hide_first: bool = False) -> str:
         """Formatea una mano para mostrar"""
         if hide_first:
-            return f"🂠 {hand[1][0]}{hand[1][1]}"
-        return " ".join([f"{card}{suit}" for card, suit in hand])
+            rank, suit = card_tuple(hand[1])
+            return f"🂠 {rank}{suit}"
+        return " ".join(f"{rank}{suit}" for rank, suit in map(card_tuple, hand))
     
     def create_embed(self) -> discord.Embed:
         """Crea el embed del juego"""
-        player_value = self.calculate_hand_value(self.player_hand)
-        dealer_value = self.calculate_hand_value(self.dealer_hand)
+        game = self.game
+        player_value = game.player_value
+        dealer_value = game.dealer_value
         
-        if self.game_over:
+        if game.finished:
             # Mostrar todas las cartas del dealer
-            dealer_cards = self.format_hand(self.dealer_hand)
-            
-            # Determinar resultado
-            if player_value > 21:
-                color = 0xff0000
-                title = "🃏 Te pasaste - Perdiste"
-                result = f"😢 Tu mano se pasó de 21\n-{self.bet} GameCoins"
-            elif dealer_value > 21:
-                color = 0x00ff00
-                title = "🃏 ¡Ganaste! - Dealer se pasó"
-                winnings = self.bet * 2
-                result = f"🎉 ¡El dealer se pasó de 21!\n+{winnings} GameCoins"
-            elif player_value == 21 and len(self.player_hand) == 2:
-                color = 0xffd700
-                title = "🃏 ¡BLACKJACK! 🎉"
-                winnings = int(self.bet * 2.5)
-                result = f"🎉 ¡Blackjack natural!\n+{winnings} GameCoins"
-            elif player_value > dealer_value:
-                color = 0x00ff00
-                title = "🃏 ¡Ganaste!"
-                winnings = self.bet * 2
-                result = f"🎉 ¡Tu mano es mejor!\n+{winnings} GameCoins"
-            elif player_value == dealer_value:
-                color = 0xffff00
-                title = "🃏 Empate"
-                result = f"🤝 Empate - Apuesta devuelta\n+{self.bet} GameCoins"
-            else:
-                color = 0xff0000
-                title = "🃏 Perdiste"
-                result = f"😢 El dealer tiene mejor mano\n-{self.bet} GameCoins"
+            dealer_cards = self.format_hand(game.dealer)
+            color, title, result = OUTCOME_EMBEDS[game.outcome]
+            result = result.format(amount=game.payout if game.payout else game.bet)
         else:
             # Juego en progreso
             color = 0x0099ff
             title = "🃏 Blackjack - Tu turno"
-            dealer_cards = self.format_hand(self.dealer_hand, hide_first=True)
+            dealer_cards = self.format_hand(game.dealer, hide_first=True)
             result = "Elige tu próxima acción:"
         
         embed = discord.Embed(title=title, color=color)
         
         embed.add_field(
             name=f"🎴 Tu mano ({player_value})",
-            value=self.format_hand(self.player_hand),
+            value=self.format_hand(game.player),
             inline=True
         )
         
         embed.add_field(
-            name=f"🎴 Dealer ({dealer_value if self.game_over else '?'})",
+            name=f"🎴 Dealer ({dealer_value if game.finished else '?'})",
             value=dealer_cards,
             inline=True
         )
@@ -122,7 +110,7 @@ class BlackjackView(discord.ui.View):
             inline=False
         )
         
-        if not self.game_over:
+        if not game.finished:
             embed.add_field(
                 name="🎯 Reglas",
                 value="• **Hit**: Tomar otra carta\n• **Stand**: Plantarse\n• **Split**: Dividir par (si tienes par)\n• **Double**: Doblar apuesta y tomar 1 carta\n• **Insurance**: Seguro si dealer muestra As\n• Objetivo: Llegar a 21 sin pasarse",
@@ -133,89 +121,60 @@ class BlackjackView(discord.ui.View):
     
     def update_buttons(self):
         """Actualiza el estado de los botones"""
-        player_value = self.calculate_hand_value(self.player_hand)
+        game = self.game
         
         # Deshabilitar botones si el juego terminó o el jugador se pasó de 21
-        if self.game_over or player_value > 21:
+        if game.finished or game.player_value > 21:
             for child in self.children:
                 child.disabled = True
         else:
             # Hit disponible si no te pasaste y no tienes 21
-            self.children[0].disabled = player_value == 21  # Hit
+            self.children[0].disabled = not game.can_hit()  # Hit
             self.children[1].disabled = False  # Stand - siempre disponible
             
             # Double solo disponible con 2 cartas y fondos suficientes
             if len(self.children) > 2:
-                user_economy = self.economy.get_user_economy(self.user_id)
-                self.children[2].disabled = not (self.can_double and len(self.player_hand) == 2 and user_economy['coins'] >= self.bet)
+                user_economy = self.economy.peek_user_economy(self.user_id)
+                self.children[2].disabled = not (
+                    game.can_double() and "double" not in self.pending and user_economy['coins'] >= game.bet
+                )
             
-            # Insurance solo disponible si dealer muestra As y no se ha ofrecido
+            # Insurance solo disponible si dealer muestra As y no se ha tomado
             if len(self.children) > 3:
-                dealer_showing_ace = self.dealer_hand[1][0] == "A"
-                self.children[3].disabled = not (dealer_showing_ace and not self.insurance_offered and len(self.player_hand) == 2)
+                self.children[3].disabled = not (game.can_insure() and "insurance" not in self.pending)
             
             # Split solo disponible si tienes par y no has dividido
             if len(self.children) > 4:
-                self.children[4].disabled = not (self.can_split and not self.has_split and len(self.player_hand) == 2)
+                self.children[4].disabled = not (game.can_split() and "split" not in self.pending)
     
     async def end_game(self, interaction: discord.Interaction):
         """Termina el juego y procesa el resultado"""
-        self.game_over = True
-        player_value = self.calculate_hand_value(self.player_hand)
-        dealer_value = self.calculate_hand_value(self.dealer_hand)
-        
-        # Verificar blackjack del dealer primero (para insurance)
-        dealer_blackjack = dealer_value == 21 and len(self.dealer_hand) == 2
-        
-        # Procesar insurance si aplica
-        if dealer_blackjack and self.has_insurance:
-            # Insurance paga 2:1
-            insurance_payout = (self.original_bet // 2) * 3
-            self.economy.add_coins(self.user_id, insurance_payout, "Blackjack insurance win")
-        
-        # El dealer toma cartas hasta 17 (solo si el jugador no se pasó y no tiene blackjack)
-        if player_value <= 21 and not dealer_blackjack:
-            while dealer_value < 17:
-                self.dealer_hand.append(self.deck.pop())
-                dealer_value = self.calculate_hand_value(self.dealer_hand)
-        
-        # Procesar resultado económico
-        if player_value > 21:
-            # Jugador se pasó - ya perdió la apuesta al inicio
-            self.economy._update_game_stats(self.user_id, False)
-        elif dealer_blackjack and player_value != 21:
-            # Dealer tiene blackjack y jugador no
-            self.economy._update_game_stats(self.user_id, False)
-        elif dealer_value > 21:
-            # Dealer se pasó - jugador gana
-            winnings = self.bet * 2
-            self.economy.add_coins(self.user_id, winnings, "Blackjack win")
-            self.economy._update_game_stats(self.user_id, True)
-        elif player_value == 21 and len(self.player_hand) == 2 and not dealer_blackjack:
-            # Blackjack natural del jugador
-            winnings = int(self.bet * 2.5)
-            self.economy.add_coins(self.user_id, winnings, "Blackjack win")
-            self.economy._update_game_stats(self.user_id, True)
-        elif player_value > dealer_value:
-            # Jugador gana
-            winnings = self.bet * 2
-            self.economy.add_coins(self.user_id, winnings, "Blackjack win")
-            self.economy._update_game_stats(self.user_id, True)
-        elif player_value == dealer_value:
-            # Empate - devolver apuesta
-            self.economy.add_coins(self.user_id, self.bet, "Blackjack tie")
-            self.economy._update_game_stats(self.user_id, False)
-        else:
-            # Dealer gana - ya perdió la apuesta al inicio
-            self.economy._update_game_stats(self.user_id, False)
+        # Un segundo clic (stand/double repetidos) no debe pagar la partida otra vez
+        if self.game.finished:
+            if not interaction.response.is_done():
+                await interaction.response.defer()
+            return
+        game = self.game
+        game.finish()
+        if self.channel_id is not None:
+            shoes.save(self.channel_id)
+        
+        # Seguro: paga 2:1 si el dealer tiene blackjack
+        if game.insurance_payout:
+            await async_economy.add_coins(
+                self.user_id, game.insurance_payout, "Blackjack insurance win",
+                idempotency_key=self.operation_key("insurance_win")
+            )
         
-        # Actualizar progreso de tarea de minijuegos
-        self.economy.update_task_progress(self.user_id, "play_minigames")
+        # Pago, estadísticas y tarea de minijuegos en una sola operación (la apuesta ya se cobró al inicio)
+        await async_economy.settle_game(
+            self.user_id, 0, game.payout, game.won, game="Blackjack", idempotency_key=self.operation_key("settle")
+        )
         
         self.update_buttons()
         
         # Mostrar balance actualizado
-        user_economy = self.economy.get_user_economy(self.user_id)
+        user_economy = self.economy.peek_user_economy(self.user_id)
         embed = self.create_embed()
         embed.add_field(
             name="💳 Balance",
@@ -231,15 +190,15 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ Este no es tu juego.", ephemeral=True)
             return
         
-        # Tomar una carta
-        self.player_hand.append(self.deck.pop())
-        player_value = self.calculate_hand_value(self.player_hand)
+        if not self.game.can_hit() or self.pending:
+            await interaction.response.send_message("❌ No puedes pedir carta en este momento.", ephemeral=True)
+            return
         
-        # Ya no se puede hacer double después de hit
-        self.can_double = False
+        # Tomar una carta (con tres cartas ya no hay double, split ni seguro)
+        self.game.hit()
         
         # Verificar si se pasó
-        if player_value > 21:
+        if self.game.player_value > 21:
             await self.end_game(interaction)
         else:
             self.update_buttons()
@@ -251,6 +210,11 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ Este no es tu juego.", ephemeral=True)
             return
         
+        # Con un cobro en curso la partida se liquidaría sin la apuesta adicional
+        if self.pending:
+            await interaction.response.send_message("⏳ Espera a que termine tu última jugada.", ephemeral=True)
+            return
+        
         await self.end_game(interaction)
     
     @discord.ui.button(label="💰 Double", style=discord.ButtonStyle.success, emoji="⬆️")
@@ -259,25 +223,33 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ Este no es tu juego.", ephemeral=True)
             return
         
-        if not self.can_double or len(self.player_hand) != 2:
+        if not self.game.can_double() or "double" in self.pending:
             await interaction.response.send_message("❌ No puedes doblar en este momento.", ephemeral=True)
             return
         
         # Verificar si tiene fondos para doblar
-        user_economy = self.economy.get_user_economy(self.user_id)
+        user_economy = self.economy.peek_user_economy(self.user_id)
         if user_economy['coins'] < self.bet:
             await interaction.response.send_message("❌ No tienes suficientes GameCoins para doblar.", ephemeral=True)
             return
         
-        # Cobrar la apuesta adicional
-        if not self.economy.remove_coins(self.user_id, self.bet, "Blackjack double bet"):
+        # Se marca antes del cobro para que un doble clic no cobre dos veces
+        self.pending.add("double")
+        try:
+            # Cobrar la apuesta adicional
+            charged = await async_economy.remove_coins(
+                self.user_id, self.bet, "Blackjack double bet", idempotency_key=self.operation_key("double")
+            )
+        finally:
+            self.pending.discard("double")
+        if not charged:
             await interaction.response.send_message("❌ Error al procesar la apuesta adicional.", ephemeral=True)
             return
+        if await self.refund_if_finished(interaction, "double", self.bet):
+            return
         
         # Duplicar apuesta y tomar exactamente una carta
-        self.bet *= 2
-        self.can_double = False
-        self.player_hand.append(self.deck.pop())
+        self.game.double()
         
         # Después de double, automáticamente se hace stand
         await self.end_game(interaction)
@@ -288,26 +260,35 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ Este no es tu juego.", ephemeral=True)
             return
         
-        if self.insurance_offered or self.dealer_hand[1][0] != "A" or len(self.player_hand) != 2:
+        if not self.game.can_insure() or "insurance" in self.pending:
             await interaction.response.send_message("❌ No puedes tomar seguro en este momento.", ephemeral=True)
             return
         
         # El seguro cuesta la mitad de la apuesta original
-        insurance_cost = self.original_bet // 2
+        insurance_cost = self.game.insurance_cost
         
         # Verificar si tiene fondos para el seguro
-        user_economy = self.economy.get_user_economy(self.user_id)
+        user_economy = self.economy.peek_user_economy(self.user_id)
         if user_economy['coins'] < insurance_cost:
             await interaction.response.send_message("❌ No tienes suficientes GameCoins para el seguro.", ephemeral=True)
             return
         
-        # Cobrar el seguro
-        if not self.economy.remove_coins(self.user_id, insurance_cost, "Blackjack insurance bet"):
+        # Se marca antes del cobro para que un doble clic no cobre dos veces
+        self.pending.add("insurance")
+        try:
+            # Cobrar el seguro
+            charged = await async_economy.remove_coins(
+                self.user_id, insurance_cost, "Blackjack insurance bet", idempotency_key=self.operation_key("insurance")
+            )
+        finally:
+            self.pending.discard("insurance")
+        if not charged:
             await interaction.response.send_message("❌ Error al procesar el seguro.", ephemeral=True)
             return
+        if await self.refund_if_finished(interaction, "insurance", insurance_cost):
+            return
         
-        self.has_insurance = True
-        self.insurance_offered = True
+        self.game.take_insurance()
         
         self.update_buttons()
         
@@ -326,28 +307,39 @@ class BlackjackView(discord.ui.View):
             await interaction.response.send_message("❌ Este no es tu juego.", ephemeral=True)
             return
         
-        if not self.can_split or self.has_split or len(self.player_hand) != 2:
+        if not self.game.can_split() or "split" in self.pending:
             await interaction.response.send_message("❌ No puedes dividir en este momento.", ephemeral=True)
             return
         
         # Verificar si tiene fondos para la segunda apuesta
-        user_economy = self.economy.get_user_economy(self.user_id)
+        user_economy = self.economy.peek_user_economy(self.user_id)
         if user_economy['coins'] < self.bet:
             await interaction.response.send_message("❌ No tienes suficientes GameCoins para dividir.", ephemeral=True)
             return
         
-        # Cobrar la segunda apuesta
-        if not self.economy.remove_coins(self.user_id, self.bet, "Blackjack split bet"):
+        # Se marca antes del cobro para que un doble clic no cobre dos veces
+        self.pending.add("split")
+        try:
+            # Cobrar la segunda apuesta
+            charged = await async_economy.remove_coins(
+                self.user_id, self.bet, "Blackjack split bet", idempotency_key=self.operation_key("split")
+            )
+        finally:
+            self.pending.discard("split")
+        if not charged:
             await interaction.response.send_message("❌ Error al procesar la segunda apuesta.", ephemeral=True)
             return
+        if await self.refund_if_finished(interaction, "split", self.bet):
+            return
         
         # Por simplicidad, en esta implementación el split solo duplica la apuesta
-        # y continúa con una sola mano (implementación completa requeriría más lógica)
-        self.has_split = True
-        self.bet *= 2  # Duplicar apuesta
+        # y continúa con una sola mano con una carta adicional
+        self.game.split()
         
-        # Dar una carta adicional
-        self.player_hand.append(self.deck.pop())
+        # La carta del split puede pasar la mano de 21 (p. ej. 10+10+5)
+        if self.game.player_value > 21:
+            await self.end_game(interaction)
+            return
         
         self.update_buttons()
         
@@ -358,4 +350,33 @@ class BlackjackView(discord.ui.View):
             inline=False
         )
         
-        await interaction.response.edit_message(embed=embed, view=self)
\ No newline at end of file
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    @discord.ui.button(label="💡 Pista", style=discord.ButtonStyle.secondary)
+    async def hint_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != int(self.user_id):
+            await interaction.response.send_message("❌ Este no es tu juego.", ephemeral=True)
+            return
+        
+        if self.game.finished or self.game.player_value > 21:
+            await interaction.response.send_message("❌ La partida ya terminó.", ephemeral=True)
+            return
+        
+        # Valor esperado de cada jugada disponible, de las tablas precalculadas
+        tables = get_strategy_tables()
+        action, options = strategy.best_action(tables, self.game)
+        lines = [
+            f"{'👉' if option == action else '•'} **{ACTION_LABELS[option]}**: "
+            f"{ev * self.game.original_bet:+,.1f} GameCoins esperados"
+            for option, ev in sorted(options.items(), key=lambda item: -item[1])
+        ]
+        if self.game.can_insure():
+            lines.append(f"• **🛡️ Insurance**: no conviene ({tables['insurance']:+.1%} de lo asegurado)")
+        
+        embed = discord.Embed(
+            title=f"💡 Mejor jugada: {ACTION_LABELS[action]}",
+            description="\n".join(lines),
+            color=0x0099ff
+        )
+        embed.set_footer(text=f"Ventaja de la casa jugando siempre la mejor opción: {strategy.house_edge(tables):.2%}")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
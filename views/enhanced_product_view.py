@@ -1,6 +1,7 @@
 import discord
 from typing import List, Dict, Tuple
-from exchange_rate_manager import ExchangeRateManager
+from exchange_rate_manager import exchange_rate_manager
+from price_matrix import price_matrix
 
 class EnhancedProductView(discord.ui.View):
     def __init__(self, products: List[Tuple[str, Dict]], pages: List[List], current_page: int = 0):
@@ -12,7 +13,7 @@ class EnhancedProductView(discord.ui.View):
         self.selected_category = None
         self.selected_country = "mexico"  # País por defecto
         self.categories = self._get_categories()
-        self.exchange_manager = ExchangeRateManager()
+        self.exchange_manager = exchange_rate_manager
         self.update_buttons()
         self._setup_category_select()
         self._setup_country_select()
@@ -32,6 +33,10 @@ class EnhancedProductView(discord.ui.View):
     async def create_embed(self) -> discord.Embed:
         country_info = self.exchange_manager.get_country_info()
         current_country = country_info.get(self.selected_country, country_info["mexico"])
+        currency_code = current_country['currency']
+        currency_symbol = current_country['currency_symbol']
+        # Precios ya convertidos de todo el catálogo (se recalculan sólo si cambian productos o tasas)
+        local_prices = price_matrix.column(currency_code)
         
         embed = discord.Embed(
             title="🛍️ Catálogo de Productos",
@@ -86,14 +91,13 @@ class EnhancedProductView(discord.ui.View):
                 name = product.get('name', 'Producto sin nombre')
                 description = product.get('description', 'Sin descripción')
                 
-                # Convertir precio a moneda local
-                country_info = self.exchange_manager.get_country_info()
-                currency_code = country_info[self.selected_country]['currency']
-                local_price = await self.exchange_manager.convert_price(price_mxn, currency_code)
-                currency_symbol = country_info[self.selected_country]['currency_symbol']
+                # Precio en moneda local
+                local_price = local_prices.get(product_id)
+                if local_price is None:
+                    local_price = self.exchange_manager.convert(price_mxn, currency_code)
 
                 # Mostrar precio según el país seleccionado
-                if self.selected_country == "mexico":
+                if currency_code == self.exchange_manager.base_currency:
                     price_display = f"💰 {currency_symbol}{price_mxn:.2f} MXN"
                 else:
                     price_display = f"💰 ${price_mxn:.2f} MXN ({currency_symbol}{local_price:.2f} {currency_code})"
@@ -155,10 +159,8 @@ class EnhancedProductView(discord.ui.View):
             min_values=1,
             max_values=1,
             options=[
-                discord.SelectOption(label="🇲🇽 México", value="mexico"),
-                discord.SelectOption(label="🇦🇷 Argentina", value="argentina"),
-                discord.SelectOption(label="🇨🇴 Colombia", value="colombia"),
-                discord.SelectOption(label="🇺🇸 Estados Unidos", value="usa")
+                discord.SelectOption(label=country['name'], value=country_key)
+                for country_key, country in self.exchange_manager.get_country_info().items()
             ],
             row=2
         )
@@ -181,15 +183,18 @@ class EnhancedProductView(discord.ui.View):
             filtered_products = current_page_products
 
         # Crear menú de selección con precios convertidos
+        country_info = self.exchange_manager.get_country_info()
+        currency_code = country_info[self.selected_country]['currency']
+        currency_symbol = country_info[self.selected_country]['currency_symbol']
+        local_prices = price_matrix.column(currency_code)
         options = []
         for pid, prod in filtered_products:
             price_mxn = prod['price']
-            country_info = self.exchange_manager.get_country_info()
-            currency_code = country_info[self.selected_country]['currency']
-            local_price = await self.exchange_manager.convert_price(price_mxn, currency_code)
-            currency_symbol = country_info[self.selected_country]['currency_symbol']
+            local_price = local_prices.get(pid)
+            if local_price is None:
+                local_price = self.exchange_manager.convert(price_mxn, currency_code)
             
-            if self.selected_country == "mexico":
+            if currency_code == self.exchange_manager.base_currency:
                 price_label = f"{currency_symbol}{price_mxn:.2f} MXN"
             else:
                 price_label = f"${price_mxn:.2f} MXN ({currency_symbol}{local_price:.2f} {currency_code})"
@@ -214,7 +219,8 @@ class EnhancedProductView(discord.ui.View):
                 self.selected_product = (selected_id, selected_product)
                 # Crear vista de ticket con el producto seleccionado
                 from views.enhanced_ticket_view import EnhancedTicketView
-                ticket_view = EnhancedTicketView(str(interaction.user.id), selected_id, selected_product['name'])
+                ticket_view = EnhancedTicketView(str(interaction.user.id), selected_id, selected_product['name'],
+                                                 currency=currency_code)
                 await interaction.response.edit_message(
                     embed=ticket_view.create_confirmation_embed(),
                     view=ticket_view
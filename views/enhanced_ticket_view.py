@@ -3,7 +3,8 @@ from typing import Optional
 from datetime import datetime
 import uuid
 from utils import check_user_permissions, handle_interaction_response, logger
-from data_manager import load_data, save_data
+from data_manager import create_ticket
+from exchange_rate_manager import exchange_rate_manager
 from config import TICKET_CHANNEL_ID, OWNER_ROLE_ID
 
 class EnhancedTicketView(discord.ui.View):
@@ -16,11 +17,14 @@ class EnhancedTicketView(discord.ui.View):
         "Mercado Pago": "📲"
     }
 
-    def __init__(self, user_id: str, product_id: Optional[str] = None, product_name: Optional[str] = None):
+    def __init__(self, user_id: str, product_id: Optional[str] = None, product_name: Optional[str] = None,
+                 currency: str = "MXN"):
         super().__init__(timeout=300)  # 5 minutos de timeout
         self.user_id = user_id
         self.product_id = product_id
         self.product_name = product_name
+        # Moneda en la que el usuario vio el precio
+        self.currency = currency
         self.payment_method = None
         self.confirmed = False
         logger.info(f'Vista de ticket mejorada creada para usuario {user_id}')
@@ -158,13 +162,14 @@ class EnhancedTicketView(discord.ui.View):
             )
             
             # Guardar la información del ticket
-            data = load_data()
-            data["tickets"][ticket_id] = {
+            create_ticket(ticket_id, {
                 "user_id": str(interaction.user.id),
                 "channel_id": str(channel.id),
                 "product_id": self.product_id,
                 "product_name": self.product_name,
                 "payment_method": self.payment_method,
+                # Tasa con la que se abrió (la versión es su fecha en el historial de tasas)
+                "exchange_rate": exchange_rate_manager.rate_stamp(self.currency),
                 "status": "abierto",
                 "estado_detallado": "esperando_revision",
                 "timestamp": datetime.utcnow().isoformat(),
@@ -173,8 +178,7 @@ class EnhancedTicketView(discord.ui.View):
                     "timestamp": datetime.utcnow().isoformat(),
                     "detalles": "Ticket creado por el usuario"
                 }]
-            }
-            save_data(data)
+            })
             
             # Actualizar la vista
             self.confirmed = True
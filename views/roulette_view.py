@@ -1,21 +1,51 @@
 import discord
-import random
 from typing import Dict, List
+from async_economy import async_economy
+
+# Etiqueta de cada color de casilla (``games.rules.ROULETTE_COLORS``)
+COLOR_LABELS = {"red": "🔴 Rojo", "black": "⚫ Negro", "green": "🟢 Verde"}
+
+# Etiqueta de cada apuesta exterior; los números se muestran como "🎯 Número N"
+BET_LABELS = {
+    ("color", "red"): "🔴 Rojo",
+    ("color", "black"): "⚫ Negro",
+    ("even_odd", "even"): "🔢 Par",
+    ("even_odd", "odd"): "🔢 Impar",
+    ("high_low", "low"): "📉 Bajo (1-18)",
+    ("high_low", "high"): "📈 Alto (19-36)",
+    ("dozen", "1"): "🧮 1ª Docena (1-12)",
+    ("dozen", "2"): "🧮 2ª Docena (13-24)",
+    ("dozen", "3"): "🧮 3ª Docena (25-36)",
+    ("column", "1"): "🏛️ Columna 1",
+    ("column", "2"): "🏛️ Columna 2",
+    ("column", "3"): "🏛️ Columna 3",
+}
+
+ERROR_MESSAGES = {
+    "insufficient_funds": "No tienes suficientes GameCoins para todas tus apuestas.",
+    "invalid_bet": "Alguna de las apuestas no es válida.",
+}
+
+
+def bet_label(bet_type: str, bet_value: str) -> str:
+    if bet_type == "number":
+        return f"🎯 Número {bet_value}"
+    return BET_LABELS.get((bet_type, bet_value), f"{bet_type} {bet_value}")
 
 class RouletteView(discord.ui.View):
     def __init__(self, user_id: str, economy_system):
         super().__init__(timeout=300)  # 5 minutos de timeout
         self.user_id = str(user_id)
         self.economy = economy_system
-        self.bet_amount = 0
+        # Apuestas de la jugada (tipo, valor, cantidad); se liquidan todas en un giro
+        self.bets = []
         self.bet_type = None
         self.bet_value = None
         self.game_started = False
         self.game_over = False
-        
-        # Números rojos y negros de la ruleta europea
-        self.red_numbers = [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36]
-        self.black_numbers = [2, 4, 6, 8, 10, 11, 13, 15, 17, 20, 22, 24, 26, 28, 29, 31, 33, 35]
+        # Giro en curso y número de giros intentados (clave de idempotencia de cada uno)
+        self.spinning = False
+        self.spins = 0
         
         self.create_initial_buttons()
     
@@ -59,6 +89,48 @@ class RouletteView(discord.ui.View):
         number_btn.callback = self.handle_number_selection
         self.add_item(number_btn)
         
+        # Botón Docena
+        dozen_btn = discord.ui.Button(
+            label="🧮 Docena",
+            style=discord.ButtonStyle.secondary,
+            custom_id="dozen"
+        )
+        dozen_btn.callback = self.handle_dozen_selection
+        self.add_item(dozen_btn)
+        
+        # Botón Columna
+        column_btn = discord.ui.Button(
+            label="🏛️ Columna",
+            style=discord.ButtonStyle.secondary,
+            custom_id="column"
+        )
+        column_btn.callback = self.handle_column_selection
+        self.add_item(column_btn)
+        
+        # Con la jugada llena no se pueden añadir más apuestas
+        if len(self.bets) >= self.economy.minigames['roulette']['max_bets']:
+            for child in self.children:
+                child.disabled = True
+        
+        if self.bets:
+            # Botón Girar: liquida todas las apuestas de la jugada
+            spin_btn = discord.ui.Button(
+                label=f"🎰 Girar ({self.total_bet:,} GameCoins)",
+                style=discord.ButtonStyle.success,
+                custom_id="spin"
+            )
+            spin_btn.callback = self.handle_spin
+            self.add_item(spin_btn)
+            
+            # Botón Limpiar apuestas
+            clear_btn = discord.ui.Button(
+                label="🧹 Limpiar apuestas",
+                style=discord.ButtonStyle.secondary,
+                custom_id="clear"
+            )
+            clear_btn.callback = self.handle_clear
+            self.add_item(clear_btn)
+        
         # Botón Cancelar
         cancel_btn = discord.ui.Button(
             label="❌ Cancelar",
@@ -68,6 +140,17 @@ class RouletteView(discord.ui.View):
         cancel_btn.callback = self.handle_cancel
         self.add_item(cancel_btn)
     
+    @property
+    def total_bet(self) -> int:
+        return sum(amount for _, _, amount in self.bets)
+    
+    def add_bet(self, amount: int):
+        """Añade la apuesta seleccionada a la jugada y vuelve al menú"""
+        self.bets.append((self.bet_type, self.bet_value, amount))
+        self.bet_type = None
+        self.bet_value = None
+        self.create_initial_buttons()
+    
     async def handle_color_selection(self, interaction: discord.Interaction):
         """Maneja la selección de apuesta por color"""
         if str(interaction.user.id) != self.user_id:
@@ -101,6 +184,28 @@ class RouletteView(discord.ui.View):
         embed = self.create_selection_embed("Alto/Bajo", "Selecciona alto (19-36) o bajo (1-18):")
         await interaction.response.edit_message(embed=embed, view=self)
     
+    async def handle_dozen_selection(self, interaction: discord.Interaction):
+        """Maneja la selección de apuesta por docena"""
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("❌ Esta no es tu partida.", ephemeral=True)
+            return
+        
+        self.bet_type = "dozen"
+        self.create_value_buttons("dozen")
+        embed = self.create_selection_embed("Docena", "Selecciona una docena (paga 2:1):")
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    async def handle_column_selection(self, interaction: discord.Interaction):
+        """Maneja la selección de apuesta por columna"""
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("❌ Esta no es tu partida.", ephemeral=True)
+            return
+        
+        self.bet_type = "column"
+        self.create_value_buttons("column")
+        embed = self.create_selection_embed("Columna", "Selecciona una columna (paga 2:1):")
+        await interaction.response.edit_message(embed=embed, view=self)
+    
     async def handle_number_selection(self, interaction: discord.Interaction):
         """Maneja la selección de número específico"""
         if str(interaction.user.id) != self.user_id:
@@ -176,6 +281,23 @@ class RouletteView(discord.ui.View):
         
         self.add_back_button()
     
+    def create_value_buttons(self, bet_type: str):
+        """Crea un botón por cada valor de una apuesta (docenas y columnas)"""
+        self.clear_items()
+        
+        for (label_type, value), label in BET_LABELS.items():
+            if label_type != bet_type:
+                continue
+            value_btn = discord.ui.Button(
+                label=label,
+                style=discord.ButtonStyle.primary,
+                custom_id=f"{bet_type}_{value}"
+            )
+            value_btn.callback = lambda i, value=value: self.handle_bet_value_selection(i, value)
+            self.add_item(value_btn)
+        
+        self.add_back_button()
+    
     def add_back_button(self):
         """Agrega botón para volver atrás"""
         back_btn = discord.ui.Button(
@@ -216,6 +338,41 @@ class RouletteView(discord.ui.View):
         embed = self.create_embed()
         await interaction.response.edit_message(embed=embed, view=self)
     
+    async def handle_spin(self, interaction: discord.Interaction):
+        """Gira la ruleta con todas las apuestas de la jugada"""
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("❌ Esta no es tu partida.", ephemeral=True)
+            return
+        
+        if self.spinning:
+            await interaction.response.send_message("⏳ La ruleta ya está girando.", ephemeral=True)
+            return
+        
+        if not self.bets or self.game_over:
+            await interaction.response.send_message("❌ No hay apuestas para girar.", ephemeral=True)
+            return
+        
+        # Se marca antes del primer await: un doble clic no cobra dos veces
+        self.spinning = True
+        try:
+            result_embed = await self.spin_roulette(
+                idempotency_key=f"roulette:{interaction.message.id}:{self.spins}"
+            )
+        finally:
+            self.spins += 1
+            self.spinning = False
+        await interaction.response.edit_message(embed=result_embed, view=self)
+    
+    async def handle_clear(self, interaction: discord.Interaction):
+        """Quita todas las apuestas de la jugada"""
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("❌ Esta no es tu partida.", ephemeral=True)
+            return
+        
+        self.bets = []
+        self.create_initial_buttons()
+        await interaction.response.edit_message(embed=self.create_embed(), view=self)
+    
     async def handle_cancel(self, interaction: discord.Interaction):
         """Maneja la cancelación del juego"""
         if str(interaction.user.id) != self.user_id:
@@ -237,11 +394,11 @@ class RouletteView(discord.ui.View):
         
         embed = discord.Embed(
             title="🎯 Ruleta Europea - Selecciona tu Apuesta",
-            description="Elige el tipo de apuesta que quieres hacer:",
+            description="Elige el tipo de apuesta que quieres hacer. Puedes combinar varias apuestas en un mismo giro:",
             color=0x9b59b6
         )
         
-        user_economy = self.economy.get_user_economy(self.user_id)
+        user_economy = self.economy.peek_user_economy(self.user_id)
         embed.add_field(
             name="💰 Tu Balance",
             value=f"{user_economy['coins']:,} GameCoins",
@@ -250,16 +407,25 @@ class RouletteView(discord.ui.View):
         
         embed.add_field(
             name="🎯 Rango de Apuestas",
-            value=f"{self.economy.minigames['roulette']['min_bet']}-{self.economy.minigames['roulette']['max_bet']} GameCoins",
+            value=f"{self.economy.minigames['roulette']['min_bet']}-{self.economy.minigames['roulette']['max_bet']} GameCoins por apuesta\n"
+                  f"Hasta {self.economy.minigames['roulette']['max_bets']} apuestas por giro",
             inline=True
         )
         
         embed.add_field(
             name="💡 Tipos de Apuesta",
-            value="🎨 **Color**: Rojo/Negro (1:1)\n🔢 **Par/Impar**: Even/Odd (1:1)\n📊 **Alto/Bajo**: 1-18/19-36 (1:1)\n🎯 **Número**: 0-36 (35:1)",
+            value="🎨 **Color**: Rojo/Negro (1:1)\n🔢 **Par/Impar**: Even/Odd (1:1)\n📊 **Alto/Bajo**: 1-18/19-36 (1:1)\n🧮 **Docena** / 🏛️ **Columna**: 12 números (2:1)\n🎯 **Número**: 0-36 (35:1)",
             inline=False
         )
         
+        if self.bets:
+            embed.add_field(
+                name=f"🧾 Tu Jugada ({len(self.bets)} apuestas)",
+                value="\n".join(f"{bet_label(bet_type, value)}: {amount:,}" for bet_type, value, amount in self.bets)
+                      + f"\n**Total: {self.total_bet:,} GameCoins**",
+                inline=False
+            )
+        
         embed.set_footer(text="🎯 Ruleta Europea • GameMid Casino")
         return embed
     
@@ -278,12 +444,24 @@ class RouletteView(discord.ui.View):
         # Este método se implementará cuando se complete el juego
         pass
     
-    async def spin_roulette(self, bet_amount: int):
-        """Ejecuta el giro de la ruleta"""
+    async def spin_roulette(self, idempotency_key: str = None):
+        """Ejecuta el giro de la ruleta con todas las apuestas de la jugada"""
         try:
-            result = self.economy.play_roulette(self.user_id, bet_amount, self.bet_type, self.bet_value)
+            result = await async_economy.play_roulette_bets(
+                self.user_id, list(self.bets), idempotency_key=idempotency_key
+            )
+            
+            if "error" in result:
+                # La jugada se conserva para que pueda corregirla
+                self.create_initial_buttons()
+                return discord.Embed(
+                    title="❌ No se pudo girar",
+                    description=ERROR_MESSAGES.get(result["error"], "Inténtalo de nuevo."),
+                    color=0xe74c3c
+                )
             
             # Crear embed de resultado
+            net = result['winnings'] - result['total_bet']
             if result['result'] == 'win':
                 color = 0x2ecc71  # Verde
                 title = "🎉 ¡Ganaste!"
@@ -304,13 +482,23 @@ class RouletteView(discord.ui.View):
             
             embed.add_field(
                 name="🎨 Color",
-                value="🔴 Rojo" if result['winning_number'] in self.red_numbers else "⚫ Negro" if result['winning_number'] != 0 else "🟢 Verde",
+                value=COLOR_LABELS[result['winning_color']],
                 inline=True
             )
             
+            embed.add_field(
+                name="🧾 Apuestas",
+                value="\n".join(
+                    f"{'✅' if bet['payout'] else '❌'} {bet_label(bet['bet_type'], bet['bet_value'])}: "
+                    f"{bet['amount']:,} → {bet['payout']:,}"
+                    for bet in result['bets']
+                ),
+                inline=False
+            )
+            
             embed.add_field(
                 name="💰 Resultado",
-                value=f"{result['winnings']:+,} GameCoins",
+                value=f"{net:+,} GameCoins (apostado {result['total_bet']:,}, cobrado {result['winnings']:,})",
                 inline=True
             )
             
@@ -352,7 +540,7 @@ class RouletteView(discord.ui.View):
             return
         
         # Reiniciar estado del juego
-        self.bet_amount = 0
+        self.bets = []
         self.bet_type = None
         self.bet_value = None
         self.game_started = False
@@ -446,17 +634,17 @@ class BetAmountModal(discord.ui.Modal):
                 )
                 return
             
-            user_economy = self.roulette_view.economy.get_user_economy(self.roulette_view.user_id)
-            if amount > user_economy['coins']:
+            user_economy = self.roulette_view.economy.peek_user_economy(self.roulette_view.user_id)
+            if self.roulette_view.total_bet + amount > user_economy['coins']:
                 await interaction.response.send_message(
                     "❌ No tienes suficientes GameCoins para esta apuesta.",
                     ephemeral=True
                 )
                 return
             
-            # Ejecutar el giro de la ruleta
-            result_embed = await self.roulette_view.spin_roulette(amount)
-            await interaction.response.edit_message(embed=result_embed, view=self.roulette_view)
+            # La apuesta se suma a la jugada; todas se liquidan al girar
+            self.roulette_view.add_bet(amount)
+            await interaction.response.edit_message(embed=self.roulette_view.create_embed(), view=self.roulette_view)
             
         except ValueError:
             await interaction.response.send_message(
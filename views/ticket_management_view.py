@@ -2,7 +2,7 @@ import discord
 import asyncio
 from datetime import datetime
 from utils import check_user_permissions, handle_interaction_response, logger
-from data_manager import load_data, save_data
+from data_manager import close_ticket
 from config import OWNER_ROLE_ID
 
 class TicketManagementView(discord.ui.View):
@@ -18,29 +18,16 @@ class TicketManagementView(discord.ui.View):
             return
 
         try:
-            # Cargar datos del ticket
-            data = load_data()
-            if self.ticket_id not in data["tickets"]:
+            # Actualizar estado del ticket y su historial
+            ticket_data = close_ticket(
+                self.ticket_id,
+                interaction.user.id,
+                f"Ticket cerrado por {interaction.user.name}"
+            )
+            if ticket_data is None:
                 await handle_interaction_response(interaction, "❌ No se encontró el ticket.")
                 return
 
-            ticket_data = data["tickets"][self.ticket_id]
-            
-            # Actualizar estado del ticket
-            ticket_data["status"] = "cerrado"
-            ticket_data["estado_detallado"] = "cerrado_por_owner"
-            ticket_data["closed_by"] = str(interaction.user.id)
-            ticket_data["closed_at"] = datetime.utcnow().isoformat()
-            
-            # Agregar al historial
-            ticket_data["historial"].append({
-                "estado": "cerrado",
-                "timestamp": datetime.utcnow().isoformat(),
-                "detalles": f"Ticket cerrado por {interaction.user.name}"
-            })
-            
-            save_data(data)
-
             # Crear embed de cierre
             embed = discord.Embed(
                 title="🔒 Ticket Cerrado",
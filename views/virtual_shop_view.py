@@ -6,8 +6,9 @@ from typing import List, Dict, Optional
 import logging
 # Traemos los módulos de la tienda y economía
 from virtual_shop import virtual_shop
+from async_economy import async_virtual_shop
 from data_manager import load_data, save_data
-from economy_system import EconomySystem
+from economy_system import economy
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -47,7 +48,6 @@ class VirtualShopView(discord.ui.View):
     
     def create_shop_embed(self):
         """Crea el embed principal que muestra los productos de la tienda"""
-        economy = EconomySystem()
         user_coins = economy.get_balance(str(self.user_id))  # Obtenemos el balance del usuario
         
         filtered_products = self.get_filtered_products()  # Productos filtrados por categoría
@@ -277,7 +277,6 @@ class PurchaseModal(discord.ui.Modal):
             product = self.available_products[product_id]
             
             # Verifica el balance de GameCoins del usuario
-            economy = EconomySystem()
             user_coins = economy.get_balance(str(self.user_id))
             
             if user_coins < product['price']:
@@ -291,16 +290,15 @@ class PurchaseModal(discord.ui.Modal):
                 )
                 return
             
-            # Procesa la compra del producto
-            purchase_result = virtual_shop.purchase_virtual_product(
+            # Procesa la compra del producto (cobra y registra en un solo paso)
+            purchase_result = await async_virtual_shop.purchase_virtual_product(
                 user_id=str(self.user_id),
                 product_id=product_id,
-                guild_id=str(interaction.guild.id) if interaction.guild else None
+                # Un reenvío del mismo formulario no vuelve a cobrar
+                idempotency_key=f"purchase:{self.user_id}:{self.custom_id}:{product_id}"
             )
             
             if purchase_result['success']:
-                # Deduce las monedas del balance del usuario
-                economy.remove_coins(str(self.user_id), product['price'], f"Compra: {product['name']}")
                 new_balance = economy.get_balance(str(self.user_id))
                 
                 # Otorga el rol si el producto lo incluye
@@ -345,7 +343,7 @@ class PurchaseModal(discord.ui.Modal):
                 
             else:
                 await interaction.followup.send(
-                    f"❌ Error al procesar la compra: {purchase_result.get('error', 'Error desconocido')}",
+                    f"❌ Error al procesar la compra: {purchase_result.get('message', 'Error desconocido')}",
                     ephemeral=True
                 )
         
@@ -361,6 +359,9 @@ class MyPurchasesView(discord.ui.View):
         self.user_id = user_id
         self.current_page = 0
         self.purchases_per_page = 5
+        # Cursor de inicio de cada página visitada (la primera no tiene cursor)
+        self.cursors = [None]
+        self.load_page()
     
     async def on_timeout(self):
         """Deshabilita los botones cuando expira el tiempo"""
@@ -372,19 +373,20 @@ class MyPurchasesView(discord.ui.View):
         except:
             pass
     
-    def get_user_purchases(self):
-        """Obtiene las compras del usuario"""
-        return virtual_shop.get_user_purchases(str(self.user_id))
+    def load_page(self):
+        """Carga la página actual usando el cursor guardado"""
+        self.page_purchases, self.next_cursor = virtual_shop.get_user_purchases_page(
+            str(self.user_id), self.cursors[self.current_page], self.purchases_per_page
+        )
     
     def create_purchases_embed(self):
         """Crea el embed de compras del usuario"""
-        purchases = self.get_user_purchases()
-        total_purchases = len(purchases)
+        summary = virtual_shop.get_user_purchase_summary(str(self.user_id))
+        total_purchases = summary["total_purchases"]
         
         # Calcular paginación
         start_idx = self.current_page * self.purchases_per_page
-        end_idx = start_idx + self.purchases_per_page
-        purchases_list = purchases[start_idx:end_idx]
+        purchases_list = self.page_purchases
         
         embed = discord.Embed(
             title="🛍️ Mis Compras",
@@ -400,11 +402,10 @@ class MyPurchasesView(discord.ui.View):
             inline=True
         )
         
-        # Calcular total gastado
-        total_spent = sum(purchase.get('price_paid', 0) for purchase in purchases)
+        # Total gastado
         embed.add_field(
             name="💰 Total Gastado",
-            value=f"{total_spent:,} GameCoins",
+            value=f"{summary['total_spent']:,} GameCoins",
             inline=True
         )
         
@@ -420,7 +421,7 @@ class MyPurchasesView(discord.ui.View):
                 status = "✅ Activo" if purchase.get('active', True) else "❌ Inactivo"
                 
                 # Formatear fecha
-                purchase_date = datetime.fromisoformat(purchase['purchase_date'])
+                purchase_date = datetime.fromisoformat(purchase['purchased_at'])
                 date_str = f"<t:{int(purchase_date.timestamp())}:d>"
                 
                 value = f"💰 {purchase.get('price_paid', 0):,} GameCoins\n"
@@ -438,12 +439,8 @@ class MyPurchasesView(discord.ui.View):
     
     def update_buttons(self):
         """Actualiza el estado de los botones"""
-        purchases = self.get_user_purchases()
-        total_purchases = len(purchases)
-        total_pages = max(1, (total_purchases + self.purchases_per_page - 1) // self.purchases_per_page)
-        
         self.previous_page.disabled = self.current_page == 0
-        self.next_page.disabled = self.current_page >= total_pages - 1
+        self.next_page.disabled = self.next_cursor is None
     
     @discord.ui.button(label="⬅️ Anterior", style=discord.ButtonStyle.secondary)
     async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -454,6 +451,8 @@ class MyPurchasesView(discord.ui.View):
         
         if self.current_page > 0:
             self.current_page -= 1
+            self.cursors.pop()
+            self.load_page()
             self.update_buttons()
             embed = self.create_purchases_embed()
             await interaction.response.edit_message(embed=embed, view=self)
@@ -467,11 +466,10 @@ class MyPurchasesView(discord.ui.View):
             await interaction.response.send_message("❌ Solo quien solicitó la información puede usarla.", ephemeral=True)
             return
         
-        purchases = self.get_user_purchases()
-        total_pages = max(1, (len(purchases) + self.purchases_per_page - 1) // self.purchases_per_page)
-        
-        if self.current_page < total_pages - 1:
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
             self.current_page += 1
+            self.load_page()
             self.update_buttons()
             embed = self.create_purchases_embed()
             await interaction.response.edit_message(embed=embed, view=self)
@@ -485,6 +483,7 @@ class MyPurchasesView(discord.ui.View):
             await interaction.response.send_message("❌ Solo quien solicitó la información puede usarla.", ephemeral=True)
             return
         
+        self.load_page()
         self.update_buttons()
         embed = self.create_purchases_embed()
         await interaction.response.edit_message(embed=embed, view=self)
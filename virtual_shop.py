@@ -1,10 +1,11 @@
 # Importamos todo lo que necesitamos para que funcione nuestra tienda virtual
 import json
 import uuid
+from bisect import bisect_left, insort
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from data_manager import load_data, save_data
-from economy_system import economy
+from typing import Dict, List, Optional, Any, Tuple
+from data_manager import load_data, save_data, store_lock
+from economy_system import economy, idempotent
 
 class VirtualShop:
     """Esta es nuestra tienda virtual donde los usuarios pueden comprar cosas geniales"""
@@ -18,6 +19,12 @@ class VirtualShop:
             "cosmetics": {"name": "Cosméticos", "emoji": "✨"}, # Para verse más cool
             "other": {"name": "Otros", "emoji": "📦"}       # Todo lo demás que no encaja
         }
+        # Índice de compras activas por usuario: user_id -> [(purchased_at, purchase_id)]
+        # ordenado de más antigua a más reciente, más el total gastado por usuario.
+        # Se reconstruye si el almacén residente se reemplaza (reload_data).
+        self._purchase_index = None
+        self._purchase_spent = {}
+        self._indexed_store = None
     
     def get_virtual_products(self) -> Dict:
         """Trae todos los productos que tenemos disponibles en la tienda"""
@@ -55,10 +62,6 @@ class VirtualShop:
         """Agrega un nuevo producto genial a nuestra tienda virtual"""
         data = load_data()
         
-        # Si no existe la tienda, la creamos desde cero
-        if "virtual_shop" not in data:
-            data["virtual_shop"] = {"products": {}, "purchases": {}, "settings": {"enabled": True, "tax_rate": 0.0}}
-        
         # Generamos un ID único para el producto (como una huella digital)
         product_id = str(uuid.uuid4())
         
@@ -77,9 +80,14 @@ class VirtualShop:
             "purchases_count": 0           # Cuántas veces lo han comprado
         }
         
-        # Guardamos el producto en nuestra base de datos
-        data["virtual_shop"]["products"][product_id] = product_data
-        save_data(data)
+        # Guardamos el producto en nuestra base de datos (los productos los
+        # comparten las compras y el volcado: con el lock del almacén)
+        with store_lock:
+            # Si no existe la tienda, la creamos desde cero
+            if "virtual_shop" not in data:
+                data["virtual_shop"] = {"products": {}, "purchases": {}, "settings": {"enabled": True, "tax_rate": 0.0}}
+            data["virtual_shop"]["products"][product_id] = product_data
+            save_data(data, touched=[("virtual_shop_products", product_id)])
         
         return product_id  # Devolvemos el ID para referencia
     
@@ -87,34 +95,37 @@ class VirtualShop:
         """Elimina un producto de la tienda (¡cuidado, no se puede deshacer!)"""
         data = load_data()
         
-        # Verificamos que el producto existe antes de eliminarlo
-        if "virtual_shop" in data and product_id in data["virtual_shop"]["products"]:
-            del data["virtual_shop"]["products"][product_id]  # ¡Adiós producto!
-            save_data(data)
-            return True  # Éxito, producto eliminado
+        with store_lock:
+            # Verificamos que el producto existe antes de eliminarlo
+            if "virtual_shop" in data and product_id in data["virtual_shop"]["products"]:
+                del data["virtual_shop"]["products"][product_id]  # ¡Adiós producto!
+                save_data(data, touched=[("virtual_shop_products", product_id)])
+                return True  # Éxito, producto eliminado
         return False  # No se pudo eliminar (probablemente no existía)
     
     def edit_virtual_product(self, product_id: str, **kwargs) -> bool:
         """Modifica un producto existente (para cuando queremos cambiar algo)"""
         data = load_data()
         
-        # Verificamos que el producto existe
-        if "virtual_shop" in data and product_id in data["virtual_shop"]["products"]:
-            product = data["virtual_shop"]["products"][product_id]
-            
-            # Solo permitimos cambiar ciertos campos por seguridad
-            allowed_fields = ['name', 'price', 'description', 'category', 'image_url', 
-                            'role_id', 'duration_days', 'enabled']
-            
-            # Actualizamos solo los campos que nos enviaron y que están permitidos
-            for field, value in kwargs.items():
-                if field in allowed_fields and value is not None:
-                    product[field] = value  # Aplicamos el cambio
-            
-            save_data(data)  # Guardamos los cambios
-            return True  # Todo salió bien
+        with store_lock:
+            # Verificamos que el producto existe
+            if "virtual_shop" in data and product_id in data["virtual_shop"]["products"]:
+                product = data["virtual_shop"]["products"][product_id]
+                
+                # Solo permitimos cambiar ciertos campos por seguridad
+                allowed_fields = ['name', 'price', 'description', 'category', 'image_url', 
+                                'role_id', 'duration_days', 'enabled']
+                
+                # Actualizamos solo los campos que nos enviaron y que están permitidos
+                for field, value in kwargs.items():
+                    if field in allowed_fields and value is not None:
+                        product[field] = value  # Aplicamos el cambio
+                
+                save_data(data, touched=[("virtual_shop_products", product_id)])  # Guardamos los cambios
+                return True  # Todo salió bien
         return False  # El producto no existe
     
+    @idempotent
     def purchase_virtual_product(self, user_id: str, product_id: str) -> Dict[str, Any]:
         """¡Aquí es donde la magia sucede! Procesamos la compra de un producto"""
         data = load_data()
@@ -129,6 +140,11 @@ class VirtualShop:
         if not product.get("enabled", True):
             return {"success": False, "message": "Este producto no está disponible ahora mismo 😔"}
         
+        # Comprobar saldo, cobrar y registrar la compra sin que otra operación se intercale
+        with economy.transaction([user_id]):
+            return self._purchase(data, user_id, product_id, product)
+    
+    def _purchase(self, data: Dict, user_id: str, product_id: str, product: Dict) -> Dict[str, Any]:
         # ¡Momento de la verdad! ¿Tiene suficiente dinero?
         user_balance = economy.get_balance(user_id)
         if user_balance < product["price"]:
@@ -140,7 +156,8 @@ class VirtualShop:
         # ¡Perfecto! Vamos a procesar la compra
         try:
             # Le quitamos las monedas de su cuenta
-            economy.remove_coins(user_id, product["price"])
+            if not economy.remove_coins(user_id, product["price"], f"Compra: {product['name']}"):
+                return {"success": False, "message": "No tienes suficientes GameCoins 💰"}
             
             # Creamos un registro de la compra para el historial
             purchase_id = str(uuid.uuid4())  # ID único para esta compra
@@ -154,15 +171,21 @@ class VirtualShop:
                 "active": True                                 # Si está activo
             }
             
-            # Nos aseguramos de que existe la sección de compras
-            if "purchases" not in data["virtual_shop"]:
-                data["virtual_shop"]["purchases"] = {}
-            data["virtual_shop"]["purchases"][purchase_id] = purchase_data
-            
-            # Aumentamos el contador de cuántas veces se ha comprado este producto
-            data["virtual_shop"]["products"][product_id]["purchases_count"] += 1
-            
-            save_data(data)  # Guardamos todo
+            # Las compras y el contador del producto los comparten todos los
+            # compradores (y los recorre el volcado): se tocan con el lock del almacén
+            with store_lock:
+                # Nos aseguramos de que existe la sección de compras
+                self._get_purchases(data)
+                if "purchases" not in data["virtual_shop"]:
+                    data["virtual_shop"]["purchases"] = {}
+                data["virtual_shop"]["purchases"][purchase_id] = purchase_data
+                self._index_purchase(data, purchase_data)
+                
+                # Aumentamos el contador de cuántas veces se ha comprado este producto
+                data["virtual_shop"]["products"][product_id]["purchases_count"] += 1
+                
+                save_data(data, touched=[("virtual_shop_purchases", purchase_id),
+                                         ("virtual_shop_products", product_id)])
             
             return {
                 "success": True,
@@ -174,12 +197,10 @@ class VirtualShop:
         except Exception as e:
             return {"success": False, "message": f"Error al procesar la compra: {str(e)}"}
     
-    def get_user_purchases(self, user_id: str) -> List[Dict]:
-        """Obtiene las compras de un usuario"""
-        data = load_data()
-        
+    def _get_purchases(self, data: Dict) -> Dict:
+        """Devuelve el diccionario de compras, corrigiendo el formato antiguo en lista"""
         if "virtual_shop" not in data or "purchases" not in data["virtual_shop"]:
-            return []
+            return {}
         
         purchases = data["virtual_shop"]["purchases"]
         
@@ -188,23 +209,84 @@ class VirtualShop:
             purchases_dict = {str(i): purchase for i, purchase in enumerate(purchases)}
             data["virtual_shop"]["purchases"] = purchases_dict
             save_data(data)
-            purchases = purchases_dict
+            return purchases_dict
         elif not isinstance(purchases, dict):
-            return []
+            return {}
+        return purchases
+    
+    def _ensure_purchase_index(self, data: Dict):
+        """Construye el índice por usuario la primera vez (o tras recargar el almacén)"""
+        if self._purchase_index is not None and data is self._indexed_store:
+            return
+        self._purchase_index = {}
+        self._purchase_spent = {}
+        self._indexed_store = data
+        for purchase_id, purchase in self._get_purchases(data).items():
+            if isinstance(purchase, dict) and purchase.get("active", True):
+                self._purchase_index.setdefault(purchase.get("user_id"), []).append(
+                    (purchase.get("purchased_at", ""), purchase_id)
+                )
+                self._purchase_spent[purchase.get("user_id")] = (
+                    self._purchase_spent.get(purchase.get("user_id"), 0) + purchase.get("price_paid", 0)
+                )
+        for entries in self._purchase_index.values():
+            entries.sort()
+    
+    def _index_purchase(self, data: Dict, purchase: Dict):
+        if self._purchase_index is None or data is not self._indexed_store:
+            self._ensure_purchase_index(data)
+            return
+        user_id = purchase["user_id"]
+        insort(self._purchase_index.setdefault(user_id, []), (purchase["purchased_at"], purchase["id"]))
+        self._purchase_spent[user_id] = self._purchase_spent.get(user_id, 0) + purchase["price_paid"]
+    
+    def get_user_purchases(self, user_id: str) -> List[Dict]:
+        """Obtiene las compras de un usuario"""
+        purchases, _ = self.get_user_purchases_page(user_id, limit=None)
+        return purchases
+    
+    def get_user_purchases_page(self, user_id: str, cursor: Optional[Tuple[str, str]] = None,
+                                limit: Optional[int] = 5) -> Tuple[List[Dict], Optional[Tuple[str, str]]]:
+        """Obtiene una página de compras activas, de la más reciente a la más antigua.
         
-        user_purchases = []
-        for purchase_id, purchase in purchases.items():
-            if isinstance(purchase, dict) and purchase.get("user_id") == user_id and purchase.get("active", True):
-                user_purchases.append(purchase)
+        ``cursor`` es el valor devuelto por la página anterior (None para la
+        primera). Devuelve ``(compras, siguiente_cursor)``; el cursor es None
+        cuando no quedan más compras.
+        """
+        data = load_data()
+        self._ensure_purchase_index(data)
+        entries = self._purchase_index.get(user_id, [])
+        end = len(entries) if cursor is None else bisect_left(entries, tuple(cursor))
+        start = 0 if limit is None else max(0, end - limit)
         
-        return sorted(user_purchases, key=lambda x: x.get("purchased_at", ""), reverse=True)
+        purchases = self._get_purchases(data)
+        page = [purchases[purchase_id] for _, purchase_id in reversed(entries[start:end])]
+        next_cursor = entries[start] if start > 0 else None
+        return page, next_cursor
+    
+    def get_user_purchase_summary(self, user_id: str) -> Dict[str, int]:
+        """Número de compras activas y total gastado por el usuario"""
+        self._ensure_purchase_index(load_data())
+        return {
+            "total_purchases": len(self._purchase_index.get(user_id, [])),
+            "total_spent": self._purchase_spent.get(user_id, 0)
+        }
     
     def deactivate_purchase(self, purchase_id: str) -> bool:
         """Desactiva una compra (para productos temporales)"""
         data = load_data()
         
         if "virtual_shop" in data and "purchases" in data["virtual_shop"] and purchase_id in data["virtual_shop"]["purchases"]:
-            data["virtual_shop"]["purchases"][purchase_id]["active"] = False
+            self._ensure_purchase_index(data)
+            purchase = data["virtual_shop"]["purchases"][purchase_id]
+            if purchase.get("active", True):
+                entries = self._purchase_index.get(purchase.get("user_id"), [])
+                key = (purchase.get("purchased_at", ""), purchase_id)
+                idx = bisect_left(entries, key)
+                if idx < len(entries) and entries[idx] == key:
+                    del entries[idx]
+                    self._purchase_spent[purchase.get("user_id")] -= purchase.get("price_paid", 0)
+            purchase["active"] = False
             save_data(data)
             return True
         return False